@@ -0,0 +1,92 @@
+import math
+import threading
+from apps.gateway.outbox import TokenBucket
+from apps.sidecar.core.logger import get_logger
+
+logger = get_logger("gateway.admission")
+
+class Admission:
+    """
+    Admission control for expensive commands: a token bucket per sender and
+    one shared by everyone, refilled at `*_per_minute`. A request is admitted
+    only if both buckets have a token; otherwise it is told how many seconds
+    to wait. Per-sender admitted/rejected counts are kept for `top()`.
+    """
+    def __init__(self, sender_per_minute: float = 1.0, sender_burst: float = 3.0,
+                 global_per_minute: float = 30.0, global_burst: float = 30.0, max_senders: int = 10000):
+        self.sender_per_minute = sender_per_minute
+        self.sender_burst = sender_burst
+        self.global_per_minute = global_per_minute
+        self.global_burst = global_burst
+        self.max_senders = max_senders
+        self.bucket = TokenBucket(global_per_minute / 60, global_burst)
+        self.counts = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def check(self, sender: str) -> tuple:
+        """(admitted, scope, retry_after): scope is "sender" or "global" for a rejection, retry_after in whole seconds."""
+        with self._lock:
+            bucket = self._sender_bucket(sender)
+            counts = self.counts.get(sender)
+            if counts is None:
+                if len(self.counts) >= self.max_senders:
+                    # Forget the quieter half rather than grow without bound
+                    ranked = sorted(self.counts.items(), key=lambda item: -item[1]["admitted"])
+                    self.counts = dict(ranked[:self.max_senders // 2])
+                counts = self.counts[sender] = {"admitted": 0, "rejected": 0}
+            sender_wait, global_wait = bucket.wait_time(), self.bucket.wait_time()
+            if sender_wait or global_wait:
+                counts["rejected"] += 1
+                scope = "sender" if sender_wait >= global_wait else "global"
+                return False, scope, max(1, math.ceil(max(sender_wait, global_wait)))
+            bucket.take()
+            self.bucket.take()
+            counts["admitted"] += 1
+            return True, None, 0
+
+    def configure(self, sender_per_minute: float = None, sender_burst: float = None,
+                  global_per_minute: float = None, global_burst: float = None):
+        """Change the limits; senders get fresh buckets at the new rate."""
+        with self._lock:
+            if sender_per_minute is not None:
+                self.sender_per_minute = sender_per_minute
+            if sender_burst is not None:
+                self.sender_burst = sender_burst
+            if global_per_minute is not None:
+                self.global_per_minute = global_per_minute
+            if global_burst is not None:
+                self.global_burst = global_burst
+            self.bucket = TokenBucket(self.global_per_minute / 60, self.global_burst)
+            self._buckets = {}
+
+    def limits(self) -> dict:
+        return {
+            "sender_per_minute": self.sender_per_minute,
+            "sender_burst": self.sender_burst,
+            "global_per_minute": self.global_per_minute,
+            "global_burst": self.global_burst,
+        }
+
+    def top(self, limit: int = 50) -> list:
+        """Senders by admitted requests, busiest first."""
+        with self._lock:
+            ranked = sorted(self.counts.items(), key=lambda item: (-item[1]["admitted"], -item[1]["rejected"]))
+            return [{"sender": sender, **counts} for sender, counts in ranked[:limit]]
+
+    def totals(self) -> dict:
+        with self._lock:
+            return {
+                "admitted": sum(c["admitted"] for c in self.counts.values()),
+                "rejected": sum(c["rejected"] for c in self.counts.values()),
+            }
+
+    def _sender_bucket(self, sender: str) -> TokenBucket:
+        """Caller holds the lock."""
+        bucket = self._buckets.get(sender)
+        if bucket is None:
+            if len(self._buckets) >= self.max_senders:
+                # A full bucket is the same as a new one
+                self._buckets = {s: b for s, b in self._buckets.items() if not b.full}
+            bucket = self._buckets[sender] = TokenBucket(self.sender_per_minute / 60, self.sender_burst)
+        return bucket
@@ -0,0 +1,344 @@
+import os
+import json
+import time
+import asyncio
+import socket
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+from apps.sidecar.core.logger import get_logger
+
+logger = get_logger("gateway.inbox")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+INBOX_DB_PATH = Path(os.getenv("GATEWAY_INBOX_DB", PROJECT_ROOT / "data" / "gateway_inbox.db"))
+
+class Inbox:
+    """
+    Durable queue of inbound messages in SQLite (WAL). A claimed message is
+    hidden for `visibility_timeout` seconds; it is deleted on ack, made
+    visible again after a backoff on failure, and moved to the dead-letter
+    table once it has failed `max_attempts` times. Delivery is at-least-once.
+
+    Every msg_id is recorded in `received` with its outcome (queued, done
+    with the reply sent, or failed) for `dedup_ttl` seconds, so redeliveries
+    are refused across restarts and across gateway processes sharing the DB.
+    remember() records other deliveries (task callbacks) the same way.
+
+    Claims are fair between senders (self-clocked fair queuing): a message
+    is tagged with a finish tag `max(virtual time, sender's last tag) +
+    1 / weight`, where the virtual time is the tag of the last message
+    claimed, and the smallest tag is served first, so a sender with a
+    backlog cannot hold back others. `weights` maps senders to weights (1).
+
+    A lease records the `owner` that took it (the gateway instance id, the
+    host name by default). recover() releases only this owner's leases, so
+    gateway processes sharing the DB need distinct owners; the leases of a
+    crashed owner that does not come back expire after the timeout.
+    """
+    PRUNE_EVERY = 1000
+
+    def __init__(self, db_path: Path = INBOX_DB_PATH, visibility_timeout: float = 60.0, max_attempts: int = 5,
+                 dedup_ttl: float = 86400.0, owner: str = None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.dedup_ttl = dedup_ttl
+        self.owner = owner or socket.gethostname()
+        self.weights = {}
+        self._virtual_time = 0.0
+        self._appends = 0
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _get_conn(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        # WAL readers never block the writer; commits need no fsync of the main file
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        with self._get_conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    msg_id TEXT,
+                    payload TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    visible_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    sender TEXT,
+                    finish_tag REAL NOT NULL DEFAULT 0,
+                    leased_by TEXT
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(messages)")}
+            # Inboxes created before fair queuing
+            if "sender" not in columns:
+                conn.execute("ALTER TABLE messages ADD COLUMN sender TEXT")
+                conn.execute("ALTER TABLE messages ADD COLUMN finish_tag REAL NOT NULL DEFAULT 0")
+            # Inboxes created before leases recorded their owner
+            if "leased_by" not in columns:
+                conn.execute("ALTER TABLE messages ADD COLUMN leased_by TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_visible ON messages (visible_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages (sender, finish_tag)")
+            self._virtual_time = conn.execute("SELECT COALESCE(MIN(finish_tag), 0) FROM messages").fetchone()[0]
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS received (
+                    msg_id TEXT PRIMARY KEY,
+                    received_at REAL NOT NULL,
+                    state TEXT NOT NULL,
+                    reply TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_received_at ON received (received_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS dead_letters (
+                    id INTEGER PRIMARY KEY,
+                    msg_id TEXT,
+                    payload TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    failed_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    error TEXT
+                )
+            """)
+
+    def append(self, payload: dict) -> Optional[int]:
+        """Persist a message; once this returns it survives a restart. Returns None for a seen msg_id."""
+        now = time.time()
+        msg_id = payload.get("msg_id")
+        with self._lock, self._get_conn() as conn:
+            if msg_id:
+                # The primary key makes check-and-record atomic, even across processes
+                inserted = conn.execute(
+                    "INSERT OR IGNORE INTO received (msg_id, received_at, state) VALUES (?, ?, 'queued')",
+                    (msg_id, now)
+                ).rowcount
+                if not inserted:
+                    return None
+            self._appends += 1
+            if self._appends % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM received WHERE received_at < ?", (now - self.dedup_ttl,))
+            sender = payload.get("sender")
+            last_tag = conn.execute("SELECT MAX(finish_tag) FROM messages WHERE sender = ?", (sender,)).fetchone()[0]
+            finish_tag = max(self._virtual_time, last_tag or 0) + 1 / self.weights.get(sender, 1.0)
+            cursor = conn.execute(
+                "INSERT INTO messages (msg_id, payload, enqueued_at, visible_at, sender, finish_tag) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (msg_id, json.dumps(payload), now, now, sender, finish_tag)
+            )
+            return cursor.lastrowid
+
+    def claim(self) -> Optional[dict]:
+        """Lease the visible message with the smallest finish tag, or None if there is nothing to do."""
+        now = time.time()
+        with self._lock, self._get_conn() as conn:
+            row = conn.execute(
+                "SELECT id, payload, attempts, enqueued_at, finish_tag FROM messages WHERE visible_at <= ? "
+                "ORDER BY finish_tag, id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if not row:
+                return None
+            self._virtual_time = max(self._virtual_time, row[4])
+            conn.execute(
+                "UPDATE messages SET visible_at = ?, attempts = attempts + 1, leased_by = ? WHERE id = ?",
+                (now + self.visibility_timeout, self.owner, row[0])
+            )
+        return {"id": row[0], "payload": json.loads(row[1]), "attempts": row[2] + 1, "enqueued_at": row[3]}
+
+    def ack(self, message_id: int, reply: str = None):
+        """Done: drop the message and record the reply as its outcome."""
+        with self._lock, self._get_conn() as conn:
+            conn.execute(
+                "UPDATE received SET state = 'done', reply = ? WHERE msg_id = (SELECT msg_id FROM messages WHERE id = ?)",
+                (reply, message_id)
+            )
+            conn.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+
+    def remember(self, key: str) -> bool:
+        """
+        Record a delivery that does not go through the queue (e.g. a task
+        callback) as in progress under `key`. False if it was seen before.
+        """
+        with self._lock, self._get_conn() as conn:
+            return conn.execute(
+                "INSERT OR IGNORE INTO received (msg_id, received_at, state) VALUES (?, ?, 'queued')",
+                (key, time.time())
+            ).rowcount > 0
+
+    def settle(self, key: str, reply: str = None):
+        """A remembered delivery was handled; `reply` is its outcome."""
+        with self._lock, self._get_conn() as conn:
+            conn.execute("UPDATE received SET state = 'done', reply = ? WHERE msg_id = ?", (reply, key))
+
+    def forget(self, key: str):
+        """A remembered delivery could not be handled; let its retry through."""
+        with self._lock, self._get_conn() as conn:
+            conn.execute("DELETE FROM received WHERE msg_id = ?", (key,))
+
+    def outcome(self, msg_id: str) -> Optional[dict]:
+        """{"state", "reply"} recorded for a msg_id, or None if it was never received."""
+        with self._get_conn() as conn:
+            row = conn.execute("SELECT state, reply FROM received WHERE msg_id = ?", (msg_id,)).fetchone()
+        return {"state": row[0], "reply": row[1]} if row else None
+
+    def fail(self, message_id: int, error: str) -> bool:
+        """Schedule a retry with exponential backoff; returns True if the message was dead-lettered instead."""
+        now = time.time()
+        with self._lock, self._get_conn() as conn:
+            row = conn.execute(
+                "SELECT msg_id, payload, enqueued_at, attempts FROM messages WHERE id = ?", (message_id,)
+            ).fetchone()
+            if not row:
+                return False
+            msg_id, payload, enqueued_at, attempts = row
+            if attempts >= self.max_attempts:
+                conn.execute(
+                    "INSERT INTO dead_letters (id, msg_id, payload, enqueued_at, failed_at, attempts, error) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (message_id, msg_id, payload, enqueued_at, now, attempts, error)
+                )
+                conn.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+                conn.execute("UPDATE received SET state = 'failed' WHERE msg_id = ?", (msg_id,))
+                return True
+            conn.execute(
+                "UPDATE messages SET visible_at = ?, last_error = ?, leased_by = NULL WHERE id = ?",
+                (now + min(60, 2 ** attempts), error, message_id)
+            )
+            return False
+
+    def recover(self) -> int:
+        """
+        Messages leased by a previous run of this owner are visible again right
+        away. Live leases of other processes and retries backing off are left alone.
+        """
+        now = time.time()
+        with self._lock, self._get_conn() as conn:
+            return conn.execute(
+                "UPDATE messages SET visible_at = ?, leased_by = NULL WHERE leased_by = ? AND visible_at > ?",
+                (now, self.owner, now)
+            ).rowcount
+
+    def dead_letters(self, limit: int = 50) -> list:
+        with self._get_conn() as conn:
+            rows = conn.execute(
+                "SELECT id, msg_id, payload, enqueued_at, failed_at, attempts, error FROM dead_letters "
+                "ORDER BY failed_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        keys = ("id", "msg_id", "payload", "enqueued_at", "failed_at", "attempts", "error")
+        return [dict(zip(keys, row), payload=json.loads(row[2])) for row in rows]
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._get_conn() as conn:
+            depth, in_flight, oldest = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(visible_at > ? AND attempts > 0), 0), MIN(enqueued_at) FROM messages",
+                (now,)
+            ).fetchone()
+            dead = conn.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+        return {
+            "depth": depth,
+            "in_flight": in_flight,
+            "oldest_age": round(now - oldest, 3) if oldest else 0.0,
+            "dead_letters": dead,
+        }
+
+class DedupCache:
+    """Bounded LRU of msg_id -> outcome whose entries expire after `ttl` seconds."""
+    def __init__(self, capacity: int = 10000, ttl: float = 86400.0):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, msg_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(msg_id)
+            if entry is None:
+                return None
+            expires_at, outcome = entry
+            if expires_at < time.monotonic():
+                del self._entries[msg_id]
+                return None
+            self._entries.move_to_end(msg_id)
+            return outcome
+
+    def put(self, msg_id: str, outcome: dict):
+        with self._lock:
+            self._entries[msg_id] = (time.monotonic() + self.ttl, outcome)
+            self._entries.move_to_end(msg_id)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+class InboxWorkers:
+    """
+    Async workers draining the inbox. They sleep until `notify()` (called
+    after an append) or `poll_interval`, which picks up retries whose
+    backoff has elapsed. SQLite calls run in threads, off the event loop.
+    """
+    def __init__(self, inbox: Inbox, handler: Callable[[dict], Awaitable[Optional[str]]], workers: int = 8,
+                 poll_interval: float = 1.0):
+        self.inbox = inbox
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stats = {"processed": 0, "retried": 0, "dead_lettered": 0}
+        self._tasks = []
+        self._wakeup = None
+
+    def start(self):
+        """Call from the running event loop (e.g. a startup hook)."""
+        recovered = self.inbox.recover()
+        if recovered:
+            logger.warning(f"Re-queued {recovered} messages left in flight by a previous run")
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.get_running_loop().create_task(self._run(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self, worker: int):
+        while True:
+            message = await asyncio.to_thread(self.inbox.claim)
+            if message is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # Several messages may be waiting; let the other workers look too
+            self._wakeup.set()
+            try:
+                reply = await self.handler(message["payload"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Worker {worker} failed message {message['id']} (attempt {message['attempts']}): {e}")
+                dead = await asyncio.to_thread(self.inbox.fail, message["id"], str(e))
+                self.stats["dead_lettered" if dead else "retried"] += 1
+                continue
+            await asyncio.to_thread(self.inbox.ack, message["id"], reply)
+            self.stats["processed"] += 1
+
+# Singleton instance
+inbox = Inbox(
+    visibility_timeout=float(os.getenv("GATEWAY_VISIBILITY_TIMEOUT", "60")),
+    max_attempts=int(os.getenv("GATEWAY_MAX_ATTEMPTS", "5")),
+    dedup_ttl=float(os.getenv("GATEWAY_DEDUP_TTL", "86400")),
+    owner=os.getenv("GATEWAY_INSTANCE_ID")
+)
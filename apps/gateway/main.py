@@ -1,14 +1,24 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-import requests
+from typing import Optional
 import sys
 import os
+import json
 from pathlib import Path
 
 # Add project root to path to import core shared logger
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 from apps.sidecar.core.logger import get_logger, setup_logging_config
+from apps.sidecar.core.config import config_manager
+from apps.sidecar.core.metrics import metrics, loop_monitor
+from apps.sidecar.core.signing import verify, DELIVERY_HEADER, SIGNATURE_HEADER, TIMESTAMP_HEADER
+from apps.gateway.sidecar_client import SidecarClient, CircuitBreaker, SidecarUnavailable
+from apps.gateway.inbox import inbox, InboxWorkers, DedupCache
+from apps.gateway.outbox import outbox, ReplySender, WeChatTransport, log_transport
+from apps.gateway.admission import Admission
 
 # Setup Logger (Shared Config)
 # Note: In a real microservice, Gateway might have its own logger config, 
@@ -19,7 +29,54 @@ logger = get_logger("gateway")
 app = FastAPI(title="Contex Remote Gateway (WeChat)")
 
 # Configuration
-SIDECAR_URL = "http://127.0.0.1:12345"
+SIDECAR_URL = os.getenv("SIDECAR_URL", "http://127.0.0.1:12345")
+# Where the sidecar POSTs finished tasks, signed with the CALLBACK_SECRET both
+# sides share; without a secret no callbacks are requested or accepted
+CALLBACK_URL = os.getenv("GATEWAY_CALLBACK_URL", "http://127.0.0.1:12346/callbacks/task")
+CALLBACK_SECRET = os.getenv("CALLBACK_SECRET")
+
+# Shared keep-alive pool for every call to the sidecar
+sidecar = SidecarClient(
+    SIDECAR_URL,
+    connect_timeout=float(os.getenv("SIDECAR_CONNECT_TIMEOUT", "2")),
+    read_timeout=float(os.getenv("SIDECAR_READ_TIMEOUT", "10")),
+    retries=int(os.getenv("SIDECAR_RETRIES", "2")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("SIDECAR_BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("SIDECAR_BREAKER_RESET", "30"))
+    )
+)
+
+def _limits(snapshot) -> dict:
+    return {
+        "sender_per_minute": float(snapshot.get("BRIEF_SENDER_PER_MINUTE", 1)),
+        "sender_burst": float(snapshot.get("BRIEF_SENDER_BURST", 3)),
+        "global_per_minute": float(snapshot.get("BRIEF_GLOBAL_PER_MINUTE", 30)),
+        "global_burst": float(snapshot.get("BRIEF_GLOBAL_BURST", 30)),
+    }
+
+def _weights(snapshot) -> dict:
+    weights = snapshot.get("SENDER_WEIGHTS") or {}
+    if isinstance(weights, str):
+        weights = json.loads(weights)
+    return {sender: float(weight) for sender, weight in weights.items()}
+
+def _on_config_change(snapshot):
+    try:
+        limits, weights = _limits(snapshot), _weights(snapshot)
+    except (TypeError, ValueError, AttributeError) as e:
+        logger.error(f"Ignoring invalid gateway limits in config version {snapshot.version}: {e}")
+        return
+    if limits != admission.limits():
+        logger.info(f"Brief limits changed: {limits}")
+        admission.configure(**limits)
+    inbox.weights = weights
+
+# /brief starts a container; one sender must not be able to monopolise them
+admission = Admission(**_limits(config_manager.snapshot()))
+inbox.weights = _weights(config_manager.snapshot())
+config_manager.subscribe(_on_config_change)
+brief_requests = metrics.counter("gateway_brief_requests", "/brief admission decisions", ("outcome",))
 
 class WeChatMsg(BaseModel):
     msg_id: str
@@ -31,62 +88,246 @@ class ReplyMsg(BaseModel):
     recipient: str
     content: str
 
-def process_message_task(msg: WeChatMsg):
+def brief_rejection(sender: str) -> Optional[str]:
+    """Reply for a /brief over the sender's or the global rate limit, or None if it is admitted."""
+    admitted, scope, retry_after = admission.check(sender)
+    brief_requests.inc("admitted" if admitted else f"rejected_{scope}")
+    if admitted:
+        return None
+    logger.warning(f"Rate limited /brief from {sender} ({scope}), retry after {retry_after}s")
+    if scope == "sender":
+        return f"You're requesting briefs too often. Please try again in {retry_after} seconds."
+    return f"Contex Brain is busy right now. Please try again in {retry_after} seconds."
+
+async def process_message_task(msg: WeChatMsg) -> str:
     """
     Background task to process message and interact with Sidecar.
+    Runs on the event loop; sidecar calls never block other messages.
+    Returns the reply sent, which is recorded as the message's outcome.
     """
     logger.info(f"Processing message from {msg.sender}: {msg.content}")
     
     # 1. Simple Command Parsing
     command = msg.content.strip().lower()
     
-    if command.startswith("/brief"):
+    rejection = brief_rejection(msg.sender) if command.startswith("/brief") else None
+
+    if rejection:
+        reply = rejection
+
+    elif command.startswith("/brief"):
         # Trigger Daily Brief Skill
         try:
             logger.info("Triggering Daily Brief...")
             # In a real scenario, we might parse topics from the message
-            payload = {"task_name": "daily-brief"}
-            res = requests.post(f"{SIDECAR_URL}/run-task", json=payload)
-            
-            if res.status_code == 200:
-                send_wechat_reply(msg.sender, "Daily Brief started! I'll update you when it's ready.")
-                # Note: Getting the result back requires Sidecar to support Webhooks or polling
-                # For MVP, we stop here.
+            # The brief itself arrives at /callbacks/task once the task ends,
+            # which needs the secret shared with the sidecar
+            res = await sidecar.run_task(
+                "daily-brief", callback_url=CALLBACK_URL if CALLBACK_SECRET else None,
+                callback_context={"msg_id": msg.msg_id, "sender": msg.sender}
+            )
+
+            body = res.json() if res.status_code == 200 else {}
+            if body.get("reused") and body.get("result"):
+                # A brief generated moments ago for someone else is still fresh
+                reply = body["result"]
+            elif res.status_code == 200 and CALLBACK_SECRET:
+                reply = "Daily Brief started! I'll send it to you as soon as it's ready."
+            elif res.status_code == 200:
+                reply = "Daily Brief started!"
             else:
-                send_wechat_reply(msg.sender, f"Failed to start task: {res.text}")
-                
+                reply = f"Failed to start task: {res.text}"
+
+        except SidecarUnavailable as e:
+            logger.warning(f"Not calling Sidecar: {e}")
+            reply = "Contex Brain is temporarily unavailable. Please try again in a minute."
         except Exception as e:
             logger.error(f"Error calling Sidecar: {e}")
-            send_wechat_reply(msg.sender, "Error connecting to Contex Brain.")
-            
+            reply = "Error connecting to Contex Brain."
+
     elif command == "/ping":
-        send_wechat_reply(msg.sender, "Pong! Gateway is online.")
-        
+        reply = "Pong! Gateway is online."
+
     else:
-        send_wechat_reply(msg.sender, f"Unknown command: {command}. Try /brief")
+        reply = f"Unknown command: {command}. Try /brief"
 
-def send_wechat_reply(recipient: str, content: str):
-    """
-    Mock function to send reply back to WeChat.
-    In production, this would call the WeChat API.
-    """
-    logger.info(f"--- [WECHAT REPLY] To: {recipient} ---\n{content}\n-----------------------")
+    await send_wechat_reply(msg.sender, reply)
+    return reply
+
+async def handle_inbox_message(payload: dict) -> str:
+    reply = await process_message_task(WeChatMsg(**payload))
+    dedup.put(payload["msg_id"], {"state": "done", "reply": reply})
+    return reply
+
+workers = InboxWorkers(inbox, handle_inbox_message, workers=int(os.getenv("GATEWAY_WORKERS", "8")))
+# Fast path in front of the inbox's persistent msg_id table
+dedup = DedupCache(
+    capacity=int(os.getenv("GATEWAY_DEDUP_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("GATEWAY_DEDUP_TTL", "86400"))
+)
+dedup_lookups = metrics.counter("gateway_dedup_lookups", "Webhook msg_id lookups by result", ("result",))
+
+metrics.gauge_callback("gateway_inbox_depth", "Messages in the inbox, including leased ones", lambda: inbox.stats()["depth"])
+metrics.gauge_callback(
+    "gateway_inbox_in_flight", "Messages leased by a worker or waiting for a retry", lambda: inbox.stats()["in_flight"]
+)
+metrics.gauge_callback(
+    "gateway_inbox_oldest_age_seconds", "Age of the oldest message in the inbox", lambda: inbox.stats()["oldest_age"]
+)
+metrics.gauge_callback("gateway_inbox_dead_letters", "Messages that exhausted their attempts", lambda: inbox.stats()["dead_letters"])
+metrics.counter_callback(
+    "gateway_inbox_handled", "Messages handled by the workers, by outcome", lambda: workers.stats, ("outcome",)
+)
+
+# Replies go through the WeChat API when WECHAT_API_URL is set, else to the log
+WECHAT_API_URL = os.getenv("WECHAT_API_URL")
+transport = WeChatTransport(WECHAT_API_URL, os.getenv("WECHAT_ACCESS_TOKEN")) if WECHAT_API_URL else log_transport
+reply_send_seconds = metrics.histogram("gateway_reply_send_seconds", "WeChat API calls for replies, by outcome", ("outcome",))
+replies = ReplySender(
+    outbox,
+    transport,
+    rate=float(os.getenv("WECHAT_RATE", "20")),
+    burst=float(os.getenv("WECHAT_BURST", "40")),
+    recipient_rate=float(os.getenv("WECHAT_RECIPIENT_RATE", "1")),
+    recipient_burst=float(os.getenv("WECHAT_RECIPIENT_BURST", "5")),
+    observe=lambda outcome, seconds: reply_send_seconds.observe(seconds, outcome)
+)
+metrics.gauge_callback("gateway_outbox_depth", "Reply chunks waiting to be sent", lambda: outbox.stats()["depth"])
+metrics.gauge_callback(
+    "gateway_outbox_oldest_age_seconds", "Age of the oldest unsent reply chunk", lambda: outbox.stats()["oldest_age"]
+)
+metrics.gauge_callback("gateway_outbox_failed", "Reply chunks that exhausted their attempts", lambda: outbox.stats()["failed"])
+metrics.counter_callback(
+    "gateway_replies", "Reply sends by outcome; coalesced counts chunks merged into another send",
+    lambda: replies.stats, ("outcome",)
+)
+
+async def send_wechat_reply(recipient: str, content: str):
+    """Queue a reply; the reply sender delivers it within the WeChat rate limits."""
+    await run_in_threadpool(outbox.enqueue, recipient, content)
+    replies.notify()
 
 @app.post("/webhook/wechat")
-async def wechat_webhook(msg: WeChatMsg, background_tasks: BackgroundTasks):
+async def wechat_webhook(msg: WeChatMsg):
     """
     Endpoint to receive messages from WeChat (or a Mock Client).
+    The message is only persisted here; inbox workers process it.
     """
     logger.info(f"Received WeChat message: {msg}")
-    
-    # Process in background to reply quickly to WeChat server
-    background_tasks.add_task(process_message_task, msg)
-    
+
+    # WeChat redelivers when we are slow to answer; a msg_id is handled once
+    outcome = dedup.get(msg.msg_id)
+    if outcome:
+        dedup_lookups.inc("hit_memory")
+        logger.info(f"Duplicate delivery of {msg.msg_id} ({outcome['state']})")
+        return {"status": "duplicate", "msg_id": msg.msg_id, **outcome}
+
+    # Acknowledge WeChat only once the message is durable
+    message_id = await run_in_threadpool(inbox.append, msg.model_dump())
+    if message_id is None:
+        outcome = await run_in_threadpool(inbox.outcome, msg.msg_id)
+        dedup.put(msg.msg_id, outcome)
+        dedup_lookups.inc("hit_store")
+        logger.info(f"Duplicate delivery of {msg.msg_id} ({outcome['state']})")
+        return {"status": "duplicate", "msg_id": msg.msg_id, **outcome}
+
+    dedup_lookups.inc("miss")
+    dedup.put(msg.msg_id, {"state": "queued", "reply": None})
+    workers.notify()
+
     return {"status": "received", "msg_id": msg.msg_id}
 
+@app.post("/callbacks/task")
+async def task_callback(request: Request):
+    """
+    Completion callback from the sidecar: replies to the sender with the task's
+    result. Deliveries must be signed with CALLBACK_SECRET (without one the
+    endpoint is disabled), and retried ones are answered only once, also
+    across restarts: the delivery id is recorded in the inbox database.
+    """
+    if not CALLBACK_SECRET:
+        raise HTTPException(status_code=403, detail="Task callbacks are disabled: CALLBACK_SECRET is not set")
+    body = await request.body()
+    headers = request.headers
+    if not verify(CALLBACK_SECRET, headers.get(TIMESTAMP_HEADER), headers.get(SIGNATURE_HEADER), body):
+        logger.warning("Rejected task callback with a missing or invalid signature")
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    try:
+        event = json.loads(body)
+        status, task_id = event["status"], event["task_id"]
+        context = event.get("context") or {}
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed callback: {e!r}")
+    if not isinstance(context, dict) or not context.get("sender"):
+        raise HTTPException(status_code=422, detail="Callback has no sender in its context")
+    delivery = f"callback:{headers.get(DELIVERY_HEADER) or task_id + ':' + str(context.get('msg_id'))}"
+    if dedup.get(delivery) or not await run_in_threadpool(inbox.remember, delivery):
+        return {"status": "duplicate"}
+
+    if status == "succeeded" and event.get("result"):
+        reply = event["result"]
+    elif status == "succeeded":
+        reply = "Daily Brief finished, but it produced no content."
+    else:
+        reply = f"Daily Brief {status}: {event.get('error') or 'unknown error'}"
+    try:
+        await send_wechat_reply(context["sender"], reply)
+    except Exception:
+        # Not handled after all: the sidecar's retry must get through
+        await run_in_threadpool(inbox.forget, delivery)
+        raise
+    await run_in_threadpool(inbox.settle, delivery, reply)
+    dedup.put(delivery, {"state": "done", "reply": reply})
+    return {"status": "sent"}
+
+@app.get("/inbox/stats")
+async def inbox_stats():
+    return {**await run_in_threadpool(inbox.stats), **workers.stats}
+
+@app.get("/outbox/stats")
+async def outbox_stats():
+    return {**await run_in_threadpool(outbox.stats), **replies.stats}
+
+@app.get("/admission/stats")
+async def admission_stats(limit: int = 50):
+    """/brief limits, admitted/rejected totals and the busiest senders."""
+    return {
+        "limits": admission.limits(),
+        **admission.totals(),
+        "senders": admission.top(limit),
+    }
+
+@app.get("/inbox/dead-letters")
+async def inbox_dead_letters(limit: int = 50):
+    return await run_in_threadpool(inbox.dead_letters, limit)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(await run_in_threadpool(metrics.render), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "component": "gateway"}
+    return {"status": "ok", "component": "gateway", "sidecar_breaker": sidecar.breaker.state}
+
+@app.on_event("startup")
+async def startup_event():
+    loop_monitor.start()
+    config_manager.start_watching()
+    workers.start()
+    replies.start()
+    if not CALLBACK_SECRET:
+        logger.warning("CALLBACK_SECRET is not set: finished briefs will not be sent to their senders")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await workers.stop()
+    await replies.stop()
+    if isinstance(transport, WeChatTransport):
+        await transport.aclose()
+    loop_monitor.stop()
+    config_manager.stop_watching()
+    await sidecar.aclose()
 
 if __name__ == "__main__":
     # Run on port 12346 to avoid conflict with Sidecar
@@ -0,0 +1,386 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+import httpx
+from apps.gateway.inbox import INBOX_DB_PATH
+from apps.sidecar.core.logger import get_logger
+
+logger = get_logger("gateway.outbox")
+
+# Separator between pending replies coalesced into one message
+JOINER = "\n\n"
+
+class ReplyFailed(Exception):
+    """A reply the WeChat API refused; `retryable` is False when resending cannot help."""
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+def split_message(content: str, max_bytes: int) -> list:
+    """Split into UTF-8 chunks of at most `max_bytes`, preferring paragraph, line and word boundaries."""
+    chunks = []
+    while len(content.encode()) > max_bytes:
+        # Longest prefix that fits, then back off to the last natural break in it
+        head = content.encode()[:max_bytes].decode(errors="ignore") or content[0]
+        cut = len(head)
+        for separator in ("\n\n", "\n", " "):
+            position = head.rfind(separator)
+            if position > len(head) // 2:
+                cut = position
+                break
+        chunks.append(content[:cut].rstrip())
+        content = content[cut:].lstrip()
+    if content or not chunks:
+        chunks.append(content)
+    return chunks
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`."""
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 if one is now)."""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.burst
+
+class Outbox:
+    """
+    Durable queue of outgoing WeChat replies in SQLite, next to the inbox.
+    Replies are split into chunks of at most `max_bytes` on enqueue; a claim
+    takes the oldest due chunks of one recipient, as many as fit into one
+    message, and leases them for `lease_timeout` seconds. Failed sends back
+    off exponentially and are moved to `failed_replies` after `max_attempts`.
+    """
+    def __init__(self, db_path: Path = INBOX_DB_PATH, max_bytes: int = 2048, lease_timeout: float = 30.0,
+                 max_attempts: int = 5, max_backoff: float = 60.0):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _get_conn(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        with self._get_conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbound (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    recipient TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    visible_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outbound_recipient ON outbound (recipient, id)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS failed_replies (
+                    id INTEGER PRIMARY KEY,
+                    recipient TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    failed_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    error TEXT
+                )
+            """)
+
+    def enqueue(self, recipient: str, content: str) -> list:
+        """Persist a reply, split to the size cap; returns the ids of its chunks."""
+        now = time.time()
+        with self._lock, self._get_conn() as conn:
+            return [
+                conn.execute(
+                    "INSERT INTO outbound (recipient, content, enqueued_at, visible_at) VALUES (?, ?, ?, ?)",
+                    (recipient, chunk, now, now)
+                ).lastrowid
+                for chunk in split_message(content, self.max_bytes)
+            ]
+
+    def due_recipients(self, limit: int = 100) -> list:
+        """Recipients with a chunk ready to send, longest waiting first."""
+        with self._get_conn() as conn:
+            rows = conn.execute(
+                "SELECT recipient FROM outbound GROUP BY recipient HAVING MIN(visible_at) <= ? ORDER BY MIN(id) LIMIT ?",
+                (time.time(), limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def claim(self, recipient: str) -> list:
+        """
+        Lease the recipient's oldest chunks that fit into one message, in order.
+        Nothing is returned while an earlier chunk is leased or backing off.
+        """
+        now = time.time()
+        with self._lock, self._get_conn() as conn:
+            rows = conn.execute(
+                "SELECT id, content, visible_at, attempts FROM outbound WHERE recipient = ? ORDER BY id",
+                (recipient,)
+            ).fetchall()
+            batch, size = [], -len(JOINER.encode())
+            for message_id, content, visible_at, attempts in rows:
+                size += len(JOINER.encode()) + len(content.encode())
+                if visible_at > now or (batch and size > self.max_bytes):
+                    break
+                batch.append({"id": message_id, "content": content, "attempts": attempts + 1})
+            if batch:
+                conn.execute(
+                    f"UPDATE outbound SET visible_at = ?, attempts = attempts + 1 "
+                    f"WHERE id IN ({', '.join('?' for _ in batch)})",
+                    (now + self.lease_timeout, *(m["id"] for m in batch))
+                )
+        return batch
+
+    def ack(self, ids: list):
+        with self._lock, self._get_conn() as conn:
+            conn.execute(f"DELETE FROM outbound WHERE id IN ({', '.join('?' for _ in ids)})", ids)
+
+    def fail(self, ids: list, error: str, retryable: bool = True) -> bool:
+        """Back off before the next attempt; returns True if the chunks were moved to failed_replies instead."""
+        now = time.time()
+        placeholders = ", ".join("?" for _ in ids)
+        with self._lock, self._get_conn() as conn:
+            attempts = conn.execute(f"SELECT MAX(attempts) FROM outbound WHERE id IN ({placeholders})", ids).fetchone()[0]
+            if attempts is None:
+                return False
+            if not retryable or attempts >= self.max_attempts:
+                conn.execute(
+                    f"INSERT INTO failed_replies (id, recipient, content, enqueued_at, failed_at, attempts, error) "
+                    f"SELECT id, recipient, content, enqueued_at, ?, attempts, ? FROM outbound WHERE id IN ({placeholders})",
+                    (now, error, *ids)
+                )
+                conn.execute(f"DELETE FROM outbound WHERE id IN ({placeholders})", ids)
+                return True
+            conn.execute(
+                f"UPDATE outbound SET visible_at = ?, last_error = ? WHERE id IN ({placeholders})",
+                (now + min(self.max_backoff, 2 ** attempts), error, *ids)
+            )
+            return False
+
+    def recover(self) -> int:
+        """Chunks leased (or backing off) in a previous gateway process are due again right away."""
+        now = time.time()
+        with self._lock, self._get_conn() as conn:
+            return conn.execute(
+                "UPDATE outbound SET visible_at = ? WHERE visible_at > ? AND attempts > 0",
+                (now, now)
+            ).rowcount
+
+    def next_visible_in(self, exclude=()) -> Optional[float]:
+        """Seconds until the next chunk of a recipient not in `exclude` becomes due, or None if there is none."""
+        with self._get_conn() as conn:
+            visible_at = conn.execute(
+                f"SELECT MIN(visible_at) FROM outbound WHERE recipient NOT IN ({', '.join('?' for _ in exclude)})",
+                tuple(exclude)
+            ).fetchone()[0]
+        return None if visible_at is None else max(0.0, visible_at - time.time())
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._get_conn() as conn:
+            depth, recipients, oldest = conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT recipient), MIN(enqueued_at) FROM outbound"
+            ).fetchone()
+            failed = conn.execute("SELECT COUNT(*) FROM failed_replies").fetchone()[0]
+        return {
+            "depth": depth,
+            "recipients": recipients,
+            "oldest_age": round(now - oldest, 3) if oldest else 0.0,
+            "failed": failed,
+        }
+
+class WeChatTransport:
+    """Sends text through the WeChat customer service message API (or a compatible stub)."""
+    # errcodes worth a retry: system busy, API frequency limits
+    RETRY_ERRCODES = (-1, 45009, 45047)
+
+    def __init__(self, api_url: str, access_token: str = None, timeout: float = 10.0):
+        self.api_url = api_url
+        self.access_token = access_token
+        self.timeout = timeout
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __call__(self, recipient: str, content: str):
+        params = {"access_token": self.access_token} if self.access_token else None
+        body = {"touser": recipient, "msgtype": "text", "text": {"content": content}}
+        try:
+            res = await self.client.post(self.api_url, params=params, json=body)
+        except httpx.TransportError as e:
+            raise ReplyFailed(f"transport error: {e}")
+        if res.status_code == 429 or res.status_code >= 500:
+            raise ReplyFailed(f"HTTP {res.status_code}")
+        if res.status_code != 200:
+            raise ReplyFailed(f"HTTP {res.status_code}", retryable=False)
+        errcode = res.json().get("errcode", 0)
+        if errcode:
+            raise ReplyFailed(f"errcode {errcode}", retryable=errcode in self.RETRY_ERRCODES)
+
+async def log_transport(recipient: str, content: str):
+    """Stand-in for the WeChat API when none is configured."""
+    logger.info(f"--- [WECHAT REPLY] To: {recipient} ---\n{content}\n-----------------------")
+
+class ReplySender:
+    """
+    Async dispatcher draining the outbox within a global token bucket and
+    one bucket per recipient. At most one batch per recipient is in flight,
+    which keeps each recipient's replies in order, and at most
+    `max_in_flight` overall. Records sends in `stats` and the `observe` hook.
+    """
+    def __init__(self, outbox: Outbox, transport: Callable[[str, str], Awaitable[None]],
+                 rate: float = 20.0, burst: float = 40.0, recipient_rate: float = 1.0, recipient_burst: float = 5.0,
+                 max_in_flight: int = 8, poll_interval: float = 1.0, observe: Callable = None):
+        self.outbox = outbox
+        self.transport = transport
+        self.bucket = TokenBucket(rate, burst)
+        self.recipient_rate = recipient_rate
+        self.recipient_burst = recipient_burst
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.observe = observe
+        self.stats = {"sent": 0, "retried": 0, "failed": 0, "coalesced": 0}
+        self._buckets = {}
+        self._in_flight = {}
+        self._task = None
+        self._wakeup = None
+
+    def start(self):
+        """Call from the running event loop (e.g. a startup hook)."""
+        recovered = self.outbox.recover()
+        if recovered:
+            logger.warning(f"Re-queued {recovered} replies left in flight by a previous run")
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        tasks = [task for task in (self._task, *self._in_flight.values()) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._in_flight = {}
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _recipient_bucket(self, recipient: str) -> TokenBucket:
+        bucket = self._buckets.get(recipient)
+        if bucket is None:
+            if len(self._buckets) > 10000:
+                # A full bucket is the same as a new one
+                self._buckets = {r: b for r, b in self._buckets.items() if not b.full}
+            bucket = self._buckets[recipient] = TokenBucket(self.recipient_rate, self.recipient_burst)
+        return bucket
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            wait = await self._dispatch()
+            if wait == 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), min(wait, self.poll_interval))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _dispatch(self) -> float:
+        """Start one send if limits allow; returns 0 if one started, else how long to wait."""
+        if len(self._in_flight) >= self.max_in_flight:
+            return self.poll_interval
+        wait = self.bucket.wait_time()
+        if wait > 0:
+            return wait
+
+        for recipient in await asyncio.to_thread(self.outbox.due_recipients):
+            if recipient in self._in_flight:
+                continue
+            bucket = self._recipient_bucket(recipient)
+            recipient_wait = bucket.wait_time()
+            if recipient_wait > 0:
+                wait = min(wait, recipient_wait) if wait else recipient_wait
+                continue
+            batch = await asyncio.to_thread(self.outbox.claim, recipient)
+            if not batch:
+                continue
+            self.bucket.take()
+            bucket.take()
+            self._in_flight[recipient] = asyncio.get_running_loop().create_task(self._send(recipient, batch))
+            return 0
+
+        if wait:
+            return wait
+        # Recipients with a send in flight are skipped until it finishes, which notify()s
+        next_due = await asyncio.to_thread(self.outbox.next_visible_in, tuple(self._in_flight))
+        return self.poll_interval if next_due is None else max(next_due, 0.01)
+
+    async def _send(self, recipient: str, batch: list):
+        ids = [message["id"] for message in batch]
+        started = time.perf_counter()
+        try:
+            await self.transport(recipient, JOINER.join(message["content"] for message in batch))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            retryable = getattr(e, "retryable", True)
+            dead = await asyncio.to_thread(self.outbox.fail, ids, str(e), retryable)
+            outcome = "failed" if dead else "retried"
+            log = logger.error if dead else logger.warning
+            log(f"Reply to {recipient} {outcome} (attempt {max(m['attempts'] for m in batch)}): {e}")
+        else:
+            await asyncio.to_thread(self.outbox.ack, ids)
+            outcome = "sent"
+            self.stats["coalesced"] += len(batch) - 1
+        finally:
+            self._in_flight.pop(recipient, None)
+            self.notify()
+        self.stats[outcome] += 1
+        if self.observe:
+            self.observe(outcome, time.perf_counter() - started)
+
+# Singleton instance
+outbox = Outbox(
+    max_bytes=int(os.getenv("WECHAT_MAX_MESSAGE_BYTES", "2048")),
+    max_attempts=int(os.getenv("WECHAT_REPLY_MAX_ATTEMPTS", "5"))
+)
@@ -0,0 +1,133 @@
+import time
+import random
+import asyncio
+import httpx
+from apps.sidecar.core.logger import get_logger
+
+logger = get_logger("gateway.sidecar_client")
+
+# Worth another attempt: the sidecar is restarting or overloaded
+RETRY_STATUSES = (502, 503, 504)
+
+class SidecarUnavailable(Exception):
+    """Raised without touching the network while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds; then lets one trial call through (half-open),
+    which closes the breaker on success or re-opens it on failure.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("Sidecar reachable again, closing circuit breaker")
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"Sidecar failed {self.failures} times in a row, opening circuit breaker")
+            self.opened_at = time.monotonic()
+
+class SidecarClient:
+    """
+    Async client for the sidecar API over one keep-alive connection pool.
+    Transport errors and 502/503/504 are retried with jittered exponential
+    backoff for idempotent requests; non-idempotent ones are only retried
+    when the connection was never established, so nothing runs twice.
+    """
+    def __init__(self, base_url: str, connect_timeout: float = 2.0, read_timeout: float = 10.0,
+                 retries: int = 2, backoff: float = 0.2, max_connections: int = 20,
+                 breaker: CircuitBreaker = None):
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.breaker = breaker or CircuitBreaker()
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the event loop that serves the gateway
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, path: str, idempotent: bool = None, **kwargs) -> httpx.Response:
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise SidecarUnavailable(f"circuit open after {self.breaker.failures} failures")
+            try:
+                res = await self.client.request(method, path, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # Never reached the sidecar, so any request is safe to resend
+                self.breaker.record_failure()
+                error, retryable = e, True
+            except httpx.TransportError as e:
+                self.breaker.record_failure()
+                error, retryable = e, idempotent
+            else:
+                if res.status_code not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    return res
+                self.breaker.record_failure()
+                if not idempotent or attempt >= self.retries:
+                    return res
+                error, retryable = None, True
+
+            if not retryable or attempt >= self.retries:
+                raise error
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+            logger.warning(f"{method} {path} failed ({error or res.status_code}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def run_task(self, task_name: str, force: bool = False, callback_url: str = None,
+                       callback_context: dict = None) -> httpx.Response:
+        body = {"task_name": task_name, "force": force}
+        if callback_url:
+            body.update(callback_url=callback_url, callback_context=callback_context)
+        return await self.request("POST", "/run-task", json=body)
+
+    async def health(self) -> bool:
+        try:
+            return (await self.request("GET", "/health")).status_code == 200
+        except (httpx.HTTPError, SidecarUnavailable):
+            return False
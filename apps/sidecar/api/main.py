@@ -1,19 +1,29 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Header, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from typing import Optional
 import uvicorn
 import os
 import sys
 import json
-import glob
-from pathlib import Path
+import asyncio
+import concurrent.futures
 
 # Add project root to path to import core
 sys.path.append(os.getcwd())
 
 # Initialize Config first to load .env
 from apps.sidecar.core.config import config_manager
-from apps.sidecar.core.docker_client import docker_client
-from apps.sidecar.core.logger import get_logger, get_logs, clear_logs, setup_logging_config
+from apps.sidecar.core.callbacks import callbacks
+from apps.sidecar.core.docker_client import async_docker_client
+from apps.sidecar.core.engine import engine
+from apps.sidecar.core.logger import get_logger, read_logs, clear_logs, setup_logging_config, log_broker, pipeline_stats
+from apps.sidecar.core.log_index import log_index, LogIndexBusy
+from apps.sidecar.core.metrics import metrics, loop_monitor, MetricsMiddleware
+from apps.sidecar.core.task_logs import task_logs
+from apps.sidecar.core.skills import skill_registry
+from apps.sidecar.core.tasks import task_manager, TaskQueueFull, TaskTooLarge, TaskStatus
 
 # Setup Global Logging
 setup_logging_config()
@@ -30,13 +40,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 class NotificationRequest(BaseModel):
     title: str
     content: str
+    task_id: Optional[str] = None
 
 class TaskRequest(BaseModel):
     task_name: str
+    # Start a new task even if an identical one is running or finished recently
+    force: bool = False
+    # POSTed the task's final record (signed) when it ends; `callback_context` is echoed back
+    callback_url: Optional[str] = None
+    callback_context: Optional[dict] = None
 
 class ConfigRequest(BaseModel):
     config: dict
@@ -45,9 +62,112 @@ class ConfigRequest(BaseModel):
 async def health_check():
     return {"status": "ok", "component": "sidecar"}
 
+@app.on_event("startup")
+async def startup_event():
+    loop_monitor.start()
+    config_manager.start_watching()
+    skill_registry.start()
+    callbacks.start()
+    recovered = await run_in_threadpool(callbacks.recover, task_manager.get)
+    if recovered:
+        logger.info(f"Scheduled {recovered} callbacks for tasks that ended during the last shutdown")
+    if os.getenv("LOG_INDEX_ENABLED", "true").lower() == "true":
+        log_index.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    loop_monitor.stop()
+    config_manager.stop_watching()
+    skill_registry.stop()
+    callbacks.stop()
+    log_index.stop()
+    async_docker_client.shutdown()
+    engine.shutdown()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text exposition of the sidecar's counters, gauges and histograms."""
+    # Plain def: some gauges (callbacks by state) are read from SQLite
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/pool/stats")
+async def pool_stats():
+    """Warm container pool statistics (disabled in mock mode)."""
+    return async_docker_client.pool_stats()
+
+@app.get("/engine/stats")
+async def engine_stats():
+    """Worker pool, log pump, thread and FD counts of the execution engine."""
+    return engine.stats()
+
 @app.get("/logs")
-async def fetch_logs():
-    return get_logs(200)
+def fetch_logs(response: Response, cursor: Optional[str] = None, limit: int = 200):
+    """
+    Last `limit` records, or only those written since `cursor`. The cursor to
+    pass on the next poll is returned in the X-Log-Cursor header.
+    """
+    # Plain def: file reads run in the threadpool instead of on the event loop
+    records, next_cursor = read_logs(limit=min(limit, 5000), cursor=cursor)
+    if next_cursor:
+        response.headers["X-Log-Cursor"] = next_cursor
+    return records
+
+@app.get("/logs/query")
+def query_logs(start: Optional[str] = None, end: Optional[str] = None, level: Optional[str] = None,
+               component: Optional[str] = None, task_id: Optional[str] = None, q: Optional[str] = None,
+               limit: int = 100, offset: int = 0):
+    """Search indexed logs by time range (ISO or epoch), level, component, task_id and text."""
+    try:
+        return log_index.query(start=start, end=end, level=level, component=component, task_id=task_id,
+                               q=q, limit=min(limit, 1000), offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LogIndexBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+@app.get("/logs/index/stats")
+async def log_index_stats():
+    return log_index.stats()
+
+@app.get("/logs/stream")
+async def stream_logs(request: Request, level: Optional[str] = None, component: Optional[str] = None,
+                      task_id: Optional[str] = None, cursor: Optional[int] = None,
+                      last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events feed of live log records. Each event id is the record's
+    `seq`; reconnecting clients pass it back (Last-Event-ID or ?cursor=) to get
+    only what they missed.
+    """
+    if cursor is None and last_event_id and last_event_id.isdigit():
+        cursor = int(last_event_id)
+    subscription = log_broker.subscribe(cursor=cursor, level=level, component=component, task_id=task_id)
+
+    async def events():
+        reported_drops = 0
+        try:
+            while not await request.is_disconnected():
+                records = await subscription.get(timeout=15)
+                if not records:
+                    yield ": keepalive\n\n"
+                    continue
+                for record in records:
+                    yield f"id: {record.get('seq', '')}\ndata: {json.dumps(record)}\n\n"
+                if subscription.dropped > reported_drops:
+                    reported_drops = subscription.dropped
+                    yield f"event: dropped\ndata: {json.dumps({'dropped': reported_drops})}\n\n"
+        finally:
+            log_broker.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/logs/stream/stats")
+async def stream_stats():
+    return log_broker.stats()
+
+@app.get("/logs/pipeline/stats")
+async def logging_pipeline_stats():
+    """Queue depth and enqueued/written/dropped counters of the logging pipeline."""
+    return pipeline_stats()
 
 @app.delete("/logs")
 async def clear_logs_endpoint():
@@ -55,65 +175,165 @@ async def clear_logs_endpoint():
     return {"status": "cleared"}
 
 @app.get("/config")
-async def get_config():
-    return config_manager.get_all()
+async def get_config(response: Response):
+    snapshot = config_manager.snapshot()
+    response.headers["X-Config-Version"] = str(snapshot.version)
+    return snapshot.get_all()
 
 @app.post("/config")
 async def update_config(request: ConfigRequest):
-    if config_manager.save(request.config):
+    # Atomic write + fsync; keep it off the event loop
+    if await run_in_threadpool(config_manager.save, request.config):
         return {"status": "saved"}
     raise HTTPException(status_code=500, detail="Failed to save config")
 
 # --- Skills Management ---
 
 @app.get("/skills")
-async def list_skills():
-    """Scan packages/skills and return manifests."""
-    skills = []
-    skills_dir = Path(os.getcwd()) / "packages/skills"
-    
-    # Find all manifest.json files
-    manifests = glob.glob(str(skills_dir / "*/manifest.json"))
-    
-    for m_path in manifests:
-        try:
-            with open(m_path, "r") as f:
-                manifest = json.load(f)
-                skills.append(manifest)
-        except Exception as e:
-            logger.error(f"Failed to load manifest {m_path}: {e}")
-            
-    return skills
+async def list_skills(if_none_match: Optional[str] = Header(None)):
+    """Manifests of all skills, from the registry index (ETag / If-None-Match aware)."""
+    etag, payload = skill_registry.payload()
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag})
 
 @app.get("/config/{skill_id}")
 async def get_skill_config(skill_id: str):
     """Get config for a specific skill."""
-    all_config = config_manager.get_all()
-    skill_configs = all_config.get("skill_configs", {})
-    return skill_configs.get(skill_id, {})
+    return config_manager.snapshot().skill_config(skill_id)
 
 @app.post("/config/{skill_id}")
 async def update_skill_config(skill_id: str, request: ConfigRequest):
     """Update config for a specific skill."""
-    all_config = config_manager.get_all()
-    if "skill_configs" not in all_config:
-        all_config["skill_configs"] = {}
-    
-    all_config["skill_configs"][skill_id] = request.config
-    
-    if config_manager.save(all_config):
+    skill = skill_registry.get(skill_id)
+    if skill:
+        errors = skill.validate(request.config)
+        if errors:
+            raise HTTPException(status_code=422, detail=errors)
+
+    if await run_in_threadpool(config_manager.save_skill_config, skill_id, request.config):
         return {"status": "saved"}
     raise HTTPException(status_code=500, detail="Failed to save config")
 
 # -------------------------
 
 @app.post("/notify")
-async def notify_user(request: NotificationRequest):
+def notify_user(request: NotificationRequest):
     # In a real scenario, this would communicate with the Tauri main process
     # For MVP, we'll just log it to stdout which Tauri can capture
     logger.info(f"[NOTIFICATION] Title: {request.title} | Content: {request.content}")
+    if request.task_id:
+        task_manager.record_result(request.task_id, request.content)
     return {"status": "sent"}
 
+# --- Task Registry ---
+
+# The task store is SQLite: plain def handlers run in the threadpool, async ones
+# go through run_in_threadpool, so no query runs on the event loop
+
+@app.get("/tasks")
+def list_tasks(status: Optional[str] = None, skill: Optional[str] = None, limit: int = 50, offset: int = 0):
+    return task_manager.list(status=status, skill=skill, limit=limit, offset=offset)
+
+@app.get("/tasks/stats")
+async def task_stats():
+    """Admission queue depth, running task counts and resource reservations versus capacity."""
+    return task_manager.stats()
+
+@app.get("/callbacks/stats")
+async def callback_stats():
+    """Completion callbacks by state: waiting for their task, due, delivered or failed."""
+    return await run_in_threadpool(callbacks.stats)
+
+@app.get("/tasks/{task_id}")
+def get_task(task_id: str):
+    task = task_manager.get(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task
+
+@app.delete("/tasks/{task_id}")
+async def cancel_task(task_id: str):
+    """Cancel a queued or running task; its slot is freed immediately."""
+    if not await run_in_threadpool(task_manager.get, task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+    task = await run_in_threadpool(task_manager.cancel, task_id)
+    if not task:
+        raise HTTPException(status_code=409, detail="Task is not queued or running")
+    return task
+
+@app.get("/tasks/{task_id}/wait")
+async def wait_task(task_id: str, timeout: float = 30.0):
+    """Wait (without blocking the event loop) for a running task to exit."""
+    task = await run_in_threadpool(task_manager.get, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if task["status"] == TaskStatus.RUNNING and task["container_id"]:
+        await async_docker_client.wait(task["container_id"], timeout)
+        task = await run_in_threadpool(task_manager.get, task_id)
+    return task
+
+@app.get("/tasks/{task_id}/logs")
+async def get_task_logs(task_id: str, request: Request, tail: int = 200, start: Optional[int] = None, end: Optional[int] = None,
+                        follow: bool = False, last_event_id: Optional[str] = Header(None)):
+    """
+    Output of one task. By default the last `tail` lines; `start`/`end` select
+    a range of line numbers. With `follow=true` the response is a
+    Server-Sent Events feed (event id = line number) that ends with the task.
+    """
+    task = await run_in_threadpool(task_manager.get, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    def backlog(start):
+        if start is not None:
+            return task_logs.range(task_id, start, end)
+        return task_logs.tail(task_id, tail)
+
+    if not follow:
+        lines = await run_in_threadpool(backlog, start)
+        return {"task_id": task_id, "lines": lines, "running": task_logs.is_open(task_id)}
+
+    if start is None and last_event_id and last_event_id.isdigit():
+        start = int(last_event_id) + 1
+
+    loop = asyncio.get_running_loop()
+    updates = asyncio.Queue()
+    listener = lambda entry: loop.call_soon_threadsafe(updates.put_nowait, entry)
+    # Subscribe before reading the backlog so no line falls in between; a queued
+    # or just started task has no output yet but can still be followed
+    following = task_logs.subscribe(task_id, listener, active=task["status"] in TaskStatus.ACTIVE)
+
+    async def events():
+        last = 0
+        try:
+            for entry in await run_in_threadpool(backlog, start):
+                last = entry["n"]
+                yield f"id: {last}\ndata: {json.dumps(entry)}\n\n"
+            while following and not await request.is_disconnected():
+                try:
+                    entry = await asyncio.wait_for(updates.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if entry is None:
+                    break
+                if entry["n"] > last and (end is None or entry["n"] <= end):
+                    last = entry["n"]
+                    yield f"id: {last}\ndata: {json.dumps(entry)}\n\n"
+            yield f"event: end\ndata: {json.dumps(await run_in_threadpool(task_manager.get, task_id))}\n\n"
+        finally:
+            task_logs.unsubscribe(task_id, listener)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def subscribe_callback(task_id: str, url: str, context: Optional[dict]):
+    callbacks.subscribe(task_id, url, context)
+    # The task may have ended between submit and subscribe; task_ended is idempotent
+    task = task_manager.get(task_id)
+    if task and task["status"] not in TaskStatus.ACTIVE:
+        callbacks.task_ended(task)
+
 @app.post("/run-task")
 async def run_task(request: TaskRequest):
     logger.info(f"Received request to run task: {request.task_name}")
@@ -121,32 +341,65 @@ async def run_task(request: TaskRequest):
     # Prepare base environment variables
     env_vars = {"SIDECAR_URL": "http://127.0.0.1:12345"}
     
+    # One consistent config version for the whole launch
+    snapshot = config_manager.snapshot()
+
     # 1. Inject Global Config (API Keys)
-    api_key = config_manager.get("GOOGLE_API_KEY")
+    api_key = snapshot.get("GOOGLE_API_KEY")
     if api_key:
         env_vars["GOOGLE_API_KEY"] = api_key
         
     # 2. Inject Skill Config
-    all_config = config_manager.get_all()
-    skill_configs = all_config.get("skill_configs", {})
-    skill_specific_config = skill_configs.get(request.task_name, {})
-    
-    if skill_specific_config:
-        env_vars["SKILL_CONFIG"] = json.dumps(skill_specific_config)
+    skill_config_json = snapshot.skill_config_json(request.task_name)
+    if skill_config_json:
+        env_vars["SKILL_CONFIG"] = skill_config_json
         
-    # Trigger the docker container
-    # Assuming task_name matches folder name in packages/skills/
-    container_id = docker_client.run_container(
-        image="contex-brain:latest",
-        command=request.task_name,
-        env=env_vars
-    )
-    
-    if container_id:
-        return {"status": "started", "container_id": container_id}
-    else:
-        logger.warning(f"Task not found or failed to start: {request.task_name}")
+    # task_name is the skill's folder name in packages/skills/
+    skill = skill_registry.get(request.task_name)
+    if not skill or not skill.runnable:
+        logger.warning(f"Task not found: {request.task_name}")
         raise HTTPException(status_code=404, detail="Task not found or failed to start")
 
+    try:
+        # Admission writes to SQLite; the container launch itself is dispatched
+        # to the Docker API executor, so nothing here blocks the event loop
+        task = await run_in_threadpool(task_manager.submit, request.task_name, env_vars, request.force)
+    except TaskQueueFull as e:
+        logger.warning(f"Rejected task {request.task_name}: {e}")
+        raise HTTPException(status_code=429, detail=str(e))
+    except TaskTooLarge as e:
+        logger.warning(f"Rejected task {request.task_name}: {e}")
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if request.callback_url:
+        # A reused task has already ended, so this schedules its callback right away
+        await run_in_threadpool(subscribe_callback, task["id"], request.callback_url, request.callback_context)
+    if task.get("reused"):
+        return {"status": task["status"], "task_id": task["id"], "reused": True, "result": task["result"]}
+    shared = {"coalesced": True} if task.get("coalesced") else {}
+    if task["status"] == TaskStatus.QUEUED:
+        return {"status": "queued", "task_id": task["id"], "queue_position": task.get("queue_position"), **shared}
+    task = await launched(task)
+    return {"status": "started", "task_id": task["id"], "container_id": task["container_id"], **shared}
+
+async def launched(task: dict) -> dict:
+    """
+    The task once its launch has recorded a container id. Waits without blocking
+    the event loop, at most RUN_TASK_LAUNCH_WAIT seconds; a slower (cold) start
+    is answered with container_id null and shows up in GET /tasks/{id} later.
+    """
+    launch = task_manager.launch(task["id"])
+    if isinstance(launch, concurrent.futures.Future):
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(launch)),
+                timeout=float(config_manager.get("RUN_TASK_LAUNCH_WAIT", 5))
+            )
+        except asyncio.TimeoutError:
+            return task
+        except Exception:
+            pass
+    return await run_in_threadpool(task_manager.get, task["id"]) or task
+
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=12345)
@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+import requests
+from apps.sidecar.core.config import config_manager
+from apps.sidecar.core.logger import get_logger
+from apps.sidecar.core.metrics import metrics
+from apps.sidecar.core.signing import sign, DELIVERY_HEADER, SIGNATURE_HEADER, TIMESTAMP_HEADER
+
+logger = get_logger("sidecar.callbacks")
+
+callback_deliveries = metrics.counter(
+    "sidecar_callback_deliveries", "Completion callback delivery attempts, by outcome", ("outcome",)
+)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+DB_PATH = Path(os.getenv("SIDECAR_DB_PATH", PROJECT_ROOT / "data" / "sidecar.db"))
+
+class CallbackDispatcher:
+    """
+    Delivers the final record of a task to the URLs subscribed to it.
+    Subscriptions live in SQLite next to the tasks, so a pending delivery
+    survives a sidecar restart. A task's end turns its subscriptions into
+    due deliveries; a scheduler thread leases them to `workers` sender
+    threads, so one slow receiver cannot hold up the others. Deliveries are
+    signed with `secret` when set and failures are retried with exponential
+    backoff up to `max_attempts`. Delivered and failed rows are deleted
+    `retention_days` after their last attempt.
+    """
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, db_path: Path = DB_PATH, secret: str = None, max_attempts: int = 8,
+                 timeout: float = 10.0, max_backoff: float = 300.0, workers: int = 4, retention_days: float = 7):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.secret = secret
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.workers = workers
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._due = threading.Condition()
+        self._thread = None
+        self._executor = None
+        self._in_flight = 0
+        self._stopped = False
+        self._woken = False
+        # One keep-alive session per sender thread
+        self._sessions = threading.local()
+        self._init_db()
+
+    def _get_conn(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self):
+        with self._get_conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # state: waiting (task still active), due, delivered or failed
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS callbacks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    context TEXT,
+                    state TEXT NOT NULL,
+                    payload TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL,
+                    last_error TEXT,
+                    updated_at REAL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(callbacks)")}
+            # Tables created before retention
+            if "updated_at" not in columns:
+                conn.execute("ALTER TABLE callbacks ADD COLUMN updated_at REAL")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_callbacks_task ON callbacks (task_id, state)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_callbacks_due ON callbacks (state, next_attempt_at)")
+
+    def subscribe(self, task_id: str, url: str, context: dict = None) -> int:
+        """Deliver the task's final record to `url` once it ends; `context` is echoed back."""
+        with self._lock, self._get_conn() as conn:
+            cursor = conn.execute(
+                "INSERT INTO callbacks (task_id, url, context, state) VALUES (?, ?, ?, 'waiting')",
+                (task_id, url, json.dumps(context) if context is not None else None)
+            )
+        logger.info(f"Callback {cursor.lastrowid} for task {task_id} registered to {url}")
+        return cursor.lastrowid
+
+    def task_ended(self, task: dict) -> int:
+        """Schedule delivery to every subscriber of a finished task. Idempotent; returns how many were scheduled."""
+        payload = json.dumps({
+            "task_id": task["id"],
+            "skill": task["skill"],
+            "status": task["status"],
+            "result": task.get("result"),
+            "error": task.get("error"),
+            "finished_at": task.get("finished_at"),
+        })
+        with self._lock, self._get_conn() as conn:
+            scheduled = conn.execute(
+                "UPDATE callbacks SET state = 'due', payload = ?, next_attempt_at = ? "
+                "WHERE task_id = ? AND state = 'waiting'",
+                (payload, time.time(), task["id"])
+            ).rowcount
+        if scheduled:
+            self._wake()
+        return scheduled
+
+    def recover(self, get_task) -> int:
+        """Schedule subscriptions whose task ended while the sidecar was down (e.g. marked interrupted)."""
+        with self._get_conn() as conn:
+            task_ids = [row[0] for row in conn.execute("SELECT DISTINCT task_id FROM callbacks WHERE state = 'waiting'")]
+        scheduled = 0
+        for task_id in task_ids:
+            task = get_task(task_id)
+            if task and task["finished_at"]:
+                scheduled += self.task_ended(task)
+        return scheduled
+
+    def start(self):
+        with self._due:
+            self._stopped = False
+            if self._thread is None:
+                self._in_flight = 0
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="callback-sender")
+                self._thread = threading.Thread(target=self._run, name="callback-dispatcher", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._due:
+            self._stopped = True
+            self._due.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+            # Deliveries in flight end within their timeout; unsent leases expire and are retried on start
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def prune(self) -> int:
+        """Delete delivered and failed callbacks older than `retention_days`; returns how many."""
+        cutoff = time.time() - self.retention_days * 86400
+        with self._lock, self._get_conn() as conn:
+            removed = conn.execute(
+                "DELETE FROM callbacks WHERE state IN ('delivered', 'failed') AND updated_at < ?", (cutoff,)
+            ).rowcount
+        if removed:
+            logger.info(f"Callback retention removed {removed} rows")
+        return removed
+
+    def stats(self) -> dict:
+        with self._get_conn() as conn:
+            rows = conn.execute("SELECT state, COUNT(*) FROM callbacks GROUP BY state").fetchall()
+        return {"waiting": 0, "due": 0, "delivered": 0, "failed": 0, **dict(rows)}
+
+    def _wake(self):
+        with self._due:
+            self._woken = True
+            self._due.notify_all()
+
+    def _next_due(self) -> tuple:
+        """
+        Lease the next due delivery (hidden until its attempt could have timed
+        out, so a crash mid-send only delays it), or (None, seconds until one is due).
+        """
+        now = time.time()
+        with self._lock, self._get_conn() as conn:
+            row = conn.execute(
+                "SELECT id, task_id, url, context, payload, attempts, next_attempt_at FROM callbacks "
+                "WHERE state = 'due' ORDER BY next_attempt_at LIMIT 1"
+            ).fetchone()
+            if not row:
+                return None, None
+            if row[6] > now:
+                return None, row[6] - now
+            conn.execute("UPDATE callbacks SET next_attempt_at = ? WHERE id = ?", (now + self.timeout * 2 + 1, row[0]))
+        return row, 0
+
+    def _run(self):
+        last_prune = 0
+        while True:
+            with self._due:
+                # Every sender busy: wait for one to finish
+                while self._in_flight >= self.workers and not self._stopped:
+                    self._due.wait()
+                if self._stopped:
+                    return
+                self._woken = False
+            if time.time() - last_prune > self.PRUNE_INTERVAL:
+                last_prune = time.time()
+                self.prune()
+            row, wait = self._next_due()
+            if row is None:
+                with self._due:
+                    # A task that ended while we were looking must not wait for the next one
+                    if not self._stopped and not self._woken:
+                        self._due.wait(wait)
+                continue
+            with self._due:
+                self._in_flight += 1
+            self._executor.submit(self._send, row[:6])
+
+    def _send(self, row: tuple):
+        try:
+            self._deliver(*row)
+        except Exception as e:
+            logger.error(f"Callback {row[0]} for task {row[1]} could not be sent: {e}")
+        finally:
+            with self._due:
+                self._in_flight -= 1
+                self._due.notify_all()
+
+    def _deliver(self, callback_id: int, task_id: str, url: str, context: Optional[str], payload: str, attempts: int):
+        body = json.dumps({**json.loads(payload), "context": json.loads(context) if context else None}).encode()
+        headers = {"Content-Type": "application/json", DELIVERY_HEADER: str(callback_id)}
+        if self.secret:
+            timestamp = str(int(time.time()))
+            headers[TIMESTAMP_HEADER] = timestamp
+            headers[SIGNATURE_HEADER] = sign(self.secret, timestamp, body)
+
+        error = None
+        try:
+            session = getattr(self._sessions, "session", None)
+            if session is None:
+                session = self._sessions.session = requests.Session()
+            res = session.post(url, data=body, headers=headers, timeout=self.timeout)
+            if res.status_code >= 300:
+                error = f"HTTP {res.status_code}"
+        except requests.RequestException as e:
+            error = str(e)
+
+        attempts += 1
+        now = time.time()
+        with self._lock, self._get_conn() as conn:
+            if error is None:
+                conn.execute(
+                    "UPDATE callbacks SET state = 'delivered', attempts = ?, updated_at = ? WHERE id = ?",
+                    (attempts, now, callback_id)
+                )
+            elif attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE callbacks SET state = 'failed', attempts = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                    (attempts, error, now, callback_id)
+                )
+            else:
+                conn.execute(
+                    "UPDATE callbacks SET attempts = ?, last_error = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+                    (attempts, error, now + min(self.max_backoff, 2 ** attempts), now, callback_id)
+                )
+
+        if error is None:
+            callback_deliveries.inc("delivered")
+            logger.info(f"Delivered callback {callback_id} for task {task_id} to {url}")
+        elif attempts >= self.max_attempts:
+            callback_deliveries.inc("failed")
+            logger.error(f"Giving up on callback {callback_id} for task {task_id} after {attempts} attempts: {error}")
+        else:
+            callback_deliveries.inc("retried")
+            logger.warning(f"Callback {callback_id} for task {task_id} failed (attempt {attempts}): {error}")
+
+# Singleton instance
+callbacks = CallbackDispatcher(
+    # Sensitive, so the config manager only reads it from .env; the gateway reads the process environment
+    secret=config_manager.get("CALLBACK_SECRET") or os.getenv("CALLBACK_SECRET") or None,
+    max_attempts=int(config_manager.get("CALLBACK_MAX_ATTEMPTS", 8)),
+    workers=int(config_manager.get("CALLBACK_WORKERS", 4)),
+    retention_days=float(config_manager.get("CALLBACK_RETENTION_DAYS", 7))
+)
+metrics.gauge_callback(
+    "sidecar_callbacks", "Completion callbacks by state", lambda: callbacks.stats(), ("state",)
+)
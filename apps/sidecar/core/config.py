@@ -1,24 +1,102 @@
 import os
+import copy
 import json
+import time
+import tempfile
+import threading
 from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Optional
 from dotenv import load_dotenv
 from apps.sidecar.core.logger import get_logger
 
 logger = get_logger("sidecar.config")
 
+# Keys that stay in .env and are never written to config.json or exposed by get_all()
+SENSITIVE_KEYS = frozenset({"GOOGLE_API_KEY", "DATABASE_URL", "SECRET_KEY", "CALLBACK_SECRET"})
+PUBLIC_ENV_KEYS = ("DEBUG_MODE", "LOG_LEVEL", "PYTHONPATH")
+
+class ConfigSnapshot:
+    """
+    Immutable view of the configuration layers at one version. Readers grab the
+    current snapshot once and use it without locks; changes publish a new one.
+    """
+    def __init__(self, version: int, env_vars: dict, config: dict):
+        self.version = version
+        self.loaded_at = time.time()
+        self.env_vars = MappingProxyType(dict(env_vars))
+        self.config = MappingProxyType(config)
+
+        public = copy.deepcopy(config)
+        for k in PUBLIC_ENV_KEYS:
+            if env_vars.get(k) is not None:
+                public[k] = env_vars[k]
+        self._public = public
+        # Precomputed so task launches do not serialize skill configs per request
+        self._skill_json = {
+            skill_id: json.dumps(skill_config)
+            for skill_id, skill_config in (config.get("skill_configs") or {}).items() if skill_config
+        }
+
+    def get(self, key: str, default=None):
+        """Get configuration value with proper layer priority."""
+        # Layer 1: .env file variables (highest priority for sensitive keys)
+        if key in self.env_vars:
+            return self.env_vars[key]
+
+        # Layer 2: Application config (config.json)
+        if key in self.config:
+            value = self.config[key]
+            return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+        # Layer 3: System environment variables (lowest priority, for non-sensitive keys)
+        if key in os.environ and key not in SENSITIVE_KEYS:
+            return os.environ[key]
+
+        return default
+
+    def get_all(self) -> dict:
+        """All configuration excluding sensitive environment variables (a mutable copy)."""
+        return copy.deepcopy(self._public)
+
+    def skill_config(self, skill_id: str) -> dict:
+        return copy.deepcopy((self.config.get("skill_configs") or {}).get(skill_id, {}))
+
+    def skill_config_json(self, skill_id: str) -> Optional[str]:
+        """JSON of a skill's config as injected into SKILL_CONFIG, or None if it has none."""
+        return self._skill_json.get(skill_id)
+
 class ConfigManager:
-    def __init__(self, config_filename: str = "config.json"):
+    """
+    Layered configuration (.env -> config.json -> process env) served from an
+    immutable snapshot. A watcher thread reloads the files when they change on
+    disk, saves are written atomically (temp file + rename) with concurrent
+    saves coalesced into one write, and subscribers get every new snapshot.
+    """
+    def __init__(self, config_filename: str = "config.json", reload_interval: float = 1.0, save_delay: float = 0.5):
         # Define configuration layers
         self.env_filename = ".env"
         self.config_filename = config_filename
-        
+        self.reload_interval = reload_interval
+        self.save_delay = save_delay
+
         # Initialize paths
         self._init_paths()
-        
+
+        self._lock = threading.Lock()
+        self._update_lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._listeners = []
+        self._dirty_version = 0
+        self._written_version = 0
+        self._save_timer = None
+        self._stopped = threading.Event()
+        self._watcher = None
+
         # Load configuration in layers
-        self._config = {}
-        self._env_vars = {}
-        self._load_layers()
+        env_vars, config = self._load_layers()
+        self._signature = self._file_signature()
+        self._snapshot = ConfigSnapshot(1, env_vars, config)
     
     def _init_paths(self):
         """Initialize configuration file paths with proper priority."""
@@ -55,111 +133,263 @@ class ConfigManager:
         
         logger.info(f"Config paths - .env: {self.env_file}, config.json: {self.config_file}")
     
-    def _load_layers(self):
-        """Load configuration in layers: L1(.env) -> L2(config.json)"""
+    def _load_layers(self, initial: bool = True):
+        """Load configuration in layers: L1(.env) -> L2(config.json). Returns (env_vars, config)."""
         # Layer 1: Environment variables from .env file
-        self._env_vars = {}
+        env_vars = {}
         if self.env_file:
             try:
-                load_dotenv(self.env_file)
+                if initial:
+                    load_dotenv(self.env_file)
                 # Load .env into internal storage for controlled access
                 with open(self.env_file, "r") as f:
                     for line in f:
                         line = line.strip()
                         if line and not line.startswith("#") and "=" in line:
                             key, value = line.split("=", 1)
-                            self._env_vars[key] = value
+                            env_vars[key] = value
                 logger.info(f"Loaded environment variables from {self.env_file}")
             except Exception as e:
+                if not initial:
+                    raise
                 logger.error(f"Failed to load .env file: {e}")
-                self._env_vars = {}
-        
+                env_vars = {}
+
         # Layer 2: Application config from config.json
-        if self.config_file:
+        config = {}
+        if self.config_file and self.config_file.exists():
             try:
                 with open(self.config_file, "r") as f:
-                    self._config = json.load(f)
+                    config = json.load(f)
                 logger.info(f"Loaded application config from {self.config_file}")
             except Exception as e:
+                if not initial:
+                    raise
                 logger.error(f"Failed to load config.json: {e}")
-                self._config = {}
+                config = {}
         else:
             logger.info("No config.json found. Using defaults.")
-            self._config = {}
+        return env_vars, config
+
+    # --- Snapshots and change notifications ---
+
+    def snapshot(self) -> ConfigSnapshot:
+        """The current configuration; cheap enough to call per request."""
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def subscribe(self, listener: Callable):
+        """`listener(snapshot)` is called with every new snapshot (from the saving or watcher thread)."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _publish(self, env_vars: dict, config: dict) -> ConfigSnapshot:
+        """Swap in a new snapshot and notify subscribers. Caller holds the update lock."""
+        with self._lock:
+            snapshot = ConfigSnapshot(self._snapshot.version + 1, env_vars, config)
+            self._snapshot = snapshot
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"Config listener failed: {e}")
+        return snapshot
 
-    def save(self, new_config: dict):
-        """Save configuration to config.json, excluding sensitive keys."""
+    # --- Hot reload ---
+
+    def start_watching(self):
+        """Poll .env and config.json for changes made outside the sidecar."""
+        if self._watcher:
+            return
+        self._stopped.clear()
+        self._watcher = threading.Thread(target=self._watch, name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stopped.set()
+        if self._watcher:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+        self.flush()
+
+    def reload(self) -> bool:
+        """
+        Re-read the files; returns False (keeping the current snapshot) if they
+        are unreadable or unchanged. While a save is pending, or if one was
+        applied during the read, the in-memory config is newer than config.json
+        and is kept: only the .env layer is taken from disk.
+        """
+        if not self.config_file:
+            candidate = self.project_root / self.config_filename
+            self.config_file = candidate if candidate.exists() else None
+        read_version = self.version
         try:
-            # Use project root as default save location
-            if not self.config_file:
-                self.config_file = self.project_root / self.config_filename
-                
-            # Merge with existing, but exclude sensitive keys that should stay in .env
-            sensitive_keys = {"GOOGLE_API_KEY", "DATABASE_URL", "SECRET_KEY"}
-            for k, v in new_config.items():
-                if k not in sensitive_keys:
-                    self._config[k] = v
-            
-            # Ensure directory exists
-            self.config_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(self.config_file, "w") as f:
-                json.dump(self._config, f, indent=2)
-            logger.info(f"Configuration saved to {self.config_file}")
-            return True
+            env_vars, config = self._load_layers(initial=False)
+        except Exception as e:
+            logger.error(f"Config reload failed, keeping version {self.version}: {e}")
+            return False
+
+        with self._update_lock:
+            current = self._snapshot
+            if (current.version != read_version or self._save_pending()) and config != dict(current.config):
+                logger.warning(f"Unsaved config version {current.version} will be written over the external edit of config.json")
+                config = dict(current.config)
+            if env_vars == dict(current.env_vars) and config == dict(current.config):
+                return False
+            snapshot = self._publish(env_vars, config)
+        logger.info(f"Configuration reloaded from disk (version {snapshot.version})")
+        return True
+
+    def _save_pending(self) -> bool:
+        with self._lock:
+            return self._dirty_version > self._written_version
+
+    def _file_signature(self):
+        """Changes when either file is modified or replaced."""
+        signature = []
+        for path in (self.env_file, self.config_file or self.project_root / self.config_filename):
+            try:
+                st = os.stat(path) if path else None
+                signature.append((st.st_ino, st.st_mtime_ns, st.st_size) if st else None)
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _watch(self):
+        while not self._stopped.wait(self.reload_interval):
+            signature = self._file_signature()
+            if signature == self._signature:
+                continue
+            # Our own atomic writes update the signature, so this is an external edit
+            with self._write_lock:
+                self._signature = self._file_signature()
+                self.reload()
+
+    # --- Saving ---
+
+    def save(self, new_config: dict, wait: bool = True) -> bool:
+        """
+        Merge `new_config` (minus sensitive keys) into config.json.
+        With `wait` the write is durable on return; concurrent savers share a
+        single write. Without it the write is debounced by `save_delay`.
+        """
+        try:
+            with self._update_lock:
+                version = self._apply(new_config)
+        except Exception as e:
+            logger.error(f"Failed to save config: {e}")
+            return False
+        return self._commit(version, wait)
+
+    def save_skill_config(self, skill_id: str, skill_config: dict, wait: bool = True) -> bool:
+        """Replace one skill's entry in skill_configs, leaving the others untouched."""
+        try:
+            with self._update_lock:
+                skill_configs = self._snapshot.get("skill_configs") or {}
+                skill_configs[skill_id] = skill_config
+                version = self._apply({"skill_configs": skill_configs})
         except Exception as e:
             logger.error(f"Failed to save config: {e}")
             return False
+        return self._commit(version, wait)
+
+    def _apply(self, new_config: dict) -> int:
+        """Publish `new_config` merged into the current snapshot. Caller holds the update lock."""
+        current = self._snapshot
+        config = copy.deepcopy(dict(current.config))
+        # Merge with existing, but exclude sensitive keys that should stay in .env
+        for k, v in new_config.items():
+            if k not in SENSITIVE_KEYS:
+                config[k] = v
+        self._publish(dict(current.env_vars), config)
+        # Bumped after publishing so a writer never claims a version it has not seen
+        with self._lock:
+            self._dirty_version += 1
+            return self._dirty_version
+
+    def _commit(self, version: int, wait: bool) -> bool:
+        if wait:
+            return self._write(version)
+        self._schedule_write()
+        return True
+
+    def flush(self) -> bool:
+        """Write any debounced changes now."""
+        return self._write(self._dirty_version)
+
+    def _schedule_write(self):
+        with self._lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def _write(self, version: int) -> bool:
+        with self._write_lock:
+            with self._lock:
+                if self._written_version >= version:
+                    # Another save already wrote this change (group commit)
+                    return True
+                if self._save_timer:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                version = self._dirty_version
+                config = self._snapshot.config
+
+            try:
+                # Use project root as default save location
+                if not self.config_file:
+                    self.config_file = self.project_root / self.config_filename
+                self._atomic_write(self.config_file, json.dumps(dict(config), indent=2))
+            except Exception as e:
+                logger.error(f"Failed to save config: {e}")
+                return False
+
+            with self._lock:
+                self._written_version = version
+            self._signature = self._file_signature()
+            logger.info(f"Configuration saved to {self.config_file}")
+            return True
+
+    def _atomic_write(self, path: Path, content: str):
+        """Write to a temp file in the same directory and rename it over `path`."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    # --- Reads ---
 
     def get(self, key: str, default=None):
         """Get configuration value with proper layer priority."""
-        # Layer 1: .env file variables (highest priority for sensitive keys)
-        if hasattr(self, '_env_vars') and key in self._env_vars:
-            return self._env_vars[key]
-            
-        # Layer 2: Application config (config.json)
-        if key in self._config:
-            return self._config[key]
-            
-        # Layer 3: System environment variables (lowest priority, for non-sensitive keys)
-        if key in os.environ and key not in ["GOOGLE_API_KEY", "DATABASE_URL", "SECRET_KEY"]:
-            return os.environ[key]
-            
-        # Return default if not found
-        return default
-    
+        return self._snapshot.get(key, default)
+
     def get_all(self):
         """Get all configuration excluding sensitive environment variables."""
-        result = self._config.copy()
-        
-        # Add non-sensitive environment variables for transparency
-        if hasattr(self, '_env_vars'):
-            env_vars = {
-                "DEBUG_MODE": self._env_vars.get("DEBUG_MODE"),
-                "LOG_LEVEL": self._env_vars.get("LOG_LEVEL"),
-                "PYTHONPATH": self._env_vars.get("PYTHONPATH")
-            }
-        else:
-            env_vars = {
-                "DEBUG_MODE": os.environ.get("DEBUG_MODE"),
-                "LOG_LEVEL": os.environ.get("LOG_LEVEL"),
-                "PYTHONPATH": os.environ.get("PYTHONPATH")
-            }
-        
-        # Only include non-None values
-        for k, v in env_vars.items():
-            if v is not None:
-                result[k] = v
-                
-        return result
-    
+        return self._snapshot.get_all()
+
     def get_sensitive_info(self):
         """Get sensitive configuration status for debugging."""
-        api_key = None
-        if hasattr(self, '_env_vars'):
-            api_key = bool(self._env_vars.get("GOOGLE_API_KEY"))
-        else:
-            api_key = bool(os.environ.get("GOOGLE_API_KEY"))
+        api_key = bool(self._snapshot.env_vars.get("GOOGLE_API_KEY"))
             
         return {
             "env_file_exists": self.env_file is not None,
@@ -172,4 +402,4 @@ class ConfigManager:
         }
 
 # Singleton instance
-config_manager = ConfigManager()
+config_manager = ConfigManager(reload_interval=float(os.getenv("CONFIG_RELOAD_INTERVAL", "1.0")))
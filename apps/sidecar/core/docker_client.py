@@ -1,8 +1,22 @@
 import subprocess
+import signal
 import sys
 import os
 import threading
+import queue
+import time
+import uuid
+import asyncio
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from apps.sidecar.core import forkserver
+from apps.sidecar.core.config import config_manager
+from apps.sidecar.core.resources import default_spec
+from apps.sidecar.core.engine import engine, LineDecoder, DockerFrameDecoder
 from apps.sidecar.core.logger import get_logger
+from apps.sidecar.core.metrics import metrics
+from apps.sidecar.core.task_logs import task_logs
 
 # Try importing docker SDK
 try:
@@ -13,81 +27,454 @@ except ImportError:
 
 logger = get_logger("sidecar.docker")
 
-class MockDockerClient:
+docker_api_seconds = metrics.histogram(
+    "sidecar_docker_api_duration_seconds", "Latency of Docker API calls (process spawns in mock mode)", ("operation",)
+)
+
+def _log_container_line(stream: str, line: str, task_id: str = None):
+    """Log pump callback shared by every container/process output stream."""
+    line = line.strip()
+    if not line:
+        return
+    extra = {"task_id": task_id} if task_id else None
+    if stream == "stderr":
+        logger.error(f"[CONTAINER] {line}", extra=extra)
+    else:
+        logger.info(f"[CONTAINER] {line}", extra=extra)
+
+def _signal_group(process, sig):
+    """Both mock runners start each task in its own session, so signal the whole tree."""
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def _raw_socket(sock):
+    """docker-py hands out a SocketIO wrapper; the selector needs the socket itself."""
+    return getattr(sock, "_sock", sock)
+
+class ContainerRun:
+    """Tracks one container/exec run so callers can wait on it or follow its output."""
+    def __init__(self, run_id: str, task_id: str = None):
+        self.id = run_id
+        self.task_id = task_id
+        self.exit_code = None
+        self.done = threading.Event()
+        # Set by the client: stopper(grace) terminates the process/container
+        self.stopper = None
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def emit(self, stream: str, line: str):
+        """Log pump callback: log the line, record it under its task and fan it out to followers."""
+        _log_container_line(stream, line, self.task_id)
+        if self.task_id:
+            task_logs.append(self.task_id, stream, line)
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener((stream, line))
+            except Exception:
+                # A follower whose event loop went away must not break the pump
+                self.unsubscribe(listener)
+
+    def finish(self, exit_code):
+        self.exit_code = exit_code
+        if self.task_id:
+            task_logs.close(self.task_id)
+        self.done.set()
+        with self._lock:
+            listeners, self._listeners = self._listeners, []
+        for listener in listeners:
+            try:
+                listener(None)
+            except Exception:
+                pass
+
+    def cancel(self, grace: float) -> bool:
+        """Stop the run: graceful termination first, forced after `grace` seconds."""
+        if self.done.is_set() or not self.stopper:
+            return False
+        logger.info(f"Stopping run {self.id[:12]} (grace {grace:g}s)")
+        self.stopper(grace)
+        return True
+
+    def subscribe(self, listener):
+        """`listener` receives (stream, line) tuples and None once the run ends."""
+        with self._lock:
+            self._listeners.append(listener)
+        if self.done.is_set():
+            self.unsubscribe(listener)
+            listener(None)
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+class RunTracker:
+    """Keeps recent runs addressable by id for wait() and log following."""
+    MAX_FINISHED_RUNS = 256
+
+    def _init_runs(self):
+        self._runs = OrderedDict()
+        self._runs_lock = threading.Lock()
+
+    def _track(self, run_id: str, task_id: str = None) -> ContainerRun:
+        run = ContainerRun(run_id, task_id)
+        with self._runs_lock:
+            self._runs[run_id] = run
+            finished = [k for k, r in self._runs.items() if r.done.is_set()]
+            for k in finished[:max(0, len(finished) - self.MAX_FINISHED_RUNS)]:
+                del self._runs[k]
+        return run
+
+    def active_runs(self) -> int:
+        with self._runs_lock:
+            return sum(1 for run in self._runs.values() if not run.done.is_set())
+
+    def get_run(self, run_id: str):
+        with self._runs_lock:
+            return self._runs.get(run_id)
+
+    def wait(self, run_id: str, timeout: float = None):
+        """Block until the run exits and return its exit code (None if unknown or still running)."""
+        run = self.get_run(run_id)
+        if not run:
+            return None
+        run.done.wait(timeout)
+        return run.exit_code
+
+    def cancel(self, run_id: str, grace: float = 10.0) -> bool:
+        """Stop a run; blocks for up to `grace` seconds. False if it is unknown or already done."""
+        run = self.get_run(run_id)
+        return run.cancel(grace) if run else False
+
+    @staticmethod
+    def _finish(run: ContainerRun, exit_code, on_exit=None):
+        """Record the exit before releasing waiters and log followers, so they see the final task."""
+        try:
+            if on_exit:
+                on_exit(exit_code)
+        finally:
+            run.finish(exit_code)
+
+class MockDockerClient(RunTracker):
     def __init__(self):
         self.is_mock = True
+        self._init_runs()
+
+        # "forkserver" reuses a pre-warmed interpreter, "subprocess" starts a fresh one per task
+        self.runner = os.getenv("MOCK_RUNNER", "forkserver" if forkserver.is_supported() else "subprocess")
+        self.forkserver = None
+        if self.runner == "forkserver":
+            self.forkserver = forkserver.ForkServer()
+            self.forkserver.start(on_output=lambda stream: engine.logs.register(
+                stream, lambda _, line: line and logger.info(line), decoder=LineDecoder("stderr")))
 
-    def run_container(self, image: str, command: str, env: dict = None):
+    def run_container(self, image: str, command: str, env: dict = None, on_exit=None, resources=None):
         """
-        Simulates running a container by executing the local python script.
+        Simulates running a container by executing the skill's local python script.
+        `on_exit` is called with the exit code (or None) once the script ends.
+        `resources` (a ResourceSpec) is enforced with rlimits.
         """
         logger.info(f"Starting MOCK container from image: {image}")
         
         # For MVP simulation, we map the 'image' concept to our local script paths
-        if "contex-brain" in image and "daily-brief" in command:
-            script_path = "packages/skills/daily-brief/main.py"
-            logger.info(f"Simulating execution of {script_path}")
-            
-            # Run in a separate thread/process to not block API
-            def _run():
-                try:
-                    run_env = os.environ.copy()
-                    # Ensure packages is in PYTHONPATH for Mock execution
-                    cwd = os.getcwd()
-                    run_env["PYTHONPATH"] = f"{cwd}:{cwd}/packages:" + run_env.get("PYTHONPATH", "")
-                    
-                    if env:
-                        run_env.update(env)
-                    
-                    # If env is provided, it should take precedence over system env
-                    # We already updated run_env with env above, so we don't need to do anything else
-                    # unless we want to force system env (which we don't for API keys)
-                    pass
-                    
-                    # Use Popen to capture stdout/stderr in real-time
-                    process = subprocess.Popen(
-                        [sys.executable, script_path],
-                        env=run_env,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True,
-                        bufsize=1
-                    )
-
-                    # Helper to read stream
-                    def log_stream(stream, level_method):
-                        for line in iter(stream.readline, ''):
-                            if line:
-                                level_method(f"[CONTAINER] {line.strip()}")
-                        stream.close()
-
-                    # Create threads to read stdout/stderr concurrently
-                    t_out = threading.Thread(target=log_stream, args=(process.stdout, logger.info))
-                    t_err = threading.Thread(target=log_stream, args=(process.stderr, logger.error))
-                    
-                    t_out.start()
-                    t_err.start()
-                    
-                    process.wait()
-                    t_out.join()
-                    t_err.join()
-
-                    if process.returncode == 0:
-                        logger.info("Container finished successfully")
-                    else:
-                        logger.error(f"Container failed with exit code {process.returncode}")
-
-                except Exception as e:
-                    logger.error(f"Container execution failed: {e}")
-
-            threading.Thread(target=_run).start()
-            return "mock-container-id-123"
+        script_path = os.path.join("packages/skills", command, "main.py")
+        if "contex-brain" not in image or not os.path.isfile(script_path):
+            return None
+
+        logger.info(f"Simulating execution of {script_path}")
+        
+        run_env = os.environ.copy()
+        # Ensure packages is in PYTHONPATH for Mock execution
+        cwd = os.getcwd()
+        run_env["PYTHONPATH"] = f"{cwd}:{cwd}/packages:" + run_env.get("PYTHONPATH", "")
         
-        return None
+        # If env is provided, it should take precedence over system env
+        if env:
+            run_env.update(env)
+
+        try:
+            with docker_api_seconds.time("spawn"):
+                process = self._start_process(script_path, run_env, cwd, resources.rlimits() if resources else {})
+        except Exception as e:
+            logger.error(f"Container execution failed: {e}")
+            return None
+
+        # Output is pumped by the shared multiplexer, supervision runs on the worker pool
+        run = self._track(f"mock-{uuid.uuid4().hex[:12]}", run_env.get("TASK_ID"))
+        run.stopper = lambda grace: self._terminate(run, process, grace)
+        streams = [
+            engine.logs.register(process.stdout, run.emit, decoder=LineDecoder("stdout")),
+            engine.logs.register(process.stderr, run.emit, decoder=LineDecoder("stderr")),
+        ]
+        engine.submit(self._supervise, run, process, streams, on_exit)
+        return run.id
+
+    def _start_process(self, script_path: str, run_env: dict, cwd: str, rlimits: dict = None):
+        if self.forkserver:
+            try:
+                return self.forkserver.spawn(script_path, run_env, cwd, rlimits)
+            except Exception as e:
+                logger.warning(f"Forkserver unavailable ({e}), falling back to subprocess")
+
+        return subprocess.Popen(
+            [sys.executable, script_path],
+            env=run_env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            # Own process group, like forked tasks, so cancellation reaches child processes
+            start_new_session=True,
+            preexec_fn=(lambda: forkserver.apply_rlimits(rlimits)) if rlimits else None
+        )
+
+    def _terminate(self, run: ContainerRun, process, grace: float):
+        """SIGTERM, then SIGKILL if the run has not finished after `grace` seconds."""
+        _signal_group(process, signal.SIGTERM)
+        # The supervisor owns process.wait(); watch the run instead
+        if not run.done.wait(grace):
+            _signal_group(process, signal.SIGKILL)
+
+    def _supervise(self, run: ContainerRun, process, streams: list, on_exit=None):
+        exit_code = process.wait()
+        for closed in streams:
+            closed.wait()
+
+        if exit_code == 0:
+            logger.info("Container finished successfully")
+        else:
+            logger.error(f"Container failed with exit code {exit_code}")
+
+        self._finish(run, exit_code, on_exit)
+
+    def pool_stats(self) -> dict:
+        # Mock has no container pool; report the pre-warmed forkserver instead
+        stats = {"enabled": False, "runner": self.runner}
+        if self.forkserver:
+            stats["forkserver"] = self.forkserver.stats()
+        return stats
+
+    def shutdown(self):
+        if self.forkserver:
+            self.forkserver.shutdown()
+
+class PooledContainer:
+    """An idle brain container owned by the WarmPool."""
+    def __init__(self, container):
+        self.container = container
+        self.jobs = 0
+        self.created_at = time.time()
+
+    @property
+    def id(self):
+        return self.container.id
+
+
+class WarmPool:
+    """
+    Keeps N idle contex-brain containers running the entrypoint idle loop so
+    tasks can be dispatched with `docker exec` instead of a cold container start.
+    Containers are recycled after `max_jobs` executions or when a health check fails.
+    Spawns run on the pool's own `spawn_workers` threads: the engine's workers
+    supervise tasks for their whole lifetime and could leave none for refills.
+    """
+    IDLE_COMMAND = "python3 /app/brain/entrypoint.py"
+
+    def __init__(self, client, image: str, size: int, max_jobs: int, volumes: dict = None,
+                 extra_hosts: dict = None, health_interval: float = 30.0, pids_limit: int = None,
+                 spawn_workers: int = 2):
+        self.client = client
+        self.pids_limit = pids_limit
+        self.image = image
+        self.size = size
+        self.max_jobs = max_jobs
+        self.volumes = volumes or {}
+        self.extra_hosts = extra_hosts or {}
+        self.health_interval = health_interval
+
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._busy = {}
+        self._starting = 0
+        self._stopped = threading.Event()
+        self._spawner = ThreadPoolExecutor(max_workers=spawn_workers, thread_name_prefix="warm-pool-spawn")
+        self._stats = {"spawned": 0, "recycled": 0, "unhealthy": 0, "spawn_failures": 0, "jobs": 0, "misses": 0}
+
+    def start(self):
+        """Fill the pool and start the health checker in the background."""
+        self._fill()
+        threading.Thread(target=self._health_loop, name="warm-pool-health", daemon=True).start()
+
+    def acquire(self, timeout: float = 0.0):
+        """Return a healthy idle container, or None if none is available within `timeout`."""
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            try:
+                if remaining > 0:
+                    pooled = self._idle.get(timeout=remaining)
+                else:
+                    pooled = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    self._stats["misses"] += 1
+                self._fill()
+                return None
+
+            if self._is_healthy(pooled):
+                with self._lock:
+                    self._busy[pooled.id] = pooled
+                return pooled
+
+            with self._lock:
+                self._stats["unhealthy"] += 1
+            self._discard(pooled)
+            self._fill()
+
+    def release(self, pooled: PooledContainer):
+        """Return a container after a job; recycle it once it reached max_jobs."""
+        with self._lock:
+            self._busy.pop(pooled.id, None)
+            pooled.jobs += 1
+            self._stats["jobs"] += 1
+
+        if self._stopped.is_set():
+            self._discard(pooled)
+            return
+
+        with self._lock:
+            # The pool was shrunk while this container was busy
+            surplus = self._idle.qsize() + len(self._busy) + self._starting >= self.size
+
+        if surplus:
+            self._discard(pooled)
+        elif pooled.jobs >= self.max_jobs or not self._is_healthy(pooled):
+            logger.info(f"Recycling pooled container {pooled.id[:12]} after {pooled.jobs} jobs")
+            with self._lock:
+                self._stats["recycled"] += 1
+            self._discard(pooled)
+            self._fill()
+        else:
+            self._idle.put(pooled)
+
+    def resize(self, size: int, max_jobs: int = None):
+        """Grow or shrink the pool; busy containers are removed when they are released."""
+        with self._lock:
+            self.size = size
+            if max_jobs is not None:
+                self.max_jobs = max_jobs
+        while True:
+            with self._lock:
+                excess = self._idle.qsize() + len(self._busy) + self._starting - self.size
+            if excess <= 0:
+                break
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        self._fill()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": True,
+                "image": self.image,
+                "size": self.size,
+                "max_jobs": self.max_jobs,
+                "idle": self._idle.qsize(),
+                "busy": len(self._busy),
+                "starting": self._starting,
+                **self._stats,
+            }
+
+    def shutdown(self):
+        """Stop health checks and spawns, and remove every idle container."""
+        self._stopped.set()
+        self._spawner.shutdown(wait=False, cancel_futures=True)
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def _fill(self):
+        """Spawn containers in the background until idle + busy + starting reaches size."""
+        with self._lock:
+            missing = self.size - (self._idle.qsize() + len(self._busy) + self._starting)
+            if missing <= 0 or self._stopped.is_set():
+                return
+            self._starting += missing
 
-class RealDockerClient:
+        for _ in range(missing):
+            self._spawner.submit(self._spawn)
+
+    def _spawn(self):
+        try:
+            with docker_api_seconds.time("containers.run"):
+                container = self.client.containers.run(
+                    self.image,
+                    command=self.IDLE_COMMAND,
+                    volumes=self.volumes,
+                    extra_hosts=self.extra_hosts,
+                    labels={"contex.pool": "brain"},
+                    # CPU and memory are set per job with update_container; pids cannot be changed later
+                    pids_limit=self.pids_limit,
+                    detach=True,
+                    auto_remove=True
+                )
+            pooled = PooledContainer(container)
+            with self._lock:
+                self._stats["spawned"] += 1
+            logger.info(f"Warm pool container ready: {pooled.id[:12]}")
+            self._idle.put(pooled)
+        except Exception as e:
+            with self._lock:
+                self._stats["spawn_failures"] += 1
+            logger.error(f"Failed to spawn warm pool container: {e}")
+        finally:
+            with self._lock:
+                self._starting -= 1
+
+    def _is_healthy(self, pooled: PooledContainer) -> bool:
+        try:
+            with docker_api_seconds.time("containers.reload"):
+                pooled.container.reload()
+            return pooled.container.status == "running"
+        except Exception:
+            return False
+
+    def _discard(self, pooled: PooledContainer):
+        try:
+            pooled.container.remove(force=True)
+        except Exception as e:
+            logger.warning(f"Failed to remove pooled container {pooled.id[:12]}: {e}")
+
+    def _health_loop(self):
+        while not self._stopped.wait(self.health_interval):
+            checked = []
+            while True:
+                try:
+                    checked.append(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+            for pooled in checked:
+                if self._is_healthy(pooled):
+                    self._idle.put(pooled)
+                else:
+                    logger.warning(f"Pooled container {pooled.id[:12]} failed health check")
+                    with self._lock:
+                        self._stats["unhealthy"] += 1
+                    self._discard(pooled)
+            self._fill()
+
+
+class RealDockerClient(RunTracker):
     def __init__(self):
         self.is_mock = False
+        self._init_runs()
         try:
             self.client = docker.from_env()
             # Test connection
@@ -97,64 +484,177 @@ class RealDockerClient:
             logger.error(f"Failed to connect to Docker Daemon: {e}")
             raise
 
-    def run_container(self, image: str, command: str, env: dict = None):
+        # Determine networking mode
+        # For Linux, use "host" mode to access localhost.
+        # For Mac/Windows, use "host.docker.internal".
+        self.extra_hosts = {}
+        if sys.platform != "linux":
+            self.extra_hosts = {"host.docker.internal": "host-gateway"}
+
+        # Mount skills directory for hot-reloading/access
+        # Assuming we are running from project root
+        cwd = os.getcwd()
+        self.volumes = {
+            f"{cwd}/packages/skills": {'bind': '/app/skills', 'mode': 'ro'}
+        }
+
+        self.pool = None
+        self._configure_pool(config_manager.snapshot())
+        config_manager.subscribe(self._configure_pool)
+
+    def _configure_pool(self, snapshot):
+        """Create or resize the warm pool from BRAIN_POOL_* (config.json or environment)."""
+        try:
+            pool_size = int(snapshot.get("BRAIN_POOL_SIZE", 2))
+            max_jobs = int(snapshot.get("BRAIN_POOL_MAX_JOBS", 20))
+            spawn_workers = int(snapshot.get("BRAIN_POOL_SPAWN_WORKERS", 2))
+        except (TypeError, ValueError) as e:
+            logger.error(f"Ignoring invalid pool settings in config version {snapshot.version}: {e}")
+            return
+
+        if self.pool:
+            if (pool_size, max_jobs) != (self.pool.size, self.pool.max_jobs):
+                logger.info(f"Resizing warm pool to {pool_size} containers")
+                self.pool.resize(pool_size, max_jobs)
+        elif pool_size > 0:
+            self.pool = WarmPool(
+                self.client,
+                image=snapshot.get("BRAIN_POOL_IMAGE", "contex-brain:latest"),
+                size=pool_size,
+                max_jobs=max_jobs,
+                volumes=self.volumes,
+                extra_hosts=self.extra_hosts,
+                health_interval=float(snapshot.get("BRAIN_POOL_HEALTH_INTERVAL", 30)),
+                pids_limit=default_spec(snapshot).pids,
+                spawn_workers=spawn_workers
+            )
+            self.pool.start()
+
+    def _prepare_env(self, env: dict = None) -> dict:
+        container_env = dict(env) if env else {}
+        if "GOOGLE_API_KEY" in os.environ:
+            container_env["GOOGLE_API_KEY"] = os.environ["GOOGLE_API_KEY"]
+
+        # Replace localhost with host.docker.internal for Mac/Win if needed
+        if sys.platform != "linux" and "SIDECAR_URL" in container_env:
+            container_env["SIDECAR_URL"] = container_env["SIDECAR_URL"].replace("127.0.0.1", "host.docker.internal").replace("localhost", "host.docker.internal")
+        return container_env
+
+    def run_container(self, image: str, command: str, env: dict = None, on_exit=None, resources=None):
         """
-        Runs a real Docker container.
+        Runs a skill in a warm pooled container via exec, falling back to a
+        fresh container when the pool is disabled, exhausted or the image differs.
+        `on_exit` is called with the exit code (or None) once the skill ends.
+        `resources` (a ResourceSpec) sets the container's CPU, memory and pids limits.
         """
+        container_env = self._prepare_env(env)
+
+        if self.pool and image == self.pool.image:
+            pooled = self.pool.acquire()
+            if pooled:
+                return self._exec_in_pool(pooled, command, container_env, on_exit, resources)
+            logger.info("Warm pool exhausted, falling back to cold start")
+
         logger.info(f"Starting REAL container from image: {image}")
         
         try:
-            # Determine networking mode
-            # For Linux, use "host" mode to access localhost.
-            # For Mac/Windows, use "host.docker.internal".
-            extra_hosts = {}
-            if sys.platform != "linux":
-                extra_hosts = {"host.docker.internal": "host-gateway"}
-            
-            # Mount skills directory for hot-reloading/access
-            # Assuming we are running from project root
-            cwd = os.getcwd()
-            volumes = {
-                f"{cwd}/packages/skills": {'bind': '/app/skills', 'mode': 'ro'}
-            }
-
-            # Prepare Environment
-            container_env = env if env else {}
-            if "GOOGLE_API_KEY" in os.environ:
-                container_env["GOOGLE_API_KEY"] = os.environ["GOOGLE_API_KEY"]
-            
-            # Replace localhost with host.docker.internal for Mac/Win if needed
-            if sys.platform != "linux" and "SIDECAR_URL" in container_env:
-                container_env["SIDECAR_URL"] = container_env["SIDECAR_URL"].replace("127.0.0.1", "host.docker.internal").replace("localhost", "host.docker.internal")
-
             # Run container detached
-            container = self.client.containers.run(
-                image,
-                command=f"python3 /app/skills/{command}/main.py", # Assuming command maps to directory
-                environment=container_env,
-                volumes=volumes,
-                extra_hosts=extra_hosts,
-                detach=True,
-                auto_remove=True 
-            )
-            
-            # Spawn a thread to follow logs
-            def _follow_logs():
-                try:
-                    for line in container.logs(stream=True, follow=True):
-                        logger.info(f"[CONTAINER] {line.decode('utf-8').strip()}")
-                except Exception as e:
-                    # Container might have stopped
-                    pass
+            with docker_api_seconds.time("containers.run"):
+                container = self.client.containers.run(
+                    image,
+                    command=f"python3 /app/skills/{command}/main.py", # Assuming command maps to directory
+                    environment=container_env,
+                    volumes=self.volumes,
+                    extra_hosts=self.extra_hosts,
+                    detach=True,
+                    **(resources.docker_kwargs() if resources else {})
+                )
             
-            threading.Thread(target=_follow_logs).start()
+            run = self._track(container.id, container_env.get("TASK_ID"))
+            # docker stop: SIGTERM, then SIGKILL after the timeout
+            run.stopper = lambda grace: container.stop(timeout=max(1, int(grace)))
+            sock = container.attach_socket(params={"stdout": 1, "stderr": 1, "stream": 1, "logs": 1})
+            closed = engine.logs.register(_raw_socket(sock), run.emit, decoder=DockerFrameDecoder())
+            engine.submit(self._supervise_container, run, container, closed, on_exit)
             
-            return container.id
+            return run.id
 
         except Exception as e:
             logger.error(f"Failed to run real container: {e}")
             raise e
 
+    def _exec_in_pool(self, pooled: PooledContainer, command: str, env: dict, on_exit=None, resources=None):
+        """Dispatch a skill into a pooled container with exec and stream its output."""
+        logger.info(f"Dispatching {command} to warm container {pooled.id[:12]}")
+        try:
+            if resources:
+                # The container runs one job at a time, so its limits are this job's limits
+                with docker_api_seconds.time("update_container"):
+                    self.client.api.update_container(pooled.id, **resources.docker_update_kwargs())
+            with docker_api_seconds.time("exec_create"):
+                exec_id = self.client.api.exec_create(
+                    pooled.id,
+                    ["python3", f"/app/skills/{command}/main.py"],
+                    environment=env
+                )["Id"]
+            with docker_api_seconds.time("exec_start"):
+                sock = self.client.api.exec_start(exec_id, socket=True)
+        except Exception as e:
+            logger.error(f"Failed to exec in pooled container: {e}")
+            self.pool.release(pooled)
+            raise e
+
+        # Exec ids are unique per dispatch while the pooled container id is shared
+        run = self._track(exec_id, env.get("TASK_ID"))
+        # An exec cannot be signalled through the API; stop the pooled container,
+        # which fails its health check on release and is replaced
+        run.stopper = lambda grace: pooled.container.stop(timeout=max(1, int(grace)))
+        closed = engine.logs.register(_raw_socket(sock), run.emit, decoder=DockerFrameDecoder())
+        engine.submit(self._supervise_exec, run, pooled, exec_id, closed, on_exit)
+        return run.id
+
+    def _supervise_container(self, run: ContainerRun, container, closed, on_exit=None):
+        """Wait for a cold-started container, collect its exit code and clean up."""
+        exit_code = None
+        try:
+            exit_code = container.wait().get("StatusCode")
+            closed.wait(timeout=10)
+        except Exception as e:
+            # Container might have stopped
+            logger.warning(f"Lost container {container.id[:12]}: {e}")
+        finally:
+            try:
+                container.remove(force=True)
+            except Exception:
+                pass
+        self._finish(run, exit_code, on_exit)
+
+    def _supervise_exec(self, run: ContainerRun, pooled: PooledContainer, exec_id: str, closed, on_exit=None):
+        """Wait for an exec'd skill to finish and hand the container back to the pool."""
+        exit_code = None
+        try:
+            closed.wait()
+            with docker_api_seconds.time("exec_inspect"):
+                exit_code = self.client.api.exec_inspect(exec_id).get("ExitCode")
+            if exit_code == 0:
+                logger.info("Container finished successfully")
+            else:
+                logger.error(f"Container failed with exit code {exit_code}")
+        except Exception as e:
+            logger.error(f"Lost exec stream for {pooled.id[:12]}: {e}")
+        finally:
+            self.pool.release(pooled)
+        self._finish(run, exit_code, on_exit)
+
+    def pool_stats(self) -> dict:
+        if self.pool:
+            return self.pool.stats()
+        return {"enabled": False}
+
+    def shutdown(self):
+        if self.pool:
+            self.pool.shutdown()
+
 # Factory to choose client
 def get_docker_client():
     use_mock = os.getenv("USE_MOCK_DOCKER", "true").lower() == "true"
@@ -170,5 +670,83 @@ def get_docker_client():
             logger.warning("Docker SDK not installed. Falling back to Mock.")
         return MockDockerClient()
 
+class AsyncDockerClient:
+    """
+    Awaitable facade over MockDockerClient/RealDockerClient with the same interface.
+    Blocking Docker SDK calls run on a dedicated executor so they never stall
+    the FastAPI event loop. Stops, which block for up to their grace period,
+    get their own `stop_executor` so they cannot starve launches; waits hold
+    no thread at all and are capped at `max_wait` seconds.
+    """
+    def __init__(self, client, max_workers: int = 8, stop_workers: int = 4, max_wait: float = 300.0):
+        self.client = client
+        self.is_mock = client.is_mock
+        self.max_wait = max_wait
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="docker-api")
+        self.stop_executor = ThreadPoolExecutor(max_workers=stop_workers, thread_name_prefix="docker-stop")
+
+    async def _call(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def run_container(self, image: str, command: str, env: dict = None, on_exit=None, resources=None):
+        return await self._call(self.client.run_container, image, command, env=env, on_exit=on_exit, resources=resources)
+
+    async def wait(self, run_id: str, timeout: float = None):
+        """Exit code of the run once it exits, or None if it is unknown or still running after `timeout`."""
+        run = self.client.get_run(run_id)
+        if not run:
+            return None
+        timeout = self.max_wait if timeout is None else min(max(timeout, 0), self.max_wait)
+        loop = asyncio.get_running_loop()
+        exited = loop.create_future()
+
+        def listener(item):
+            # Only the end of the run (None) matters, not its output lines
+            if item is None:
+                loop.call_soon_threadsafe(lambda: exited.done() or exited.set_result(None))
+
+        run.subscribe(listener)
+        try:
+            await asyncio.wait_for(exited, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            run.unsubscribe(listener)
+        return run.exit_code
+
+    async def follow_logs(self, run_id: str):
+        """Async iterator of (stream, line) for a run until it exits."""
+        run = self.client.get_run(run_id)
+        if not run:
+            return
+        loop = asyncio.get_running_loop()
+        lines = asyncio.Queue()
+        listener = lambda item: loop.call_soon_threadsafe(lines.put_nowait, item)
+        run.subscribe(listener)
+        try:
+            while True:
+                item = await lines.get()
+                if item is None:
+                    break
+                yield item
+        finally:
+            run.unsubscribe(listener)
+
+    def pool_stats(self) -> dict:
+        return self.client.pool_stats()
+
+    def shutdown(self):
+        self.client.shutdown()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.stop_executor.shutdown(wait=False, cancel_futures=True)
+
 # Singleton instance
 docker_client = get_docker_client()
+async_docker_client = AsyncDockerClient(
+    docker_client,
+    max_workers=int(os.getenv("DOCKER_API_WORKERS", "8")),
+    stop_workers=int(os.getenv("DOCKER_STOP_WORKERS", "4")),
+    max_wait=float(os.getenv("DOCKER_MAX_WAIT", "300"))
+)
+metrics.gauge_callback("sidecar_running_containers", "Containers (or mock processes) still running", docker_client.active_runs)
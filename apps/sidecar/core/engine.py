@@ -0,0 +1,240 @@
+import os
+import struct
+import selectors
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from apps.sidecar.core.logger import get_logger
+
+logger = get_logger("sidecar.engine")
+
+class LineDecoder:
+    """Splits a plain byte stream (e.g. a child stdout pipe) into lines."""
+    def __init__(self, stream: str = "stdout"):
+        self.stream = stream
+        self._buffer = b""
+
+    def feed(self, data: bytes) -> list:
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        return [(self.stream, line.decode("utf-8", errors="replace")) for line in lines]
+
+    def flush(self) -> list:
+        rest, self._buffer = self._buffer, b""
+        return [(self.stream, rest.decode("utf-8", errors="replace"))] if rest else []
+
+class DockerFrameDecoder:
+    """
+    Decodes the multiplexed attach/exec stream of a non-TTY container:
+    8-byte header (stream type, 3 padding bytes, big-endian payload size) + payload.
+    """
+    STREAMS = {0: "stdout", 1: "stdout", 2: "stderr"}
+
+    def __init__(self):
+        self._buffer = b""
+        self._lines = {"stdout": LineDecoder("stdout"), "stderr": LineDecoder("stderr")}
+
+    def feed(self, data: bytes) -> list:
+        self._buffer += data
+        out = []
+        while len(self._buffer) >= 8:
+            stream_type, size = struct.unpack(">BxxxL", self._buffer[:8])
+            if len(self._buffer) < 8 + size:
+                break
+            payload, self._buffer = self._buffer[8:8 + size], self._buffer[8 + size:]
+            out.extend(self._lines[self.STREAMS.get(stream_type, "stdout")].feed(payload))
+        return out
+
+    def flush(self) -> list:
+        return self._lines["stdout"].flush() + self._lines["stderr"].flush()
+
+class _Stream:
+    def __init__(self, fileobj, decoder, on_line, on_close):
+        self.fileobj = fileobj
+        self.fd = fileobj if isinstance(fileobj, int) else fileobj.fileno()
+        self.decoder = decoder
+        self.on_line = on_line
+        self.on_close = on_close
+        self.closed = threading.Event()
+
+class LogMultiplexer:
+    """
+    Reads every registered child pipe and Docker socket from a single
+    selector loop instead of one blocking reader thread per stream.
+    """
+    READ_SIZE = 65536
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._stopped = False
+        self._thread = None
+        self._stats = {"streams": 0, "bytes_read": 0, "lines": 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="log-multiplexer", daemon=True)
+        self._thread.start()
+
+    def register(self, fileobj, on_line: Callable, on_close: Optional[Callable] = None, decoder=None) -> threading.Event:
+        """
+        Start pumping `fileobj` (file object, socket or raw fd). `on_line(stream, line)`
+        is called from the multiplexer thread; the returned event is set at EOF.
+        """
+        stream = _Stream(fileobj, decoder or LineDecoder(), on_line, on_close)
+        with self._lock:
+            self._pending.append(stream)
+        self._wake()
+        return stream.closed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def shutdown(self):
+        self._stopped = True
+        self._wake()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b"\0")
+        except OSError:
+            pass
+
+    def _loop(self):
+        while not self._stopped:
+            for key, _ in self._selector.select(timeout=1.0):
+                if key.data is None:
+                    try:
+                        os.read(self._wake_r, 4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                self._read(key.data)
+
+            with self._lock:
+                pending, self._pending = self._pending, []
+            for stream in pending:
+                self._selector.register(stream.fd, selectors.EVENT_READ, stream)
+                with self._lock:
+                    self._stats["streams"] += 1
+
+        for key in list(self._selector.get_map().values()):
+            if key.data is not None:
+                self._close(key.data)
+        self._selector.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _read(self, stream: _Stream):
+        try:
+            data = os.read(stream.fd, self.READ_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+
+        if not data:
+            self._emit(stream, stream.decoder.flush())
+            self._close(stream)
+            return
+
+        lines = stream.decoder.feed(data)
+        with self._lock:
+            self._stats["bytes_read"] += len(data)
+        self._emit(stream, lines)
+
+    def _emit(self, stream: _Stream, lines: list):
+        with self._lock:
+            self._stats["lines"] += len(lines)
+        for name, line in lines:
+            try:
+                stream.on_line(name, line)
+            except Exception as e:
+                logger.error(f"Log pump callback failed: {e}")
+
+    def _close(self, stream: _Stream):
+        try:
+            self._selector.unregister(stream.fd)
+        except (KeyError, ValueError):
+            pass
+        with self._lock:
+            self._stats["streams"] -= 1
+        try:
+            if isinstance(stream.fileobj, int):
+                os.close(stream.fileobj)
+            else:
+                stream.fileobj.close()
+        except OSError:
+            pass
+        stream.closed.set()
+        if stream.on_close:
+            try:
+                stream.on_close()
+            except Exception as e:
+                logger.error(f"Log pump close callback failed: {e}")
+
+class ExecutionEngine:
+    """
+    Process-wide execution engine: a bounded worker pool for task supervision
+    plus a single log multiplexer shared by every running task.
+    """
+    def __init__(self, max_workers: int = 16):
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="task-supervisor")
+        self.logs = LogMultiplexer()
+        self.logs.start()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._submitted = 0
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """Run a supervision job on the bounded worker pool."""
+        def _job():
+            with self._lock:
+                self._active += 1
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Supervision job failed: {e}")
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+        with self._lock:
+            self._submitted += 1
+        return self.executor.submit(_job)
+
+    def stats(self) -> dict:
+        with self._lock:
+            active, submitted = self._active, self._submitted
+        return {
+            "max_workers": self.max_workers,
+            "active_jobs": active,
+            "queued_jobs": self.executor._work_queue.qsize(),
+            "submitted_jobs": submitted,
+            "log_pumps": self.logs.stats(),
+            "threads": threading.active_count(),
+            "open_fds": count_open_fds(),
+        }
+
+    def shutdown(self):
+        logger.info("Shutting down execution engine")
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.logs.shutdown()
+
+def count_open_fds() -> Optional[int]:
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(fd_dir))
+        except OSError:
+            continue
+    return None
+
+# Singleton instance
+engine = ExecutionEngine(max_workers=int(os.getenv("ENGINE_MAX_WORKERS", "16")))
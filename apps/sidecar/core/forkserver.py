@@ -0,0 +1,329 @@
+"""
+Pre-warmed fork server for running skills locally (mock mode).
+
+The server process imports brain.core and the heavy skill dependencies once,
+then forks a child per task. The sidecar passes the child's stdout/stderr
+pipes over a Unix socket (SCM_RIGHTS), so output capture works exactly like
+with subprocess.Popen.
+
+Run as: python -m apps.sidecar.core.forkserver <socket_path>
+"""
+import io
+import os
+import sys
+import json
+import time
+import runpy
+import select
+import signal
+import resource
+import socket
+import tempfile
+import importlib
+import traceback
+import subprocess
+from pathlib import Path
+from apps.sidecar.core.logger import get_logger
+
+logger = get_logger("sidecar.forkserver")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+
+PRELOAD_MODULES = [
+    "requests",
+    "duckduckgo_search",
+    "google.genai",
+    "langgraph.graph",
+    "brain.core.config",
+    "brain.core.logger",
+    "brain.core.client",
+    "brain.core.storage",
+    "brain.core.workflow",
+]
+
+def is_supported() -> bool:
+    return hasattr(os, "fork") and hasattr(socket, "send_fds") and hasattr(socket, "AF_UNIX")
+
+RLIMITS = {"data": resource.RLIMIT_DATA, "cpu": resource.RLIMIT_CPU}
+
+def apply_rlimits(limits: dict):
+    """Apply ResourceSpec.rlimits() in a task process (forked child or Popen preexec_fn)."""
+    for name, soft in (limits or {}).items():
+        which = RLIMITS[name]
+        _, hard = resource.getrlimit(which)
+        # CPU: SIGXCPU at the soft limit, SIGKILL a few seconds later
+        limit = soft + 5 if name == "cpu" else soft
+        if hard != resource.RLIM_INFINITY:
+            soft, limit = min(soft, hard), min(limit, hard)
+        resource.setrlimit(which, (soft, limit))
+
+# --- Server side (runs in the forkserver process) ---
+
+def _preload():
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"forkserver: skipped preloading {name}: {e}", file=sys.stderr, flush=True)
+
+def _refresh_brain_core():
+    """Preloaded brain.core singletons captured the forkserver's environment; rebuild them for the task."""
+    if "brain.core.config" in sys.modules:
+        sys.modules["brain.core.config"].config.reload()
+    if "brain.core.client" in sys.modules:
+        client = sys.modules["brain.core.client"]
+        client.sidecar.base_url = client.config.get("SIDECAR_URL", client.sidecar.base_url)
+    if "brain.core.storage" in sys.modules:
+        storage = sys.modules["brain.core.storage"].storage
+        storage.db_path = os.getenv("BRAIN_DB_PATH", storage.db_path)
+        storage._ensure_db_dir()
+        storage._init_db()
+
+def _run_child(request: dict, fds: list, inherited: list):
+    """Body of a forked task process. Never returns."""
+    exit_code = 1
+    try:
+        for sock in inherited:
+            sock.close()
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        # Own process group so cancellation can signal the whole skill tree
+        os.setsid()
+        apply_rlimits(request.get("rlimits"))
+
+        os.dup2(fds[0], 1)
+        os.dup2(fds[1], 2)
+        for fd in fds:
+            os.close(fd)
+        sys.stdout = io.TextIOWrapper(io.FileIO(1, "w", closefd=False), line_buffering=True)
+        sys.stderr = io.TextIOWrapper(io.FileIO(2, "w", closefd=False), line_buffering=True)
+        # Loggers created during preload hold the old stream objects
+        import logging
+        for obj in list(logging.Logger.manager.loggerDict.values()) + [logging.getLogger()]:
+            for handler in getattr(obj, "handlers", []):
+                if isinstance(handler, logging.StreamHandler) and handler.stream in (sys.__stdout__, sys.__stderr__):
+                    handler.setStream(sys.stdout if handler.stream is sys.__stdout__ else sys.stderr)
+
+        os.environ.clear()
+        os.environ.update(request["env"])
+        os.chdir(request["cwd"])
+        _refresh_brain_core()
+
+        script = request["script"]
+        sys.argv = [script]
+        sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+        runpy.run_path(script, run_name="__main__")
+        exit_code = 0
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+def serve(socket_path: str):
+    _preload()
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(64)
+    print(f"forkserver: ready on {socket_path}", file=sys.stderr, flush=True)
+
+    parent = os.getppid()
+    children = {}
+    while True:
+        # Exit with the sidecar; running children keep going in their own sessions
+        if os.getppid() != parent:
+            break
+
+        readable, _, _ = select.select([listener], [], [], 0.1)
+        if readable:
+            conn, _ = listener.accept()
+            try:
+                msg, fds, _, _ = socket.recv_fds(conn, 65536, 2)
+                request = json.loads(msg)
+                pid = os.fork()
+                if pid == 0:
+                    _run_child(request, fds, [listener, conn, *children.values()])
+                for fd in fds:
+                    os.close(fd)
+                conn.sendall(json.dumps({"pid": pid}).encode() + b"\n")
+                children[pid] = conn
+            except Exception as e:
+                print(f"forkserver: failed to fork task: {e}", file=sys.stderr, flush=True)
+                conn.close()
+
+        # Reap finished children and report their exit codes
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            conn = children.pop(pid, None)
+            if conn:
+                try:
+                    conn.sendall(json.dumps({"exit_code": os.waitstatus_to_exitcode(status)}).encode() + b"\n")
+                except OSError:
+                    pass
+                conn.close()
+
+# --- Client side (runs in the sidecar) ---
+
+def _recv_line(conn: socket.socket, buffer: bytearray, timeout: float = None):
+    """Read one newline-terminated message; returns None on EOF."""
+    conn.settimeout(timeout)
+    while b"\n" not in buffer:
+        chunk = conn.recv(4096)
+        if not chunk:
+            return None
+        buffer.extend(chunk)
+    line, _, rest = bytes(buffer).partition(b"\n")
+    buffer[:] = rest
+    return line
+
+class ForkedProcess:
+    """Popen-like handle for a task forked by the forkserver."""
+    def __init__(self, conn: socket.socket, buffer: bytearray, pid: int, stdout, stderr):
+        self._conn = conn
+        self._buffer = buffer
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+
+    def wait(self, timeout: float = None):
+        if self.returncode is not None:
+            return self.returncode
+        try:
+            line = _recv_line(self._conn, self._buffer, timeout)
+        except socket.timeout:
+            raise subprocess.TimeoutExpired(f"forked pid {self.pid}", timeout)
+        # An empty read means the forkserver died; the exit status is lost
+        self.returncode = json.loads(line)["exit_code"] if line else -1
+        self._conn.close()
+        return self.returncode
+
+    def poll(self):
+        if self.returncode is None:
+            try:
+                self.wait(timeout=0.001)
+            except subprocess.TimeoutExpired:
+                pass
+        return self.returncode
+
+    def send_signal(self, sig):
+        try:
+            os.killpg(self.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+class ForkServer:
+    """Starts and talks to the forkserver process."""
+    def __init__(self, startup_timeout: float = 60.0):
+        self.startup_timeout = startup_timeout
+        self.socket_path = os.path.join(tempfile.mkdtemp(prefix="contex-forkserver-"), "server.sock")
+        self.process = None
+        self.forks = 0
+
+    def start(self, on_output=None):
+        """Launch the server; preloading happens in the background of that process."""
+        env = os.environ.copy()
+        env["PYTHONPATH"] = f"{PROJECT_ROOT}:{PROJECT_ROOT}/packages:" + env.get("PYTHONPATH", "")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "apps.sidecar.core.forkserver", self.socket_path],
+            cwd=str(PROJECT_ROOT),
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+        if on_output:
+            on_output(self.process.stderr)
+        logger.info(f"Forkserver started (pid {self.process.pid})")
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def spawn(self, script: str, env: dict, cwd: str, rlimits: dict = None) -> ForkedProcess:
+        """Fork a child running `script` with `env` (and rlimits); blocks until the server is ready."""
+        conn = self._connect()
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        try:
+            request = json.dumps({"script": script, "env": env, "cwd": cwd, "rlimits": rlimits or {}}).encode()
+            socket.send_fds(conn, [request], [out_w, err_w])
+        except Exception:
+            for fd in (out_r, err_r):
+                os.close(fd)
+            conn.close()
+            raise
+        finally:
+            os.close(out_w)
+            os.close(err_w)
+
+        buffer = bytearray()
+        reply = _recv_line(conn, buffer)
+        if not reply:
+            os.close(out_r)
+            os.close(err_r)
+            conn.close()
+            raise RuntimeError("forkserver closed the connection")
+        self.forks += 1
+        return ForkedProcess(conn, buffer, json.loads(reply)["pid"], os.fdopen(out_r, "rb"), os.fdopen(err_r, "rb"))
+
+    def stats(self) -> dict:
+        return {
+            "alive": self.alive(),
+            "pid": self.process.pid if self.process else None,
+            "forks": self.forks,
+        }
+
+    def shutdown(self):
+        if self.alive():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        try:
+            os.unlink(self.socket_path)
+            os.rmdir(os.path.dirname(self.socket_path))
+        except OSError:
+            pass
+
+    def _connect(self) -> socket.socket:
+        deadline = time.time() + self.startup_timeout
+        while True:
+            if not self.alive():
+                raise RuntimeError("forkserver is not running")
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                conn.connect(self.socket_path)
+                return conn
+            except (FileNotFoundError, ConnectionRefusedError):
+                conn.close()
+                if time.time() > deadline:
+                    raise RuntimeError("forkserver did not become ready in time")
+                time.sleep(0.05)
+
+if __name__ == "__main__":
+    serve(sys.argv[1])
@@ -0,0 +1,233 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+from apps.sidecar.core.logger import get_logger, LOG_FILE, LOG_BACKUP_COUNT, LEVELS
+from apps.sidecar.core.log_reader import read_since
+
+logger = get_logger("sidecar.log_index")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+DB_PATH = Path(os.getenv("LOG_INDEX_DB_PATH", PROJECT_ROOT / "data" / "logs.db"))
+
+def to_epoch(value) -> Optional[float]:
+    """Accept epoch seconds or ISO-8601 timestamps (naive values are UTC, like JsonFormatter output)."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+class LogIndexBusy(Exception):
+    """Raised when a query cannot run because the index database is locked or busy."""
+
+class LogIndex:
+    """
+    Indexes the JSON records of system.log into SQLite (FTS5 on message text).
+    A background thread tails the log with a persisted cursor and ingests
+    records in batched transactions, so request handlers never wait on it.
+    """
+    def __init__(self, db_path: Path = DB_PATH, log_file: Path = LOG_FILE, batch_size: int = 5000,
+                 poll_interval: float = 1.0, retention_days: float = 7, compact_interval: float = 3600):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.log_file = log_file
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retention_days = retention_days
+        self.compact_interval = compact_interval
+
+        self._stopped = threading.Event()
+        self._thread = None
+        self._stats = {"ingested": 0, "batches": 0, "last_batch_seconds": 0.0, "compactions": 0, "errors": 0}
+        self._init_db()
+
+    def _get_conn(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        with self._get_conn() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS records (
+                    id INTEGER PRIMARY KEY,
+                    ts REAL,
+                    timestamp TEXT,
+                    level TEXT,
+                    level_no INTEGER,
+                    component TEXT,
+                    task_id TEXT,
+                    message TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_records_ts ON records (ts);
+                CREATE INDEX IF NOT EXISTS idx_records_component_ts ON records (component, ts);
+                CREATE INDEX IF NOT EXISTS idx_records_task ON records (task_id) WHERE task_id IS NOT NULL;
+                CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+                    message, content='records', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS records_ad AFTER DELETE ON records BEGIN
+                    INSERT INTO records_fts (records_fts, rowid, message) VALUES ('delete', old.id, old.message);
+                END;
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """)
+
+    # --- Ingestion ---
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="log-indexer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def ingest(self, records: list, cursor: str = None) -> int:
+        """Insert a batch of records (and the tail cursor) in a single transaction."""
+        rows = []
+        for r in records:
+            try:
+                ts = to_epoch(r.get("timestamp"))
+            except ValueError:
+                ts = None
+            level = r.get("level")
+            rows.append((ts, r.get("timestamp"), level, LEVELS.get(level, 0),
+                         r.get("component"), r.get("task_id"), r.get("message")))
+
+        start = time.perf_counter()
+        with self._get_conn() as conn:
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM records").fetchone()[0]
+            conn.executemany(
+                "INSERT INTO records (ts, timestamp, level, level_no, component, task_id, message) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            # One bulk FTS insert per batch is several times cheaper than a per-row trigger
+            conn.execute("INSERT INTO records_fts (rowid, message) SELECT id, message FROM records WHERE id > ?", (last_id,))
+            if cursor:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cursor', ?)", (cursor,))
+
+        self._stats["ingested"] += len(rows)
+        self._stats["batches"] += 1
+        self._stats["last_batch_seconds"] = time.perf_counter() - start
+        return len(rows)
+
+    def compact(self):
+        """Apply retention and merge FTS segments."""
+        cutoff = time.time() - self.retention_days * 86400
+        with self._get_conn() as conn:
+            deleted = conn.execute("DELETE FROM records WHERE ts < ?", (cutoff,)).rowcount
+            conn.execute("INSERT INTO records_fts (records_fts) VALUES ('optimize')")
+        self._stats["compactions"] += 1
+        if deleted:
+            logger.info(f"Log index retention removed {deleted} records")
+
+    def _load_cursor(self) -> Optional[str]:
+        with self._get_conn() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'cursor'").fetchone()
+        return row[0] if row else None
+
+    def _run(self):
+        cursor = self._load_cursor()
+        last_compaction = time.time()
+        while not self._stopped.is_set():
+            try:
+                records, cursor = read_since(self.log_file, cursor, self.batch_size, backup_count=LOG_BACKUP_COUNT)
+                if records:
+                    self.ingest(records, cursor)
+                if time.time() - last_compaction > self.compact_interval:
+                    self.compact()
+                    last_compaction = time.time()
+            except Exception as e:
+                # Never log from here at error rate: our own records feed this loop
+                self._stats["errors"] += 1
+                records = []
+                if self._stats["errors"] == 1:
+                    logger.error(f"Log indexer failed: {e}")
+            # Keep draining at full speed while behind, otherwise poll
+            if len(records) < self.batch_size:
+                self._stopped.wait(self.poll_interval)
+
+    # --- Queries ---
+
+    def query(self, start=None, end=None, level: str = None, component: str = None, task_id: str = None,
+              q: str = None, limit: int = 100, offset: int = 0) -> dict:
+        """
+        Filter by time window, minimum level, component prefix, task_id and
+        full-text `q` (FTS5 syntax). Returns a page plus per-level/component counts.
+        """
+        clauses, params = [], []
+        start, end = to_epoch(start), to_epoch(end)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(end)
+        if level:
+            clauses.append("level_no >= ?")
+            params.append(LEVELS.get(level.upper(), 0))
+        if component:
+            clauses.append("component LIKE ? ESCAPE '\\'")
+            params.append(component.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if task_id:
+            clauses.append("task_id = ?")
+            params.append(task_id)
+        if q:
+            clauses.append("id IN (SELECT rowid FROM records_fts WHERE records_fts MATCH ?)")
+            params.append(q)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        try:
+            with self._get_conn() as conn:
+                rows = conn.execute(
+                    f"SELECT timestamp, level, component, task_id, message FROM records {where} "
+                    f"ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?",
+                    (*params, limit, offset)
+                ).fetchall()
+                by_level = conn.execute(f"SELECT level, COUNT(*) FROM records {where} GROUP BY level", params).fetchall()
+                by_component = conn.execute(
+                    f"SELECT component, COUNT(*) FROM records {where} GROUP BY component", params
+                ).fetchall()
+        except sqlite3.OperationalError as e:
+            message = str(e)
+            if "locked" in message or "busy" in message:
+                # The indexer holds the write lock; worth retrying, not the caller's fault
+                raise LogIndexBusy(f"Log index is busy: {message}")
+            if q:
+                # `q` is the only SQL text a caller controls: an invalid FTS5 expression
+                raise ValueError(f"Invalid log query: {message}")
+            raise
+
+        records = []
+        for timestamp, lvl, comp, tid, message in rows:
+            record = {"timestamp": timestamp, "level": lvl, "component": comp, "message": message}
+            if tid:
+                record["task_id"] = tid
+            records.append(record)
+
+        return {
+            "total": sum(count for _, count in by_level),
+            "limit": limit,
+            "offset": offset,
+            "records": records,
+            "counts": {
+                "level": dict(by_level),
+                "component": dict(by_component),
+            },
+        }
+
+    def stats(self) -> dict:
+        return dict(self._stats, running=bool(self._thread and self._thread.is_alive()))
+
+# Singleton instance
+log_index = LogIndex(retention_days=float(os.getenv("LOG_INDEX_RETENTION_DAYS", "7")))
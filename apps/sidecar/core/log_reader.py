@@ -0,0 +1,130 @@
+import os
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+BLOCK_SIZE = 64 * 1024
+
+def log_files(base: Path, backup_count: int = 5) -> List[Path]:
+    """Existing log files from oldest to newest: system.log.5 ... system.log.1, system.log."""
+    files = [Path(f"{base}.{i}") for i in range(backup_count, 0, -1)] + [Path(base)]
+    return [f for f in files if f.exists()]
+
+def make_cursor(path: Path, offset: int) -> str:
+    """A cursor is `inode:offset`, which stays valid when the file is renamed by rotation."""
+    return f"{os.stat(path).st_ino}:{offset}"
+
+def parse_cursor(cursor: str) -> Optional[Tuple[int, int]]:
+    try:
+        inode, offset = cursor.split(":", 1)
+        return int(inode), int(offset)
+    except (AttributeError, ValueError):
+        return None
+
+def tail_lines(path: Path, limit: int) -> List[bytes]:
+    """Return the last `limit` complete lines of a file by reading blocks backwards from the end."""
+    with open(path, "rb") as f:
+        return _tail(f, limit)[0]
+
+def _tail(f, limit: int) -> Tuple[List[bytes], int]:
+    """The last `limit` complete lines of an open file and the offset just past them."""
+    if limit <= 0:
+        return [], f.seek(0, os.SEEK_END)
+    position = f.seek(0, os.SEEK_END)
+    end = position
+    data = b""
+    # limit + 1 newlines guarantee `limit` full lines (the first may be partial)
+    while position > 0 and data.count(b"\n") <= limit:
+        step = min(BLOCK_SIZE, position)
+        position -= step
+        f.seek(position)
+        data = f.read(step) + data
+
+    # A last line without its newline is still being written; leave it for read_since()
+    partial = len(data) - (data.rfind(b"\n") + 1)
+    lines = data[:len(data) - partial].split(b"\n")
+    if lines and lines[-1] == b"":
+        lines.pop()
+    return lines[-limit:], end - partial
+
+def parse_line(line) -> dict:
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", errors="replace")
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        # Handle cases where line might not be valid JSON (e.g. stack traces)
+        return {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "level": "ERROR",
+            "component": "system",
+            "message": line.strip()
+        }
+
+def tail_records(base: Path, limit: int, backup_count: int = 5) -> Tuple[list, Optional[str]]:
+    """
+    Last `limit` records across the current and rotated files, reading only
+    about as many bytes as those records occupy. The returned cursor points
+    just past the last line read from the current file, for incremental reads
+    with read_since(); lines appended meanwhile are left for that call.
+    """
+    files = log_files(base, backup_count)
+    if not files:
+        return [], None
+
+    with open(files[-1], "rb") as f:
+        # Inode and offset of the file actually read, even if it is rotated right after
+        lines, end = _tail(f, limit)
+        cursor = f"{os.fstat(f.fileno()).st_ino}:{end}"
+    for path in reversed(files[:-1]):
+        needed = limit - len(lines)
+        if needed <= 0:
+            break
+        lines = tail_lines(path, needed) + lines
+
+    return [parse_line(l) for l in lines if l.strip()], cursor
+
+def read_since(base: Path, cursor: str, limit: int = 1000, backup_count: int = 5) -> Tuple[list, Optional[str]]:
+    """
+    Records written after `cursor`, oldest first, spanning rotation boundaries.
+    Without a cursor reading starts at the oldest file. A cursor whose file is
+    gone (rotated out, or the logs were replaced) resumes at the start of the
+    current file rather than re-reading rotated files it has most likely
+    consumed already.
+    """
+    files = log_files(base, backup_count)
+    if not files:
+        return [], cursor
+
+    parsed = parse_cursor(cursor)
+    start_index, offset = 0, 0
+    if parsed:
+        inode, cursor_offset = parsed
+        start_index = len(files) - 1
+        for i, path in enumerate(files):
+            if os.stat(path).st_ino == inode:
+                start_index = i
+                # A file smaller than the cursor was truncated; start over
+                offset = cursor_offset if cursor_offset <= os.path.getsize(path) else 0
+                break
+
+    records = []
+    path, position = files[start_index], offset
+    for i in range(start_index, len(files)):
+        path = files[i]
+        position = offset if i == start_index else 0
+        with open(path, "rb") as f:
+            f.seek(position)
+            while len(records) < limit:
+                line = f.readline()
+                # Leave a partially written last line for the next call
+                if not line.endswith(b"\n"):
+                    break
+                position += len(line)
+                if line.strip():
+                    records.append(parse_line(line))
+        if len(records) >= limit:
+            break
+
+    return records, make_cursor(path, position)
@@ -2,10 +2,17 @@ import logging
 import json
 import sys
 import os
+import asyncio
+import queue
+import atexit
+import itertools
+import threading
 from datetime import datetime
 from collections import deque
 from pathlib import Path
 from logging.handlers import RotatingFileHandler
+from apps.sidecar.core.log_reader import tail_records, read_since
+from apps.sidecar.core.metrics import metrics
 
 # Global log buffer for real-time UI updates
 LOG_BUFFER = deque(maxlen=1000)
@@ -15,53 +22,309 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
 LOG_DIR = PROJECT_ROOT / "logs"
 LOG_DIR.mkdir(exist_ok=True)
 LOG_FILE = LOG_DIR / "system.log"
+LOG_MAX_BYTES = 10*1024*1024
+LOG_BACKUP_COUNT = 5
 
 class JsonFormatter(logging.Formatter):
-    def format(self, record):
+    def to_dict(self, record) -> dict:
         log_record = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": datetime.utcfromtimestamp(record.created).isoformat() + "Z",
             "level": record.levelname,
             "component": record.name,
             "message": record.getMessage(),
         }
         if hasattr(record, "task_id"):
             log_record["task_id"] = record.task_id
-        return json.dumps(log_record)
+        if record.exc_info:
+            log_record["exception"] = self.formatException(record.exc_info)
+        return log_record
+
+    def format(self, record):
+        return json.dumps(self.to_dict(record))
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+def record_matches(record: dict, level: str = None, component: str = None, task_id: str = None) -> bool:
+    """Server-side log filters: minimum level, component prefix and exact task_id."""
+    if level and LEVELS.get(record.get("level"), 0) < LEVELS.get(level.upper(), 0):
+        return False
+    if component and not record.get("component", "").startswith(component):
+        return False
+    if task_id and record.get("task_id") != task_id:
+        return False
+    return True
+
+class LogSubscription:
+    """
+    A live log subscriber with a bounded queue. When the consumer falls behind,
+    the oldest records are dropped and counted instead of stalling logging.
+    """
+    def __init__(self, loop, filters: dict, max_queue: int = 1000):
+        self.loop = loop
+        self.filters = filters
+        self.dropped = 0
+        self.last_seq = 0
+        self._records = deque(maxlen=max_queue)
+        self._lock = threading.Lock()
+        self._event = asyncio.Event()
+
+    def push(self, record: dict):
+        if not record_matches(record, **self.filters):
+            return
+        with self._lock:
+            # A record can race between cursor replay and live publishing
+            seq = record.get("seq", 0)
+            if seq and seq <= self.last_seq:
+                return
+            self.last_seq = seq or self.last_seq
+            was_empty = not self._records
+            if len(self._records) == self._records.maxlen:
+                self.dropped += 1
+            self._records.append(record)
+        if was_empty:
+            try:
+                self.loop.call_soon_threadsafe(self._event.set)
+            except RuntimeError:
+                # Event loop already closed
+                pass
+
+    async def get(self, timeout: float = None) -> list:
+        """Wait for and return all pending records ([] on timeout)."""
+        with self._lock:
+            if not self._records:
+                self._event.clear()
+        if timeout is None:
+            await self._event.wait()
+        else:
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        with self._lock:
+            records = list(self._records)
+            self._records.clear()
+        return records
+
+class LogBroker:
+    """Fans records from the logging pipeline out to live subscribers (e.g. /logs/stream)."""
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, record: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(record)
+
+    def subscribe(self, cursor: int = None, max_queue: int = 1000, **filters) -> LogSubscription:
+        """
+        Register a subscriber on the running event loop. With a cursor (last seen
+        `seq`), buffered records newer than it are replayed first.
+        """
+        subscription = LogSubscription(asyncio.get_running_loop(), filters, max_queue)
+        with self._lock:
+            if cursor is not None:
+                for record in list(LOG_BUFFER):
+                    if record.get("seq", 0) > cursor:
+                        subscription.push(record)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LogSubscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "dropped": sum(s.dropped for s in self._subscribers),
+            }
+
+log_broker = LogBroker()
+
+class BatchRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that can append a whole batch of lines in one write."""
+    def write_batch(self, text: str):
+        if self.stream is None:
+            self.stream = self._open()
+        # maxBytes is a file size: measure the batch as it will be written, not in characters
+        size = len(text.encode(self.encoding or "utf-8"))
+        if self.maxBytes > 0 and self.stream.tell() and self.stream.tell() + size >= self.maxBytes:
+            self.doRollover()
+        self.stream.write(text)
+        self.stream.flush()
+
+class LogPipeline:
+    """
+    Queue-based logging pipeline. Callers only build the structured record and
+    enqueue it; a background thread serializes each record once and fans
+    batches out to the file, stdout, the UI ring buffer and live subscribers.
+
+    Each record gets a `seq` that is monotonic within this process only (it is
+    the resume cursor of the in-process /logs/stream buffer). The sidecar and
+    the gateway append to the same system.log, so records there are identified
+    by (`pid`, `seq`).
+
+    Overflow policies when the bounded queue is full:
+      drop_new    - discard the incoming record
+      drop_oldest - discard the oldest queued record to make room
+      block       - wait for space (the caller stalls, nothing is lost)
+    """
+    POLICIES = ("drop_new", "drop_oldest", "block")
+
+    def __init__(self, file_handler: BatchRotatingFileHandler = None, stream=None,
+                 max_queue: int = 10000, batch_size: int = 512, overflow: str = "drop_new"):
+        if overflow not in self.POLICIES:
+            raise ValueError(f"Unknown log overflow policy: {overflow}")
+        self.file_handler = file_handler
+        self.stream = stream
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._sequence = itertools.count(1)
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "batches": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._run, name="log-pipeline", daemon=True)
+        self._thread.start()
+
+    def put(self, record: dict):
+        try:
+            if self.overflow == "block":
+                self.queue.put(record)
+            else:
+                self._put_nowait(record)
+            with self._lock:
+                self._stats["enqueued"] += 1
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+
+    def _put_nowait(self, record: dict):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow != "drop_oldest":
+                raise
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                with self._lock:
+                    self._stats["dropped"] += 1
+            except queue.Empty:
+                pass
+            self.queue.put_nowait(record)
+
+    def flush(self):
+        """Block until every record enqueued so far has been written."""
+        self.queue.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, queued=self.queue.qsize(), max_queue=self.queue.maxsize, overflow=self.overflow)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                with self._lock:
+                    self._stats["errors"] += 1
+                print(f"Log pipeline write failed: {e}", file=sys.stderr)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write(self, batch: list):
+        for record in batch:
+            # Monotonic cursor so stream clients can resume where they left off
+            record["seq"] = next(self._sequence)
+            record["pid"] = self._pid
+        text = "".join(json.dumps(record) + "\n" for record in batch)
+
+        if self.file_handler:
+            self.file_handler.write_batch(text)
+        if self.stream:
+            self.stream.write(text)
+            self.stream.flush()
+        LOG_BUFFER.extend(batch)
+        for record in batch:
+            log_broker.publish(record)
+
+        with self._lock:
+            self._stats["written"] += len(batch)
+            self._stats["batches"] += 1
+
+class QueueingHandler(logging.Handler):
+    """Root handler: formats a record into a dict once on the calling thread and enqueues it."""
+    def __init__(self, pipeline: LogPipeline):
+        super().__init__()
+        self.pipeline = pipeline
+        self.setFormatter(JsonFormatter())
 
-class BufferHandler(logging.Handler):
     def emit(self, record):
         try:
-            msg = self.format(record)
-            LOG_BUFFER.append(json.loads(msg))
+            log_records.inc(record.levelname)
+            self.pipeline.put(self.formatter.to_dict(record))
         except Exception:
             self.handleError(record)
 
+    def flush(self):
+        self.pipeline.flush()
+
+log_pipeline = None
+
+log_records = metrics.counter("sidecar_log_records", "Log records emitted, by level", ("level",))
+metrics.counter_callback(
+    "sidecar_log_records_dropped", "Log records dropped by the pipeline overflow policy",
+    lambda: pipeline_stats().get("dropped", 0)
+)
+metrics.gauge_callback(
+    "sidecar_log_queue_depth", "Log records waiting for the pipeline thread",
+    lambda: pipeline_stats().get("queued", 0)
+)
+
 def setup_logging_config():
     """
-    Setup the root logger to write to file and stdout.
+    Setup the root logger to write to file and stdout through the async pipeline.
     This should be called once by the main application entry point.
     """
+    global log_pipeline
+    if log_pipeline is not None:
+        return log_pipeline
+
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
-    
-    formatter = JsonFormatter()
-    
-    # 1. File Handler (Rotating)
-    file_handler = RotatingFileHandler(
-        LOG_FILE, maxBytes=10*1024*1024, backupCount=5
+
+    log_pipeline = LogPipeline(
+        # 1. File (Rotating)
+        file_handler=BatchRotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT),
+        # 2. Stdout
+        stream=sys.stdout,
+        max_queue=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+        batch_size=int(os.getenv("LOG_BATCH_SIZE", "512")),
+        overflow=os.getenv("LOG_OVERFLOW_POLICY", "drop_new")
     )
-    file_handler.setFormatter(formatter)
-    root_logger.addHandler(file_handler)
-    
-    # 2. Stdout Handler
-    stdout_handler = logging.StreamHandler(sys.stdout)
-    stdout_handler.setFormatter(formatter)
-    root_logger.addHandler(stdout_handler)
-    
-    # 3. Buffer Handler (for UI API)
-    buffer_handler = BufferHandler()
-    buffer_handler.setFormatter(formatter)
-    root_logger.addHandler(buffer_handler)
+    # 3. Ring buffer (for UI API) and live subscribers are fed by the pipeline too
+    root_logger.addHandler(QueueingHandler(log_pipeline))
+    # Drain what is queued before the interpreter exits
+    atexit.register(log_pipeline.flush)
+    return log_pipeline
+
+def flush_logs():
+    if log_pipeline:
+        log_pipeline.flush()
+
+def pipeline_stats() -> dict:
+    return log_pipeline.stats() if log_pipeline else {"enabled": False}
 
 def get_logger(name: str):
     # Just return the logger, assuming setup_logging_config is called globally
@@ -73,38 +336,23 @@ def get_logger(name: str):
 
 def get_logs(limit: int = 100):
     """
-    Read the last N lines from the log file to ensure we capture logs from all processes 
+    Read the last N records from the log files to ensure we capture logs from all processes 
     (Sidecar, Gateway, etc.) that write to the shared system.log.
     """
-    logs = []
-    if not LOG_FILE.exists():
-        return []
-        
+    return read_logs(limit=limit)[0]
+
+def read_logs(limit: int = 100, cursor: str = None):
+    """
+    Return (records, cursor). Without a cursor this is a tail of the last `limit`
+    records; with one, only records written since, across rotated files.
+    """
     try:
-        # Simple implementation using deque for tailing
-        # For very large files, this might need optimization (seek to end and read backwards)
-        # But given log rotation (10MB), reading the file is acceptable for MVP
-        with open(LOG_FILE, 'r') as f:
-            # Read all lines is expensive, so let's use a more efficient way for last N lines
-            # Using deque with maxlen is memory efficient
-            last_lines = deque(f, maxlen=limit)
-            
-            for line in last_lines:
-                try:
-                    logs.append(json.loads(line))
-                except json.JSONDecodeError:
-                    # Handle cases where line might not be valid JSON (e.g. stack traces)
-                    logs.append({
-                        "timestamp": datetime.utcnow().isoformat() + "Z",
-                        "level": "ERROR",
-                        "component": "system",
-                        "message": line.strip()
-                    })
+        if cursor:
+            return read_since(LOG_FILE, cursor, limit, backup_count=LOG_BACKUP_COUNT)
+        return tail_records(LOG_FILE, limit, backup_count=LOG_BACKUP_COUNT)
     except Exception as e:
         # Fallback to internal buffer if file read fails
-        return list(LOG_BUFFER)[-limit:]
-        
-    return logs
+        return list(LOG_BUFFER)[-limit:], cursor
 
 def clear_logs():
     LOG_BUFFER.clear()
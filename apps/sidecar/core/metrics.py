@@ -0,0 +1,306 @@
+import time
+import bisect
+import asyncio
+import threading
+from typing import Callable, Dict, Tuple
+
+# Seconds; spans fast API routes up to multi-minute skill runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+
+class _Shards:
+    """
+    Per-thread value dicts. Each thread only ever writes its own dict, so
+    updates need no lock (a plain dict update under the GIL); a scrape sums
+    every shard. The lock is only taken when a thread writes for the first time.
+    Shards of threads that have exited are folded into one retired shard with
+    `merge(into, shard)`, so short-lived threads do not pile up.
+    """
+    def __init__(self, merge: Callable):
+        self._merge = merge
+        self._local = threading.local()
+        self._all = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def mine(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._sweep()
+                self._all.append((threading.current_thread(), values))
+            return values
+
+    def snapshot(self) -> list:
+        with self._lock:
+            self._sweep()
+            shards = [values for _, values in self._all]
+            retired = {}
+            self._merge(retired, self._retired)
+        # Copy each shard; its owner may add keys while we iterate
+        return [retired] + [dict(shard) for shard in shards]
+
+    def _sweep(self):
+        """Fold the shards of exited threads into the retired one. Caller holds the lock."""
+        if all(thread.is_alive() for thread, _ in self._all):
+            return
+        alive = []
+        for thread, values in self._all:
+            if thread.is_alive():
+                alive.append((thread, values))
+            else:
+                # Its owner is gone, so nothing writes to it any more
+                self._merge(self._retired, values)
+        self._all = alive
+
+def _add_values(into: dict, shard: dict):
+    for key, value in list(shard.items()):
+        into[key] = into.get(key, 0) + value
+
+def _add_slots(into: dict, shard: dict):
+    for key, slots in list(shard.items()):
+        merged = into.setdefault(key, [0] * len(slots))
+        for i, value in enumerate(list(slots)):
+            merged[i] += value
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+
+    def samples(self):
+        """(suffix, label values, extra labels, value) tuples for the exposition."""
+        raise NotImplementedError
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._shards = _Shards(_add_values)
+
+    def inc(self, *label_values, amount: float = 1):
+        values = self._shards.mine()
+        values[label_values] = values.get(label_values, 0) + amount
+
+    def values(self) -> Dict[tuple, float]:
+        totals = {}
+        for shard in self._shards.snapshot():
+            _add_values(totals, shard)
+        return totals
+
+    def samples(self):
+        for key, value in sorted(self.values().items()):
+            yield "_total", key, (), value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _Shards(_add_slots)
+
+    def observe(self, value: float, *label_values):
+        values = self._shards.mine()
+        # [per-bucket counts..., +Inf count, sum]
+        slots = values.get(label_values)
+        if slots is None:
+            slots = values[label_values] = [0] * (len(self.buckets) + 2)
+        slots[bisect.bisect_left(self.buckets, value)] += 1
+        slots[-1] += value
+
+    def time(self, *label_values) -> "_Timer":
+        """Context manager observing the duration of its block."""
+        return _Timer(self, label_values)
+
+    def values(self) -> Dict[tuple, list]:
+        totals = {}
+        for shard in self._shards.snapshot():
+            _add_slots(totals, shard)
+        return totals
+
+    def samples(self):
+        for key, slots in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), slots):
+                cumulative += count
+                yield "_bucket", key, (("le", _format_bound(bound)),), cumulative
+            yield "_sum", key, (), slots[-1]
+            yield "_count", key, (), cumulative
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "started")
+
+    def __init__(self, histogram: Histogram, label_values: tuple):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.label_values)
+        return False
+
+class Callback(Metric):
+    """Gauge or counter read at scrape time from state another component already keeps."""
+    def __init__(self, name: str, help_text: str, fn: Callable, labels: Tuple[str, ...] = (), kind: str = "gauge"):
+        super().__init__(name, help_text, labels)
+        self.fn = fn
+        self.kind = kind
+
+    def samples(self):
+        value = self.fn()
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        suffix = "_total" if self.kind == "counter" else ""
+        for key, sample in sorted(items, key=lambda item: item[0]):
+            yield suffix, key if isinstance(key, tuple) else (key,), (), sample
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format."""
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not isinstance(metric, Callback):
+                # Modules may be re-imported (tests, reloads); keep accumulating
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def gauge_callback(self, name: str, help_text: str, fn: Callable, labels: Tuple[str, ...] = ()):
+        """`fn` returns a number, or {label value(s): number} for labelled series."""
+        self._register(Callback(name, help_text, fn, labels, "gauge"))
+
+    def counter_callback(self, name: str, help_text: str, fn: Callable, labels: Tuple[str, ...] = ()):
+        self._register(Callback(name, help_text, fn, labels, "counter"))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                # A broken callback must not take the whole scrape down
+                lines.append(f"# {metric.name} unavailable: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, key, extra, value in samples:
+                labels = list(zip(metric.labels, key)) + list(extra)
+                rendered = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{metric.name}{suffix}{{{rendered}}} {_format_value(value)}" if rendered
+                             else f"{metric.name}{suffix} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+def _format_value(value) -> str:
+    if value is None:
+        return "NaN"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route template. The clock
+    stops when the response starts, so long-lived streams (SSE log follows)
+    count their time to first byte rather than their whole lifetime.
+    """
+    def __init__(self, app, registry: "MetricsRegistry" = None):
+        self.app = app
+        self.latency = (registry or metrics).histogram(
+            "sidecar_http_request_duration_seconds", "HTTP request latency until the response starts",
+            ("method", "route", "status")
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        responded = False
+
+        async def send_wrapper(message):
+            nonlocal responded
+            if message["type"] == "http.response.start":
+                responded = True
+                self._observe(scope, message["status"], started)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not responded:
+                self._observe(scope, 500, started)
+            raise
+
+    def _observe(self, scope, status: int, started: float):
+        route = scope.get("route")
+        # Unmatched paths share one series so random URLs cannot blow up cardinality
+        path = getattr(route, "path", None) or "unmatched"
+        self.latency.observe(time.perf_counter() - started, scope["method"], path, str(status))
+
+class LoopLagMonitor:
+    """
+    Measures event-loop responsiveness: a task sleeps `interval` seconds and
+    records how much later than that it actually woke up. Anything blocking
+    the loop (sync file reads, Docker calls) shows up as lag.
+    """
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+    def __init__(self, registry: MetricsRegistry, interval: float = 0.05):
+        self.interval = interval
+        self.max_lag = 0.0
+        self.lag = registry.histogram(
+            "sidecar_event_loop_lag_seconds", "Delay of event-loop wakeups past their schedule", buckets=self.BUCKETS
+        )
+        registry.gauge_callback("sidecar_event_loop_lag_max_seconds", "Largest event-loop lag seen", lambda: self.max_lag)
+        self._task = None
+
+    def start(self):
+        """Call from the running event loop (e.g. a startup hook)."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            # May be called from another loop's thread when several servers share the process
+            self._task.get_loop().call_soon_threadsafe(self._task.cancel)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.lag.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+
+# Singleton instance
+metrics = MetricsRegistry()
+loop_monitor = LoopLagMonitor(metrics)
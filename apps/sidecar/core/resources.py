@@ -0,0 +1,132 @@
+import os
+import math
+from typing import Optional
+
+_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+
+def parse_memory(value) -> Optional[int]:
+    """Docker-style memory sizes: 536870912, "512m", "1.5g" -> bytes."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        size = value
+    else:
+        text = str(value).strip().lower()
+        if text.endswith("b"):
+            text = text[:-1]
+        unit = text[-1] if text and text[-1] in "kmgt" else ""
+        size = float(text[:-1] if unit else text) * _UNITS[unit]
+    if size <= 0:
+        raise ValueError(f"memory must be positive: {value}")
+    return int(size)
+
+class ResourceSpec:
+    """
+    Resource requirements of a skill, from the `resources` block of its manifest:
+    cpus (cores), memory (bytes or "512m"), pids, timeout (seconds) and
+    max_concurrency (running tasks of this skill). Unset fields are None and
+    are filled from the sidecar defaults with `with_defaults`.
+    """
+    FIELDS = ("cpus", "memory", "pids", "timeout", "max_concurrency")
+
+    def __init__(self, cpus: float = None, memory: int = None, pids: int = None,
+                 timeout: float = None, max_concurrency: int = None):
+        self.cpus = float(cpus) if cpus is not None else None
+        self.memory = parse_memory(memory)
+        self.pids = int(pids) if pids is not None else None
+        self.timeout = float(timeout) if timeout is not None else None
+        self.max_concurrency = int(max_concurrency) if max_concurrency is not None else None
+        for name in ("cpus", "pids", "timeout", "max_concurrency"):
+            value = getattr(self, name)
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} must be positive: {value}")
+
+    @classmethod
+    def from_manifest(cls, manifest: dict) -> "ResourceSpec":
+        """Raises ValueError for malformed values."""
+        resources = manifest.get("resources")
+        if resources is None:
+            resources = {}
+        if not isinstance(resources, dict):
+            raise ValueError("resources must be an object")
+        try:
+            return cls(**{k: resources.get(k) for k in cls.FIELDS})
+        except TypeError as e:
+            raise ValueError(str(e))
+
+    def with_defaults(self, defaults: "ResourceSpec") -> "ResourceSpec":
+        spec = ResourceSpec()
+        for name in self.FIELDS:
+            value = getattr(self, name)
+            setattr(spec, name, value if value is not None else getattr(defaults, name))
+        return spec
+
+    def docker_kwargs(self) -> dict:
+        """Limits for containers.run()."""
+        kwargs = {}
+        if self.cpus:
+            kwargs["nano_cpus"] = int(self.cpus * 1e9)
+        if self.memory:
+            # No swap on top of the memory limit
+            kwargs["mem_limit"] = self.memory
+            kwargs["memswap_limit"] = self.memory
+        if self.pids:
+            kwargs["pids_limit"] = self.pids
+        return kwargs
+
+    def docker_update_kwargs(self) -> dict:
+        """The subset of limits that can be changed on a running (pooled) container."""
+        kwargs = {}
+        if self.cpus:
+            kwargs["cpu_period"] = 100000
+            kwargs["cpu_quota"] = int(self.cpus * 100000)
+        if self.memory:
+            kwargs["mem_limit"] = self.memory
+            kwargs["memswap_limit"] = self.memory
+        return kwargs
+
+    def rlimits(self) -> dict:
+        """
+        Closest process-level equivalents for local runs: the data segment for
+        memory and CPU seconds (cpus x timeout) as a backstop for runaway loops.
+        """
+        limits = {}
+        if self.memory:
+            limits["data"] = self.memory
+        if self.timeout:
+            limits["cpu"] = math.ceil(self.timeout * (self.cpus or 1))
+        return limits
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+def default_spec(config) -> ResourceSpec:
+    """Sidecar-wide defaults for skills that do not declare a field (SKILL_DEFAULT_TIMEOUT=0 disables the timeout)."""
+    timeout = float(config.get("SKILL_DEFAULT_TIMEOUT", 1800))
+    return ResourceSpec(
+        # Most skills wait on the network and LLM APIs rather than burn CPU
+        cpus=config.get("SKILL_DEFAULT_CPUS", 0.5),
+        memory=config.get("SKILL_DEFAULT_MEMORY", "512m"),
+        pids=config.get("SKILL_DEFAULT_PIDS", 256),
+        timeout=timeout if timeout > 0 else None,
+    )
+
+def host_capacity(config) -> dict:
+    """
+    CPU cores and memory the scheduler may hand out. HOST_CPUS / HOST_MEMORY
+    override the detected values; HOST_CPU_OVERCOMMIT scales detected cores.
+    """
+    cpus = config.get("HOST_CPUS")
+    if cpus is None:
+        cpus = (os.cpu_count() or 1) * float(config.get("HOST_CPU_OVERCOMMIT", 2))
+    memory = config.get("HOST_MEMORY")
+    if memory is None:
+        try:
+            # Leave a quarter of physical memory to the host and the sidecar itself
+            memory = int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * 0.75)
+        except (ValueError, OSError, AttributeError):
+            memory = 4 * 1024 ** 3
+    return {
+        "cpus": float(cpus),
+        "memory": parse_memory(memory),
+    }
@@ -0,0 +1,26 @@
+import hmac
+import time
+import hashlib
+from typing import Optional
+
+# Shared by the sidecar (signing callbacks) and their receivers (verifying them)
+SIGNATURE_HEADER = "X-Contex-Signature"
+TIMESTAMP_HEADER = "X-Contex-Timestamp"
+DELIVERY_HEADER = "X-Contex-Delivery"
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    """HMAC-SHA256 over "<timestamp>.<body>", so a captured request cannot be replayed later."""
+    digest = hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+def verify(secret: str, timestamp: Optional[str], signature: Optional[str], body: bytes,
+           tolerance: float = 300.0) -> bool:
+    """Check a callback's signature and that it was signed less than `tolerance` seconds ago."""
+    if not timestamp or not signature:
+        return False
+    try:
+        if abs(time.time() - float(timestamp)) > tolerance:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), signature)
@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional
+from apps.sidecar.core.logger import get_logger
+from apps.sidecar.core.resources import ResourceSpec
+
+logger = get_logger("sidecar.skills")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+SKILLS_DIR = Path(os.getenv("SKILLS_DIR", PROJECT_ROOT / "packages" / "skills"))
+
+_TYPES = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "array": (list,),
+    "object": (dict,),
+}
+
+def _check_type(expected: str, value) -> bool:
+    types = _TYPES.get(expected)
+    if types is None:
+        return True
+    # bool is an int subclass, but true is not a valid integer setting
+    if isinstance(value, bool) and expected != "boolean":
+        return False
+    return isinstance(value, types)
+
+def _compile_field(name: str, spec: dict) -> Callable:
+    expected = spec.get("type")
+    enum = spec.get("enum")
+    minimum = spec.get("minimum")
+    maximum = spec.get("maximum")
+    item_type = (spec.get("items") or {}).get("type")
+
+    def check(value) -> List[str]:
+        if not _check_type(expected, value):
+            return [f"{name}: expected {expected}"]
+        errors = []
+        if enum is not None and value not in enum:
+            errors.append(f"{name}: must be one of {enum}")
+        if minimum is not None and isinstance(value, (int, float)) and value < minimum:
+            errors.append(f"{name}: must be >= {minimum}")
+        if maximum is not None and isinstance(value, (int, float)) and value > maximum:
+            errors.append(f"{name}: must be <= {maximum}")
+        if item_type and isinstance(value, list):
+            if any(not _check_type(item_type, item) for item in value):
+                errors.append(f"{name}: items must be {item_type}")
+        return errors
+
+    return check
+
+def compile_schema(config_schema: dict) -> Callable:
+    """
+    Turn a manifest `config_schema` (field -> {type, enum, minimum, maximum,
+    items}) into a function returning the list of errors for a config.
+    Unknown fields are accepted so older configs keep loading.
+    """
+    checks = [(name, _compile_field(name, spec)) for name, spec in (config_schema or {}).items() if isinstance(spec, dict)]
+
+    def validate(config: dict) -> List[str]:
+        if not isinstance(config, dict):
+            return ["config must be an object"]
+        errors = []
+        for name, check in checks:
+            if name in config:
+                errors.extend(check(config[name]))
+        return errors
+
+    return validate
+
+class Skill:
+    """One indexed skill directory."""
+    def __init__(self, skill_id: str, path: Path, manifest: dict, runnable: bool, signature: tuple):
+        self.id = skill_id
+        self.path = path
+        self.manifest = manifest
+        self.runnable = runnable
+        self.signature = signature
+        self.validate = compile_schema(manifest.get("config_schema"))
+        try:
+            self.resources = ResourceSpec.from_manifest(manifest)
+        except ValueError as e:
+            logger.error(f"Invalid resources in manifest of {skill_id}, using defaults: {e}")
+            self.resources = ResourceSpec()
+
+class SkillRegistry:
+    """
+    Index of packages/skills/<id>/manifest.json. Manifests are parsed once and
+    re-parsed only when their mtime/size changes; the serialized `/skills`
+    payload and its ETag are rebuilt only when something changed. A poller
+    thread keeps it current; without it, reads refresh at most every
+    `poll_interval` seconds.
+    """
+    def __init__(self, skills_dir: Path = SKILLS_DIR, poll_interval: float = 2.0):
+        self.skills_dir = Path(skills_dir)
+        self.poll_interval = poll_interval
+        self._skills = {}
+        self._failed = {}
+        self._payload = b"[]"
+        self._etag = '"0"'
+        self._lock = threading.Lock()
+        self._refreshed_at = 0.0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    # --- Reads ---
+
+    def get(self, skill_id: str) -> Optional[Skill]:
+        self._ensure_fresh()
+        return self._skills.get(skill_id)
+
+    def list(self) -> List[Skill]:
+        self._ensure_fresh()
+        return list(self._skills.values())
+
+    def payload(self):
+        """(ETag, JSON body) of the manifest list served by GET /skills."""
+        self._ensure_fresh()
+        return self._etag, self._payload
+
+    # --- Indexing ---
+
+    def start(self):
+        self.refresh()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="skill-registry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def refresh(self) -> bool:
+        """Rescan the skills directory; returns True if the index changed."""
+        with self._lock:
+            skills = {}
+            try:
+                entries = sorted(os.scandir(self.skills_dir), key=lambda e: e.name)
+            except FileNotFoundError:
+                entries = []
+            for entry in entries:
+                if not entry.is_dir() or entry.name.startswith((".", "_")):
+                    continue
+                skill = self._index(Path(entry.path), self._skills.get(entry.name))
+                if skill:
+                    skills[entry.name] = skill
+
+            self._refreshed_at = time.monotonic()
+            changed = skills.keys() != self._skills.keys() or any(
+                skills[k] is not self._skills.get(k) for k in skills
+            )
+            if changed:
+                self._skills = skills
+                self._payload = json.dumps([s.manifest for s in skills.values()], ensure_ascii=False).encode()
+                self._etag = f'"{hashlib.sha1(self._payload).hexdigest()}"'
+                logger.info(f"Skill registry indexed {len(skills)} skills")
+            return changed
+
+    def _index(self, path: Path, previous: Optional[Skill]) -> Optional[Skill]:
+        signature = (_stat(path / "manifest.json"), _stat(path / "main.py"))
+        if previous and previous.signature == signature:
+            return previous
+        # Unchanged broken manifests are not re-parsed (or re-logged) on every poll
+        if signature[0] is None or self._failed.get(path.name) == signature:
+            return None
+        try:
+            manifest = json.loads((path / "manifest.json").read_text())
+        except Exception as e:
+            logger.error(f"Failed to load manifest {path / 'manifest.json'}: {e}")
+            self._failed[path.name] = signature
+            return None
+        self._failed.pop(path.name, None)
+        return Skill(path.name, path, manifest, signature[1] is not None, signature)
+
+    def _ensure_fresh(self):
+        if self._thread is None and time.monotonic() - self._refreshed_at > self.poll_interval:
+            self.refresh()
+
+    def _run(self):
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Skill registry refresh failed: {e}")
+
+def _stat(path: Path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+# Singleton instance
+skill_registry = SkillRegistry(poll_interval=float(os.getenv("SKILL_REFRESH_INTERVAL", "2.0")))
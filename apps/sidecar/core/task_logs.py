@@ -0,0 +1,230 @@
+import os
+import gzip
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+from apps.sidecar.core.logger import get_logger
+
+logger = get_logger("sidecar.task_logs")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+TASK_LOG_DIR = Path(os.getenv("TASK_LOG_DIR", PROJECT_ROOT / "data" / "task_logs"))
+
+class TaskLog:
+    """Output of one task: numbered lines, a ring buffer of the newest ones and live followers."""
+    def __init__(self, task_id: str, path: Path, buffer_lines: int):
+        self.task_id = task_id
+        self.path = path
+        self.lines = 0
+        self.closed = False
+        self.recent = deque(maxlen=buffer_lines)
+        self.pending = []
+        # Flushed segments the writer has not appended to the file yet
+        self.writing = []
+        self.listeners = []
+
+class TaskLogStore:
+    """
+    Per-task container output. Lines are numbered from 1 and kept in a ring
+    buffer for cheap tails and follows; every `segment_lines` lines (and when the
+    task ends) the pending lines are appended to `<task_id>.jsonl.gz` as one
+    gzip member, so older output stays readable after the buffer rolls over.
+    Compression and file writes run on a single writer thread, in order, so the
+    log pumps calling append() never wait on the disk. Files older than
+    `retention_days` are deleted.
+    """
+    MAX_CLOSED_LOGS = 256
+    PRUNE_EVERY = 100
+
+    def __init__(self, log_dir: Path = TASK_LOG_DIR, buffer_lines: int = 1000, segment_lines: int = 200,
+                 retention_days: float = 7):
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.buffer_lines = buffer_lines
+        # Pending lines must still be in the ring buffer when a range read needs them
+        self.segment_lines = min(segment_lines, buffer_lines)
+        self.retention_days = retention_days
+        self._logs = OrderedDict()
+        self._lock = threading.Lock()
+        self._closed_count = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-log-writer")
+        self._writer.submit(self.prune)
+
+    def path(self, task_id: str) -> Path:
+        return self.log_dir / f"{task_id}.jsonl.gz"
+
+    def append(self, task_id: str, stream: str, line: str):
+        """Record one output line of a running task and fan it out to followers."""
+        with self._lock:
+            log = self._open(task_id)
+            log.lines += 1
+            entry = {
+                "n": log.lines,
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "stream": stream,
+                "line": line,
+            }
+            log.recent.append(entry)
+            log.pending.append(entry)
+            # Output after close (a cancelled run still stopping) is persisted as it comes
+            if len(log.pending) >= self.segment_lines or log.closed:
+                self._flush(log)
+            listeners = list(log.listeners)
+        self._notify(log, listeners, entry)
+
+    def close(self, task_id: str):
+        """The task ended: persist what is left and release followers."""
+        with self._lock:
+            # A task without output still gets a closed entry, so a late subscribe() sees that it ended
+            log = self._open(task_id)
+            if log.closed:
+                return
+            self._flush(log)
+            log.closed = True
+            listeners, log.listeners = log.listeners, []
+            closed = [k for k, l in self._logs.items() if l.closed and not l.writing]
+            for k in closed[:max(0, len(closed) - self.MAX_CLOSED_LOGS)]:
+                del self._logs[k]
+            self._closed_count += 1
+            if self._closed_count % self.PRUNE_EVERY == 0:
+                self._writer.submit(self.prune)
+        self._notify(log, listeners, None)
+
+    def tail(self, task_id: str, limit: int = 200) -> list:
+        """The last `limit` lines of a task."""
+        if limit <= 0:
+            return []
+        with self._lock:
+            log = self._logs.get(task_id)
+            if log and (len(log.recent) >= limit or len(log.recent) == log.lines):
+                return list(log.recent)[-limit:]
+        return self.range(task_id, 1)[-limit:]
+
+    def range(self, task_id: str, start: int = 1, end: int = None) -> list:
+        """Lines numbered `start` through `end` (inclusive)."""
+        with self._lock:
+            log = self._logs.get(task_id)
+            if log and log.recent and log.recent[0]["n"] <= start:
+                return [e for e in log.recent if e["n"] >= start and (end is None or e["n"] <= end)]
+            pending = (log.writing + log.pending) if log else []
+        # A segment written after the snapshot can show up both on disk and in `pending`
+        entries = {e["n"]: e for e in self._read_disk(task_id) + pending}
+        return [e for n, e in sorted(entries.items()) if n >= start and (end is None or n <= end)]
+
+    def subscribe(self, task_id: str, listener: Callable, active: bool = False) -> bool:
+        """
+        `listener` receives new entries and None once the task ends. Returns
+        False when nothing more will be written. Pass `active` for a task that is
+        queued or running, so it can be followed before its first line.
+        """
+        with self._lock:
+            log = self._logs.get(task_id)
+            if log is None and active:
+                log = self._open(task_id)
+            if not log or log.closed:
+                return False
+            log.listeners.append(listener)
+            return True
+
+    def unsubscribe(self, task_id: str, listener: Callable):
+        with self._lock:
+            log = self._logs.get(task_id)
+            if log and listener in log.listeners:
+                log.listeners.remove(listener)
+
+    def is_open(self, task_id: str) -> bool:
+        with self._lock:
+            log = self._logs.get(task_id)
+            return bool(log and not log.closed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open": sum(1 for l in self._logs.values() if not l.closed),
+                "cached": len(self._logs),
+                "followers": sum(len(l.listeners) for l in self._logs.values()),
+            }
+
+    def _open(self, task_id: str) -> TaskLog:
+        """Caller holds the lock."""
+        log = self._logs.get(task_id)
+        if log is None:
+            log = TaskLog(task_id, self.path(task_id), self.buffer_lines)
+            self._logs[task_id] = log
+        return log
+
+    def flush(self):
+        """Block until every segment handed to the writer so far is on disk."""
+        self._writer.submit(lambda: None).result()
+
+    def prune(self) -> int:
+        """Delete task logs not written to for `retention_days`; returns how many."""
+        cutoff = time.time() - self.retention_days * 86400
+        removed = 0
+        for path in self.log_dir.glob("*.jsonl.gz"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                # Written or removed meanwhile
+                continue
+        if removed:
+            logger.info(f"Task log retention removed {removed} files")
+        return removed
+
+    def _flush(self, log: TaskLog):
+        """Hand pending lines to the writer as one segment. Caller holds the lock."""
+        if not log.pending:
+            return
+        segment, log.pending = log.pending, []
+        log.writing.extend(segment)
+        self._writer.submit(self._write, log, segment)
+
+    def _write(self, log: TaskLog, segment: list):
+        """Writer thread: append a segment as one gzip member."""
+        data = "".join(json.dumps(e) + "\n" for e in segment).encode()
+        try:
+            with open(log.path, "ab") as f:
+                f.write(gzip.compress(data))
+        except OSError as e:
+            logger.error(f"Failed to persist logs of task {log.task_id}: {e}")
+        with self._lock:
+            # Written, or given up on after the error above
+            log.writing = log.writing[len(segment):]
+
+    def _read_disk(self, task_id: str) -> list:
+        path = self.path(task_id)
+        if not path.exists():
+            return []
+        entries = []
+        try:
+            with gzip.open(path, "rt") as f:
+                for line in f:
+                    if line.strip():
+                        entries.append(json.loads(line))
+        except EOFError:
+            # The writer is appending a member; its lines are still in `writing`
+            pass
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Task log {path.name} is unreadable: {e}")
+        return entries
+
+    def _notify(self, log: TaskLog, listeners: list, entry: Optional[dict]):
+        for listener in listeners:
+            try:
+                listener(entry)
+            except Exception:
+                # A follower whose event loop went away must not break the pump
+                self.unsubscribe(log.task_id, listener)
+
+# Singleton instance
+task_logs = TaskLogStore(
+    buffer_lines=int(os.getenv("TASK_LOG_BUFFER_LINES", "1000")),
+    retention_days=float(os.getenv("TASK_LOG_RETENTION_DAYS", "7"))
+)
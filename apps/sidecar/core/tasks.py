@@ -0,0 +1,619 @@
+import os
+import time
+import json
+import uuid
+import heapq
+import hashlib
+import sqlite3
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Optional
+from apps.sidecar.core.callbacks import callbacks
+from apps.sidecar.core.config import config_manager
+from apps.sidecar.core.docker_client import docker_client, async_docker_client
+from apps.sidecar.core.logger import get_logger
+from apps.sidecar.core.metrics import metrics
+from apps.sidecar.core.resources import ResourceSpec, default_spec, host_capacity
+from apps.sidecar.core.skills import skill_registry
+from apps.sidecar.core.task_logs import task_logs
+
+logger = get_logger("sidecar.tasks")
+
+task_start_seconds = metrics.histogram(
+    "sidecar_task_start_seconds", "Time from submit until the task's container is running", ("skill",)
+)
+task_duration_seconds = metrics.histogram(
+    "sidecar_task_duration_seconds", "Run time of finished tasks", ("skill", "status")
+)
+tasks_finished = metrics.counter("sidecar_tasks_finished", "Tasks that ended, by exit status", ("skill", "status"))
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+DB_PATH = Path(os.getenv("SIDECAR_DB_PATH", PROJECT_ROOT / "data" / "sidecar.db"))
+
+class TaskStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    INTERRUPTED = "interrupted"
+    CANCELLED = "cancelled"
+
+    ACTIVE = (QUEUED, RUNNING)
+
+class TaskQueueFull(Exception):
+    """Raised when the admission queue is at capacity."""
+
+class TaskTooLarge(Exception):
+    """Raised when a task requests more resources than the host can ever provide."""
+
+TASK_COLUMNS = (
+    "id", "skill", "status", "created_at", "started_at", "finished_at",
+    "duration", "exit_code", "container_id", "result", "error"
+)
+
+class TaskStore:
+    """SQLite persistence for task records so history survives sidecar restarts."""
+    def __init__(self, db_path: Path = DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _get_conn(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self):
+        with self._get_conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id TEXT PRIMARY KEY,
+                    skill TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    duration REAL,
+                    exit_code INTEGER,
+                    container_id TEXT,
+                    result TEXT,
+                    error TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks (created_at)")
+
+    def insert(self, task: dict):
+        with self._lock, self._get_conn() as conn:
+            conn.execute(
+                f"INSERT INTO tasks ({', '.join(TASK_COLUMNS)}) VALUES ({', '.join('?' for _ in TASK_COLUMNS)})",
+                tuple(task.get(c) for c in TASK_COLUMNS)
+            )
+
+    def update(self, task_id: str, if_status: str = None, **fields) -> int:
+        """
+        Set `fields` on a task, only while its status is `if_status` when given.
+        Returns the number of rows changed (0 for an unknown id or another status).
+        """
+        if not fields:
+            return 0
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        condition, params = ("id = ?", (task_id,)) if if_status is None else ("id = ? AND status = ?", (task_id, if_status))
+        with self._lock, self._get_conn() as conn:
+            return conn.execute(f"UPDATE tasks SET {assignments} WHERE {condition}", (*fields.values(), *params)).rowcount
+
+    def get(self, task_id: str) -> Optional[dict]:
+        with self._get_conn() as conn:
+            row = conn.execute(f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return dict(zip(TASK_COLUMNS, row)) if row else None
+
+    def list(self, status: str = None, skill: str = None, limit: int = 50, offset: int = 0) -> list:
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if skill:
+            clauses.append("skill = ?")
+            params.append(skill)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._get_conn() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset)
+            ).fetchall()
+        return [dict(zip(TASK_COLUMNS, row)) for row in rows]
+
+    def mark_interrupted(self) -> int:
+        """Tasks left active by a previous sidecar process can no longer be tracked."""
+        with self._lock, self._get_conn() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = ?, error = ?, finished_at = ? WHERE status IN (?, ?)",
+                (TaskStatus.INTERRUPTED, "sidecar restarted", time.time(), *TaskStatus.ACTIVE)
+            )
+            return cursor.rowcount
+
+class TaskManager:
+    """
+    Task registry with admission control.
+    Tasks wait in a FIFO queue until the global and per-skill concurrency
+    limits allow them to start and, when `resources` resolves a skill to a
+    ResourceSpec, until its cpus/memory fit into the remaining `capacity`.
+    Launches are handed to `dispatch` (inline by default) so callers never
+    block on container creation. Running tasks are stopped through
+    `canceller(task_id, run_id)`, handed to `stop_dispatch` (defaults to
+    `dispatch`), when cancelled or past their spec's timeout.
+    `on_end(task)` receives the final record of every task that ends.
+
+    With `coalesce`, a submit identical to an active task (same skill and
+    injected env) joins that task instead of starting another, and a task
+    that succeeded less than `result_ttl` seconds ago is returned as is.
+    """
+    def __init__(self, store: TaskStore, launcher: Callable, max_concurrent: int = 4,
+                 max_per_skill: int = 2, max_queue: int = 100, dispatch: Callable = None,
+                 resources: Callable = None, capacity: dict = None, canceller: Callable = None,
+                 coalesce: bool = False, result_ttl: float = 0, on_end: Callable = None,
+                 stop_dispatch: Callable = None):
+        self.store = store
+        self.launcher = launcher
+        self.canceller = canceller
+        self.on_end = on_end
+        self.dispatch = dispatch or (lambda fn, *args: fn(*args))
+        self.stop_dispatch = stop_dispatch or self.dispatch
+        self.resources = resources
+        self.max_concurrent = max_concurrent
+        self.max_per_skill = max_per_skill
+        self.max_queue = max_queue
+        self.capacity = capacity
+        self.coalesce = coalesce
+        self.result_ttl = result_ttl
+
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._running = {}
+        self._running_per_skill = {}
+        self._reserved = {"cpus": 0.0, "memory": 0}
+        self._run_ids = {}
+        self._cancelling = {}
+        self._deadlines = []
+        self._deadline_changed = threading.Condition(self._lock)
+        self._watchdog = None
+        self._active_keys = {}
+        self._task_keys = {}
+        self._fresh_results = {}
+        self._shared = {"coalesced": 0, "reused": 0}
+        self._submitted_at = {}
+        self._launches = {}
+        self._inserting = {}
+
+        interrupted = self.store.mark_interrupted()
+        if interrupted:
+            logger.warning(f"Marked {interrupted} tasks from a previous run as interrupted")
+
+    def submit(self, skill: str, env: dict, force: bool = False) -> dict:
+        """
+        Register a task and start it as soon as the concurrency limits and capacity allow.
+        An identical request may be answered with an existing task instead, flagged
+        `coalesced` (still active) or `reused` (fresh result); `force` always starts a new one.
+        """
+        key = coalesce_key(skill, env) if self.coalesce else None
+        spec = self.resources(skill) if self.resources else None
+        while True:
+            with self._lock:
+                # Lookup and reservation under one lock hold, so identical concurrent submits start one task
+                shared = self._find_shared(key) if key and not force else None
+                if shared:
+                    task_id, kind = shared
+                    inserting = self._inserting.get(task_id)
+                else:
+                    task = self._reserve(skill, spec, key)
+            if not shared:
+                break
+            if inserting:
+                # Joined a task whose row is still being written
+                inserting.wait()
+            task = self.get(task_id)
+            if task is None:
+                # Its insert failed and was rolled back; look again
+                continue
+            with self._lock:
+                self._shared[kind] += 1
+            task[kind] = True
+            logger.info(f"Request for {skill} {kind} with task {task_id}")
+            return task
+
+        # The SQLite commit happens outside the lock, which the event loop takes for stats and launches
+        try:
+            self.store.insert(task)
+        except Exception:
+            with self._lock:
+                self._inserting.pop(task["id"]).set()
+                self._forget_key(task["id"], succeeded=False)
+            raise
+        with self._lock:
+            self._queue.append((task["id"], skill, env, spec))
+            self._submitted_at[task["id"]] = task["created_at"]
+            self._inserting.pop(task["id"]).set()
+
+        logger.info(f"Task {task['id']} queued for skill {skill}")
+        self._drain()
+        return self.get(task["id"])
+
+    def _reserve(self, skill: str, spec: Optional[ResourceSpec], key: Optional[str]) -> dict:
+        """Claim a queue slot and the coalescing key for a new task before its row is written. Caller holds the lock."""
+        if spec and not self._fits(spec, self.capacity, {"cpus": 0.0, "memory": 0}):
+            raise TaskTooLarge(f"{skill} requests {spec.to_dict()}, host capacity is {self.capacity}")
+        if len(self._queue) + len(self._inserting) >= self.max_queue:
+            raise TaskQueueFull(f"Task queue is full ({self.max_queue} queued)")
+        task = {
+            "id": uuid.uuid4().hex,
+            "skill": skill,
+            "status": TaskStatus.QUEUED,
+            "created_at": time.time(),
+        }
+        self._inserting[task["id"]] = threading.Event()
+        if key:
+            self._active_keys[key] = task["id"]
+            self._task_keys[task["id"]] = key
+        return task
+
+    def cancel(self, task_id: str, reason: str = "cancelled by user") -> Optional[dict]:
+        """
+        Cancel a queued or running task. A running task's slot is released
+        right away and its process/container is stopped in the background.
+        Returns None if the task is not active.
+        """
+        with self._lock:
+            queued = next((entry for entry in self._queue if entry[0] == task_id), None)
+            if queued:
+                self._queue.remove(queued)
+                self._submitted_at.pop(task_id, None)
+                skill, started_at, run_id = queued[1], None, None
+            elif task_id in self._running:
+                skill = self._running[task_id][0]
+                started_at = self._release(task_id)
+                self._cancelling[task_id] = reason
+                run_id = self._run_ids.get(task_id)
+            else:
+                return None
+            self._forget_key(task_id, succeeded=False)
+
+        now = time.time()
+        self.store.update(
+            task_id,
+            status=TaskStatus.CANCELLED,
+            finished_at=now,
+            duration=(now - started_at) if started_at else None,
+            error=reason
+        )
+        self._observe_end(skill, TaskStatus.CANCELLED, started_at, now)
+        logger.warning(f"Task {task_id} cancelled: {reason}")
+        self._ended(task_id)
+        # Without a run id the launch is still in flight; _launch stops it once it has one
+        if run_id and self.canceller:
+            self.stop_dispatch(self.canceller, task_id, run_id)
+        self._drain()
+        return self.get(task_id)
+
+    def finish(self, task_id: str, exit_code: Optional[int], error: str = None):
+        """Record the exit of a task and admit the next queued ones."""
+        with self._lock:
+            entry = self._running.get(task_id)
+            started_at = self._release(task_id)
+            self._run_ids.pop(task_id, None)
+            self._submitted_at.pop(task_id, None)
+            cancelled = self._cancelling.pop(task_id, None)
+            if cancelled is None:
+                self._forget_key(task_id, succeeded=exit_code == 0)
+
+        if cancelled is not None:
+            # Reason and timing were recorded when the task was cancelled; the status is
+            # written again in case a racing admission overwrote it
+            self.store.update(task_id, status=TaskStatus.CANCELLED, exit_code=exit_code)
+            logger.info(f"Cancelled task {task_id} exited (exit code {exit_code})")
+            return
+
+        now = time.time()
+        status = TaskStatus.SUCCEEDED if exit_code == 0 else TaskStatus.FAILED
+        if error is None and exit_code != 0:
+            error = f"exit code {exit_code}"
+        self.store.update(
+            task_id,
+            status=status,
+            exit_code=exit_code,
+            finished_at=now,
+            duration=(now - started_at) if started_at else None,
+            error=error
+        )
+        if entry:
+            self._observe_end(entry[0], status, started_at, now)
+        logger.info(f"Task {task_id} {status} (exit code {exit_code})")
+        self._ended(task_id)
+        self._drain()
+
+    def record_result(self, task_id: str, result: str) -> bool:
+        """Store the final result reported by the skill (e.g. via /notify)."""
+        # One UPDATE: no read under the store lock, and no window for the task to vanish in between
+        return self.store.update(task_id, result=result) > 0
+
+    def get(self, task_id: str) -> Optional[dict]:
+        task = self.store.get(task_id)
+        if task and task["status"] == TaskStatus.QUEUED:
+            with self._lock:
+                for position, entry in enumerate(self._queue):
+                    if entry[0] == task_id:
+                        task["queue_position"] = position
+                        break
+        return task
+
+    def list(self, **filters) -> list:
+        return self.store.list(**filters)
+
+    def reservation(self, task_id: str) -> Optional[ResourceSpec]:
+        """Resources reserved for a running task (the limits to apply to its container)."""
+        with self._lock:
+            entry = self._running.get(task_id)
+            return entry[2] if entry else None
+
+    def configure(self, max_concurrent: int = None, max_per_skill: int = None, max_queue: int = None,
+                  capacity: dict = None, result_ttl: float = None):
+        """Change the admission limits at runtime; raised limits admit queued tasks right away."""
+        with self._lock:
+            if result_ttl is not None:
+                self.result_ttl = result_ttl
+            if capacity is not None:
+                self.capacity = capacity
+            if max_concurrent is not None:
+                self.max_concurrent = max_concurrent
+            if max_per_skill is not None:
+                self.max_per_skill = max_per_skill
+            if max_queue is not None:
+                self.max_queue = max_queue
+        self._drain()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": len(self._queue),
+                "running": len(self._running),
+                "running_per_skill": dict(self._running_per_skill),
+                "max_concurrent": self.max_concurrent,
+                "max_per_skill": self.max_per_skill,
+                "max_queue": self.max_queue,
+                "resources": {
+                    "capacity": self.capacity,
+                    "reserved": dict(self._reserved),
+                },
+                "result_ttl": self.result_ttl,
+                **self._shared,
+            }
+
+    def _release(self, task_id: str) -> Optional[float]:
+        """Free the slot held by a running task. Caller holds the lock."""
+        entry = self._running.pop(task_id, None)
+        if not entry:
+            return None
+        skill, started_at, spec = entry
+        self._running_per_skill[skill] -= 1
+        if not self._running_per_skill[skill]:
+            del self._running_per_skill[skill]
+        if spec:
+            self._reserved["cpus"] -= spec.cpus or 0
+            self._reserved["memory"] -= spec.memory or 0
+        return started_at
+
+    def _ended(self, task_id: str):
+        if not self.on_end:
+            return
+        try:
+            self.on_end(self.store.get(task_id))
+        except Exception as e:
+            logger.error(f"End hook failed for task {task_id}: {e}")
+
+    @staticmethod
+    def _observe_end(skill: str, status: str, started_at: Optional[float], now: float):
+        tasks_finished.inc(skill, status)
+        if started_at:
+            task_duration_seconds.observe(now - started_at, skill, status)
+
+    def _find_shared(self, key: str) -> Optional[tuple]:
+        """(task_id, "coalesced" | "reused") of the active, or fresh successful, task for the same request. Caller holds the lock."""
+        task_id = self._active_keys.get(key)
+        if task_id:
+            return task_id, "coalesced"
+        fresh = self._fresh_results.get(key)
+        if fresh and time.time() - fresh[1] <= self.result_ttl:
+            return fresh[0], "reused"
+        return None
+
+    def _forget_key(self, task_id: str, succeeded: bool):
+        """An ended task stops absorbing requests; a success stays reusable for result_ttl. Caller holds the lock."""
+        key = self._task_keys.pop(task_id, None)
+        if not key:
+            return
+        if self._active_keys.get(key) == task_id:
+            del self._active_keys[key]
+        now = time.time()
+        if succeeded and self.result_ttl > 0:
+            self._fresh_results[key] = (task_id, now)
+        for stale in [k for k, (_, at) in self._fresh_results.items() if now - at > self.result_ttl]:
+            del self._fresh_results[stale]
+
+    @staticmethod
+    def _fits(spec: Optional[ResourceSpec], capacity: Optional[dict], reserved: dict) -> bool:
+        if not spec or not capacity:
+            return True
+        # Small epsilon so fractional cpus (e.g. 4 x 0.5) add up to an exact fit
+        return (reserved["cpus"] + (spec.cpus or 0) <= capacity["cpus"] + 1e-9
+                and reserved["memory"] + (spec.memory or 0) <= capacity["memory"])
+
+    def _drain(self):
+        """Start queued tasks in FIFO order while slots and capacity are available."""
+        admitted = []
+        with self._lock:
+            for entry in list(self._queue):
+                if len(self._running) >= self.max_concurrent:
+                    break
+                task_id, skill, env, spec = entry
+                per_skill = spec.max_concurrency if spec and spec.max_concurrency else self.max_per_skill
+                if self._running_per_skill.get(skill, 0) >= per_skill:
+                    continue
+                if not self._fits(spec, self.capacity, self._reserved):
+                    # No backfilling past a task waiting for capacity, so large tasks cannot starve
+                    break
+                self._queue.remove(entry)
+                self._running[task_id] = (skill, time.time(), spec)
+                self._running_per_skill[skill] = self._running_per_skill.get(skill, 0) + 1
+                if spec:
+                    self._reserved["cpus"] += spec.cpus or 0
+                    self._reserved["memory"] += spec.memory or 0
+                    if spec.timeout:
+                        heapq.heappush(self._deadlines, (time.time() + spec.timeout, task_id, spec.timeout))
+                        self._start_watchdog()
+                admitted.append(entry)
+
+        for task_id, skill, env, _ in admitted:
+            if not self.store.update(task_id, if_status=TaskStatus.QUEUED, status=TaskStatus.RUNNING, started_at=time.time()):
+                # Cancelled since the lock was released: keep CANCELLED and never start it
+                self.finish(task_id, None)
+                continue
+            with self._lock:
+                # Inline dispatch has already launched (and forgotten) the task by the time it returns
+                self._launches[task_id] = None
+            launch = self.dispatch(self._launch, task_id, skill, env)
+            with self._lock:
+                if task_id in self._launches:
+                    self._launches[task_id] = launch
+
+    def launch(self, task_id: str):
+        """What `dispatch` returned for a launch still in flight (a Future with an executor), else None."""
+        with self._lock:
+            return self._launches.get(task_id)
+
+    def _launch(self, task_id: str, skill: str, env: dict):
+        try:
+            self._start(task_id, skill, env)
+        finally:
+            with self._lock:
+                self._launches.pop(task_id, None)
+
+    def _start(self, task_id: str, skill: str, env: dict):
+        try:
+            container_id = self.launcher(task_id, skill, env)
+        except Exception as e:
+            logger.error(f"Task {task_id} failed to start: {e}")
+            self.finish(task_id, None, error=f"failed to start: {e}")
+            return
+
+        if not container_id:
+            self.finish(task_id, None, error="failed to start")
+            return
+
+        with self._lock:
+            cancelled = task_id in self._cancelling
+            submitted_at = self._submitted_at.pop(task_id, None)
+            if task_id in self._running:
+                self._run_ids[task_id] = container_id
+        if submitted_at:
+            task_start_seconds.observe(time.time() - submitted_at, skill)
+        self.store.update(task_id, container_id=container_id)
+        if cancelled and self.canceller:
+            self.stop_dispatch(self.canceller, task_id, container_id)
+
+    def _start_watchdog(self):
+        """Caller holds the lock."""
+        if self._watchdog is None:
+            self._watchdog = threading.Thread(target=self._watch_deadlines, name="task-watchdog", daemon=True)
+            self._watchdog.start()
+        self._deadline_changed.notify()
+
+    def _watch_deadlines(self):
+        """Single timer thread cancelling tasks that run past their timeout."""
+        while True:
+            with self._lock:
+                while not self._deadlines:
+                    self._deadline_changed.wait()
+                deadline, task_id, timeout = self._deadlines[0]
+                delay = deadline - time.time()
+                if delay > 0:
+                    self._deadline_changed.wait(delay)
+                    continue
+                heapq.heappop(self._deadlines)
+                expired = task_id in self._running
+            if expired:
+                self.cancel(task_id, reason=f"timed out after {timeout:g}s")
+
+def launch_container(task_id: str, skill: str, env: dict):
+    """Default launcher: run the skill in a brain container and report its exit."""
+    return docker_client.run_container(
+        image="contex-brain:latest",
+        command=skill,
+        env={**env, "TASK_ID": task_id},
+        on_exit=lambda exit_code: task_manager.finish(task_id, exit_code),
+        resources=task_manager.reservation(task_id)
+    )
+
+def coalesce_key(skill: str, env: dict) -> str:
+    """Identity of a request: the skill plus a digest of the env injected into its container."""
+    digest = hashlib.sha256(json.dumps(env, sort_keys=True).encode()).hexdigest()
+    return f"{skill}:{digest}"
+
+def cancel_container(task_id: str, run_id: str):
+    """Default canceller: SIGTERM / docker stop, then SIGKILL after TASK_STOP_GRACE seconds."""
+    if not docker_client.cancel(run_id, grace=float(config_manager.get("TASK_STOP_GRACE", 10))):
+        logger.warning(f"Run {run_id} of task {task_id} was not running")
+
+def skill_resources(skill: str) -> ResourceSpec:
+    """What a skill's manifest declares, completed with the sidecar defaults."""
+    found = skill_registry.get(skill)
+    declared = found.resources if found else ResourceSpec()
+    return declared.with_defaults(default_spec(config_manager.snapshot()))
+
+def task_ended(task: dict):
+    """End hook of the singleton: completion callbacks, and the log of a task that never ran."""
+    callbacks.task_ended(task)
+    if not task["container_id"]:
+        # Cancelled while queued or failed to start: no run will close its log for followers
+        task_logs.close(task["id"])
+
+def _limits(snapshot) -> dict:
+    return {
+        "max_concurrent": int(snapshot.get("MAX_CONCURRENT_TASKS", 4)),
+        "max_per_skill": int(snapshot.get("MAX_TASKS_PER_SKILL", 2)),
+        "max_queue": int(snapshot.get("MAX_QUEUED_TASKS", 100)),
+        "capacity": host_capacity(snapshot),
+        # Reuse of fresh results is opt-in: a user asking for a run expects one
+        "result_ttl": float(snapshot.get("RESULT_TTL", 0)),
+    }
+
+def _on_config_change(snapshot):
+    try:
+        limits = _limits(snapshot)
+    except (TypeError, ValueError) as e:
+        logger.error(f"Ignoring invalid task limits in config version {snapshot.version}: {e}")
+        return
+    current = {k: getattr(task_manager, k) for k in limits}
+    if limits != current:
+        logger.info(f"Task limits changed: {limits}")
+        task_manager.configure(**limits)
+
+# Singleton instance
+task_manager = TaskManager(
+    TaskStore(),
+    launcher=launch_container,
+    resources=skill_resources,
+    canceller=cancel_container,
+    coalesce=True,
+    # Completion callbacks subscribed through /run-task
+    on_end=task_ended,
+    **_limits(config_manager.snapshot()),
+    # Container creation runs on the Docker API executor, off the event loop;
+    # stops block for up to TASK_STOP_GRACE, so they get their own threads
+    dispatch=async_docker_client.executor.submit,
+    stop_dispatch=async_docker_client.stop_executor.submit
+)
+config_manager.subscribe(_on_config_change)
+metrics.gauge_callback("sidecar_task_queue_depth", "Tasks waiting for admission", lambda: task_manager.stats()["queue_depth"])
+metrics.gauge_callback(
+    "sidecar_tasks_running", "Admitted tasks by skill",
+    lambda: task_manager.stats()["running_per_skill"], ("skill",)
+)
@@ -14,6 +14,10 @@ class SidecarClient:
         try:
             url = f"{self.base_url}/notify"
             payload = {"title": title, "content": content}
+            # Lets the sidecar attach the result to the task record
+            task_id = config.get("TASK_ID")
+            if task_id:
+                payload["task_id"] = task_id
             response = requests.post(url, json=payload, timeout=5)
             response.raise_for_status()
             logger.info(f"Notification sent: {title}")
@@ -25,6 +25,11 @@ class ConfigLoader:
             except json.JSONDecodeError:
                 logger.error("Failed to parse SKILL_CONFIG JSON")
 
+    def reload(self):
+        """Re-read the environment (used when a pre-warmed process is reused for a task)."""
+        self._config = {}
+        self._load_from_env()
+
     def get(self, key: str, default: Any = None) -> Any:
         return self._config.get(key, default)
 
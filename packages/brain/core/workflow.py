@@ -1,3 +1,6 @@
+import json
+import asyncio
+import hashlib
 import operator
 from typing import Annotated, List, TypedDict, Optional
 from datetime import datetime
@@ -56,47 +59,89 @@ def history_filter_node(state: NewsState):
     logger.info(f"History Filter: {len(raw_articles)} -> {len(new_articles)}")
     return {"articles": new_articles}
 
+def article_id(art: Article) -> str:
+    """Stable id of an article (its URL, or title if it has none), used to match scores back."""
+    return hashlib.sha1((art.get('url') or art['title']).encode()).hexdigest()[:12]
+
+def _evaluation_line(art: Article) -> str:
+    return f"Id: {article_id(art)}\nTitle: {art['title']}\nSummary: {(art['body'] or '')[:200]}...\n\n"
+
+def make_batches(articles: List[Article], max_articles: int, max_chars: int) -> List[List[Article]]:
+    """Group articles so that no evaluation prompt exceeds `max_articles` or `max_chars` of article text."""
+    batches, batch, size = [], [], 0
+    for art in articles:
+        length = len(_evaluation_line(art))
+        if batch and (len(batch) >= max_articles or size + length > max_chars):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(art)
+        size += length
+    if batch:
+        batches.append(batch)
+    return batches
+
+async def _evaluate_batch(client, batch: List[Article], semaphore: asyncio.Semaphore, retries: int) -> dict:
+    """Scores of one batch by article id; {} if every attempt failed."""
+    prompt = "Evaluate the following news articles. For each, assign a relevance score (0-10) and a brief reason.\n"
+    prompt += "Criteria: High information density, recent, relevant to tech/AI/programming.\n"
+    prompt += "Output JSON format: [{'id': str, 'score': float, 'reason': str}]\n\n"
+    prompt += "".join(_evaluation_line(art) for art in batch)
+
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                # The SDK call blocks; threads let batches overlap
+                response = await asyncio.to_thread(
+                    client.models.generate_content,
+                    model='gemini-2.0-flash',
+                    contents=prompt,
+                    config={'response_mime_type': 'application/json'}
+                )
+            return {str(item['id']): item for item in json.loads(response.text) if 'id' in item}
+        except Exception as e:
+            logger.warning(f"Evaluation of {len(batch)} articles failed (attempt {attempt + 1}): {e}")
+            if attempt < retries:
+                await asyncio.sleep(0.5 * 2 ** attempt)
+    return {}
+
+async def _evaluate_all(client, batches: List[List[Article]], concurrency: int, retries: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(_evaluate_batch(client, batch, semaphore, retries) for batch in batches))
+    return {article: item for scores in results for article, item in scores.items()}
+
 def evaluate_node(state: NewsState):
-    """Score articles using LLM."""
+    """Score articles using LLM, in size-bounded batches evaluated concurrently."""
     articles = state['articles']
     if not articles:
         return {"articles": []}
 
     client = AIClientFactory.get_client()
-    scored_articles = []
-    
-    # We can batch evaluate or single evaluate. Batch is faster.
-    prompt = "Evaluate the following news articles. For each, assign a relevance score (0-10) and a brief reason.\n"
-    prompt += "Criteria: High information density, recent, relevant to tech/AI/programming.\n"
-    prompt += "Output JSON format: [{'index': int, 'score': float, 'reason': str}]\n\n"
-    
-    for i, art in enumerate(articles):
-        prompt += f"Index {i}:\nTitle: {art['title']}\nSummary: {art['body'][:200]}...\n\n"
+    batches = make_batches(
+        articles,
+        max_articles=int(config.get("EVAL_BATCH_SIZE", 10)),
+        max_chars=int(config.get("EVAL_BATCH_CHARS", 6000))
+    )
+    scores = asyncio.run(_evaluate_all(
+        client, batches,
+        concurrency=int(config.get("EVAL_CONCURRENCY", 4)),
+        retries=int(config.get("EVAL_RETRIES", 2))
+    ))
+    logger.info(f"Evaluated {len(articles)} articles in {len(batches)} batches, {len(scores)} scored")
 
-    try:
-        response = client.models.generate_content(
-            model='gemini-2.0-flash',
-            contents=prompt,
-            config={'response_mime_type': 'application/json'}
-        )
-        import json
-        evaluations = json.loads(response.text)
-        
-        # Map back to articles
-        for eval_item in evaluations:
-            idx = eval_item.get('index')
-            if idx is not None and 0 <= idx < len(articles):
-                art = articles[idx]
-                art['score'] = eval_item.get('score', 0)
-                art['reason'] = eval_item.get('reason', '')
-                if art['score'] >= 6.0: # Threshold
-                    scored_articles.append(art)
-                else:
-                    logger.info(f"Filtered low score ({art['score']}): {art['title']}")
-                    
-    except Exception as e:
-        logger.error(f"Evaluation failed: {e}. Keeping all articles.")
-        scored_articles = articles # Fallback
+    scored_articles = []
+    for art in articles:
+        item = scores.get(article_id(art))
+        if item is None:
+            # Its batch failed or the model skipped it: keep it rather than lose it
+            logger.warning(f"No score for {art['title']}. Keeping it.")
+            scored_articles.append(art)
+            continue
+        art['score'] = item.get('score', 0)
+        art['reason'] = item.get('reason', '')
+        if art['score'] >= 6.0: # Threshold
+            scored_articles.append(art)
+        else:
+            logger.info(f"Filtered low score ({art['score']}): {art['title']}")
 
     return {"articles": scored_articles}
 
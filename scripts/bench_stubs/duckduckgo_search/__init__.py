@@ -0,0 +1,24 @@
+"""Offline stand-in for duckduckgo_search used by the benchmarks."""
+import os
+import time
+import uuid
+
+class DDGS:
+    """Returns canned results after BENCH_SEARCH_LATENCY seconds."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def text(self, query: str, max_results: int = 3):
+        time.sleep(float(os.getenv("BENCH_SEARCH_LATENCY", "0.05")))
+        return [
+            {
+                # Fresh URLs so the history filter never short-circuits a run
+                "href": f"https://bench.invalid/{uuid.uuid4().hex}",
+                "title": f"{query} #{i}",
+                "body": f"Synthetic article {i} about {query}.",
+            }
+            for i in range(max_results)
+        ]
@@ -0,0 +1,21 @@
+"""Offline stand-in for google.genai used by the benchmarks."""
+import os
+import json
+import time
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+class _Models:
+    def generate_content(self, model: str, contents: str, config: dict = None):
+        """Answers after BENCH_LLM_LATENCY seconds: scores for evaluation prompts, a brief otherwise."""
+        time.sleep(float(os.getenv("BENCH_LLM_LATENCY", "0.05")))
+        if config and config.get("response_mime_type") == "application/json":
+            ids = [line[len("Id: "):] for line in contents.splitlines() if line.startswith("Id: ")]
+            return _Response(json.dumps([{"id": i, "score": 8.0, "reason": "benchmark"} for i in ids]))
+        return _Response(f"Benchmark brief ({len(contents)} prompt chars)")
+
+class Client:
+    def __init__(self, api_key: str = None, **kwargs):
+        self.models = _Models()
@@ -0,0 +1,340 @@
+"""
+End-to-end task latency benchmark.
+
+Drives the gateway and the sidecar in-process (mock Docker client, real
+forkserver/subprocess runner) with the daily-brief skill talking to offline
+stubs of the search and LLM backends (scripts/bench_stubs). Each round sends
+`concurrency` /brief messages to the gateway at once and times every task
+until its /notify reaches the sidecar.
+
+Results are compared with a checked-in baseline; the script exits 1 when a
+level regresses by more than the tolerance.
+
+    python scripts/bench_task_latency.py
+    python scripts/bench_task_latency.py --levels 1,4,16 --rounds 5
+    python scripts/bench_task_latency.py --update-baseline
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+STUBS_DIR = PROJECT_ROOT / "scripts" / "bench_stubs"
+BASELINE_PATH = PROJECT_ROOT / "scripts" / "bench_baseline.json"
+# run_task hands this URL to the skill, so the sidecar has to listen here
+SIDECAR_PORT = 12345
+
+# (metric, worse when higher, absolute slack on top of the relative tolerance)
+CHECKS = (
+    ("p50_ms", True, 50),
+    ("p95_ms", True, 50),
+    ("p99_ms", True, 50),
+    ("throughput_rps", False, 0),
+    ("peak_rss_mb", True, 16),
+    ("peak_threads", True, 8),
+    ("peak_fds", True, 16),
+)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,2,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=3, help="rounds per concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per stubbed LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="seconds per stubbed search")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for one round")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--output", type=Path, help="also write the results to this JSON file")
+    return parser.parse_args()
+
+def prepare_environment(args, work_dir: Path):
+    """Must run before any sidecar module is imported: the forkserver inherits this environment."""
+    os.chdir(PROJECT_ROOT)
+    os.environ.update({
+        "USE_MOCK_DOCKER": "true",
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "bench-key"),
+        "PYTHONPATH": f"{STUBS_DIR}:" + os.environ.get("PYTHONPATH", ""),
+        "BENCH_LLM_LATENCY": str(args.llm_latency),
+        "BENCH_SEARCH_LATENCY": str(args.search_latency),
+        "SIDECAR_DB_PATH": str(work_dir / "sidecar.db"),
+        "TASK_LOG_DIR": str(work_dir / "task_logs"),
+        "BRAIN_DB_PATH": str(work_dir / "brain.db"),
+        "GATEWAY_INBOX_DB": str(work_dir / "gateway_inbox.db"),
+    })
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+class ResourceSampler:
+    """Peak RSS, thread and fd counts of this process, sampled in the background."""
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peaks = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def reset(self):
+        self.peaks = {}
+        self.sample()
+
+    def sample(self):
+        status = {}
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                status[key] = value.split()
+        current = {
+            "peak_rss_mb": int(status["VmRSS"][0]) / 1024,
+            "peak_threads": int(status["Threads"][0]),
+            "peak_fds": len(os.listdir("/proc/self/fd")),
+        }
+        for key, value in current.items():
+            self.peaks[key] = max(self.peaks.get(key, 0), value)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+def _port_free(port: int) -> bool:
+    with socket.socket() as s:
+        # Like uvicorn, ignore connections lingering in TIME_WAIT
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            s.bind(("127.0.0.1", port))
+            return True
+        except OSError:
+            return False
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(app, port: int, lifespan: str):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan=lifespan))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError(f"server on port {port} did not start")
+        time.sleep(0.05)
+    return server
+
+class Completions:
+    """Counts /notify results and failed dispatches reported back through the gateway."""
+    def __init__(self):
+        self.notified = []
+        self.errors = 0
+        self._cond = threading.Condition()
+
+    def notify(self, task_id: str):
+        with self._cond:
+            self.notified.append(time.perf_counter())
+            self._cond.notify_all()
+
+    def error(self):
+        with self._cond:
+            self.errors += 1
+            self._cond.notify_all()
+
+    def reset(self):
+        with self._cond:
+            self.notified = []
+            self.errors = 0
+
+    def wait(self, count: int, timeout: float) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self.notified) + self.errors >= count, timeout)
+
+def run_level(concurrency: int, rounds: int, timeout: float, post_message, completions: Completions,
+              sampler: ResourceSampler, tag: str = "") -> dict:
+    latencies, errors = [], 0
+    sampler.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for round_no in range(rounds):
+            completions.reset()
+            round_start = time.perf_counter()
+            list(pool.map(post_message, [f"{tag}{concurrency}-{round_no}-{i}" for i in range(concurrency)]))
+            if not completions.wait(concurrency, timeout):
+                raise RuntimeError(f"round {round_no} at concurrency {concurrency} did not finish in {timeout:g}s")
+            latencies.extend(t - round_start for t in completions.notified)
+            errors += completions.errors
+    elapsed = time.perf_counter() - started
+    sampler.sample()
+
+    result = {
+        "concurrency": concurrency,
+        "requests": concurrency * rounds,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 3),
+    }
+    if latencies:
+        result.update({f"p{q}_ms": round(percentile(latencies, q) * 1000, 1) for q in (50, 95, 99)})
+    result.update({k: round(v, 1) for k, v in sampler.peaks.items()})
+    return result
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regression messages; empty when every shared level is within tolerance."""
+    if baseline.get("workload") != results["workload"]:
+        print("⚠️  Baseline was recorded with a different workload; skipping comparison")
+        print(f"   baseline: {baseline.get('workload')}\n   current:  {results['workload']}")
+        return []
+    previous = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    regressions = []
+    for level in results["levels"]:
+        base = previous.get(level["concurrency"])
+        if not base:
+            continue
+        if level["errors"] > base.get("errors", 0):
+            regressions.append(f"c={level['concurrency']}: {level['errors']} errors (baseline {base.get('errors', 0)})")
+        for metric, higher_is_worse, slack in CHECKS:
+            if metric not in level or metric not in base:
+                continue
+            current, reference = level[metric], base[metric]
+            if higher_is_worse and current > reference * (1 + tolerance) + slack:
+                regressions.append(f"c={level['concurrency']}: {metric} {current} > baseline {reference}")
+            if not higher_is_worse and current < reference * (1 - tolerance) - slack:
+                regressions.append(f"c={level['concurrency']}: {metric} {current} < baseline {reference}")
+    return regressions
+
+def print_table(levels: list):
+    columns = ("concurrency", "requests", "errors", "p50_ms", "p95_ms", "p99_ms",
+               "throughput_rps", "peak_rss_mb", "peak_threads", "peak_fds")
+    print("  ".join(f"{c:>14}" for c in columns))
+    for level in levels:
+        print("  ".join(f"{str(level.get(c, '-')):>14}" for c in columns))
+
+def main():
+    args = parse_args()
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+    if not _port_free(SIDECAR_PORT):
+        print(f"❌ Port {SIDECAR_PORT} is in use; stop the running sidecar first")
+        return 2
+
+    work_dir = Path(tempfile.mkdtemp(prefix="contex-bench-"))
+    prepare_environment(args, work_dir)
+
+    import requests
+    from apps.sidecar.api.main import app as sidecar_app
+    from apps.sidecar.core.logger import setup_logging_config
+    from apps.sidecar.core.config import config_manager
+    from apps.sidecar.core.tasks import task_manager
+    from apps.sidecar.core.callbacks import callbacks
+    import apps.gateway.main as gateway
+
+    # Keep the file log (part of the cost being measured) but not the console copy
+    setup_logging_config().stream = None
+    # Identical concurrent /brief requests would otherwise share one run
+    task_manager.coalesce = False
+    # Measure the pipeline, not the gateway's /brief rate limits
+    gateway.admission.configure(global_per_minute=1e6, global_burst=1e6)
+
+    completions = Completions()
+    record_result = task_manager.record_result
+
+    def on_result(task_id, result):
+        completions.notify(task_id)
+        return record_result(task_id, result)
+
+    task_manager.record_result = on_result
+    send_reply = gateway.send_wechat_reply
+
+    async def on_reply(recipient, content):
+        if content.startswith(("Failed", "Error", "Contex Brain is temporarily unavailable")):
+            completions.error()
+        await send_reply(recipient, content)
+
+    gateway.send_wechat_reply = on_reply
+
+    sidecar = start_server(sidecar_app, SIDECAR_PORT, "on")
+    gateway_port = _free_port()
+    gateway_server = start_server(gateway.app, gateway_port, "on")
+    # Completion callbacks go to this in-process gateway
+    gateway.CALLBACK_URL = f"http://127.0.0.1:{gateway_port}/callbacks/task"
+    gateway.CALLBACK_SECRET = callbacks.secret = "bench"
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=max(levels)))
+
+    def post_message(msg_id: str):
+        res = session.post(f"http://127.0.0.1:{gateway_port}/webhook/wechat",
+                           json={"msg_id": msg_id, "sender": f"bench-{msg_id}", "content": "/brief"}, timeout=30)
+        res.raise_for_status()
+
+    snapshot = config_manager.snapshot()
+    skill_config = snapshot.skill_config("daily-brief") or {}
+    results = {
+        "workload": {
+            "skill": "daily-brief",
+            "rounds": args.rounds,
+            "llm_latency": args.llm_latency,
+            "search_latency": args.search_latency,
+            "topics": len(skill_config.get("topics", ["Technology"])),
+            "max_results": skill_config.get("max_results", 3),
+            "max_concurrent": task_manager.max_concurrent,
+            "runner": os.getenv("MOCK_RUNNER", "default"),
+        },
+        "host": {"python": platform.python_version(), "cpus": os.cpu_count(), "system": platform.system()},
+        "levels": [],
+    }
+
+    sampler = ResourceSampler()
+    sampler.start()
+    try:
+        # Warm-up: the forkserver preloads in the background and the first run pays for it
+        # msg_ids differ from the measured rounds', which the gateway would drop as redeliveries
+        run_level(1, 1, args.timeout, post_message, completions, sampler, tag="warmup-")
+        for concurrency in levels:
+            print(f"[*] concurrency {concurrency} x {args.rounds} rounds...")
+            results["levels"].append(run_level(concurrency, args.rounds, args.timeout, post_message, completions, sampler))
+    finally:
+        sampler.stop()
+        gateway_server.should_exit = True
+        sidecar.should_exit = True
+
+    results["child_peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    print_table(results["levels"])
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"✅ Baseline written to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"⚠️  No baseline at {args.baseline}; run with --update-baseline to record one")
+        return 0
+
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    if regressions:
+        print("❌ Regressions against baseline:")
+        for message in regressions:
+            print(f"   {message}")
+        return 1
+    print("✅ Within tolerance of baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+HTTP load generator for the sidecar API.
+
+Mixes UI polling (/logs, /config, /skills, /tasks) with /run-task and
+/notify traffic against a local sidecar and reports per-endpoint latency
+percentiles, status codes and error rates. Event-loop stalls are read from
+the sidecar's own lag histogram (/metrics) before and after the run.
+
+Open loop (default): the mix gives arrival rates in requests/s per endpoint;
+arrivals are Poisson and latency is measured from the scheduled arrival, so
+a slow server cannot hide its queueing delay.
+Closed loop: --clients N virtual clients pick endpoints by the mix weights.
+
+    python scripts/load_sidecar.py --duration 30
+    python scripts/load_sidecar.py --mix logs=50,config=20,run-task=1 --duration 60
+    python scripts/load_sidecar.py --mode closed --clients 32 --url http://127.0.0.1:12345
+
+Without --url a sidecar is started on port 12345 with the mock Docker client
+and the offline skill backends from scripts/bench_stubs. Exits 1 when the
+error rate or event-loop stalls exceed the thresholds.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+STUBS_DIR = PROJECT_ROOT / "scripts" / "bench_stubs"
+SIDECAR_URL = "http://127.0.0.1:12345"
+
+ENDPOINTS = {
+    "logs": ("GET", "/logs", {"params": {"limit": 100}}),
+    "config": ("GET", "/config", {}),
+    "skills": ("GET", "/skills", {}),
+    "tasks": ("GET", "/tasks", {}),
+    "run-task": ("POST", "/run-task", {"json": {"task_name": "daily-brief"}}),
+    "notify": ("POST", "/notify", {"json": {"title": "Load test", "content": "load generator notification"}}),
+}
+DEFAULT_MIX = "logs=20,config=10,skills=10,tasks=5,run-task=0.5,notify=5"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target an already running sidecar instead of starting one")
+    parser.add_argument("--mode", choices=("open", "closed"), default="open")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"endpoint=rate (open) or endpoint=weight (closed); endpoints: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--clients", type=int, default=16, help="virtual clients in closed-loop mode")
+    parser.add_argument("--think", type=float, default=0.0, help="pause between requests of a closed-loop client")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="open loop: arrivals beyond this are counted as shed")
+    parser.add_argument("--stall-threshold", type=float, default=0.1, help="event-loop lag (s) counted as a stall")
+    parser.add_argument("--max-stalls", type=int, default=0, help="stalls tolerated before failing")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    return parser.parse_args()
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in mix: {name} (known: {', '.join(ENDPOINTS)})")
+        if float(value) > 0:
+            mix[name] = float(value)
+    if not mix:
+        raise SystemExit("The traffic mix is empty")
+    return mix
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.shed = 0
+
+    def record(self, latency: float, status):
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        # 4xx (e.g. 429 from a full task queue) is backpressure, not a server error
+        if not isinstance(status, int) or status >= 500:
+            self.errors += 1
+
+    def summary(self, duration: float) -> dict:
+        total = len(self.latencies)
+        result = {
+            "requests": total,
+            "rps": round(total / duration, 2),
+            "errors": self.errors,
+            "error_rate": round(self.errors / total, 4) if total else 0.0,
+            "shed": self.shed,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items(), key=lambda kv: str(kv[0]))},
+        }
+        if total:
+            ordered = sorted(self.latencies)
+            for q in (50, 95, 99):
+                result[f"p{q}_ms"] = round(ordered[min(total - 1, int(q / 100 * total))] * 1000, 1)
+            result["max_ms"] = round(ordered[-1] * 1000, 1)
+        return result
+
+async def send(client: httpx.AsyncClient, name: str, stats: EndpointStats, started: float):
+    method, path, kwargs = ENDPOINTS[name]
+    try:
+        res = await client.request(method, path, **kwargs)
+        status = res.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    stats.record(time.perf_counter() - started, status)
+
+async def open_loop(client, mix: dict, duration: float, max_inflight: int, stats: dict):
+    inflight = set()
+    late = [0]
+
+    async def arrivals(name: str, rate: float):
+        start = time.perf_counter()
+        scheduled = start
+        while True:
+            scheduled += random.expovariate(rate)
+            if scheduled - start > duration:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -0.05:
+                # The generator itself fell behind; its numbers are suspect
+                late[0] += 1
+            if len(inflight) >= max_inflight:
+                stats[name].shed += 1
+                continue
+            task = asyncio.ensure_future(send(client, name, stats[name], scheduled))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+
+    await asyncio.gather(*(arrivals(name, rate) for name, rate in mix.items()))
+    if inflight:
+        await asyncio.wait(inflight)
+    return late[0]
+
+async def closed_loop(client, mix: dict, duration: float, clients: int, think: float, stats: dict):
+    names, weights = list(mix), list(mix.values())
+    deadline = time.perf_counter() + duration
+
+    async def virtual_client():
+        while time.perf_counter() < deadline:
+            name = random.choices(names, weights)[0]
+            await send(client, name, stats[name], time.perf_counter())
+            if think:
+                await asyncio.sleep(think)
+
+    await asyncio.gather(*(virtual_client() for _ in range(clients)))
+    return 0
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{([^}]*)\})? (\S+)$')
+
+async def scrape_loop_lag(client: httpx.AsyncClient):
+    """({le: cumulative count}, max lag) from the sidecar's /metrics, or None if unavailable."""
+    try:
+        res = await client.get("/metrics")
+        res.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    buckets, max_lag = {}, None
+    for line in res.text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        if name == "sidecar_event_loop_lag_seconds_bucket":
+            le = re.search(r'le="([^"]+)"', labels).group(1)
+            buckets[float(le)] = float(value)
+        elif name == "sidecar_event_loop_lag_max_seconds":
+            max_lag = float(value)
+    return buckets, max_lag
+
+def loop_lag_report(before, after, threshold: float) -> dict:
+    if not before or not after:
+        return {"available": False}
+    delta = {le: after[0].get(le, 0) - before[0].get(le, 0) for le in after[0]}
+    bounds = sorted(delta)
+    total = delta[bounds[-1]] if bounds else 0
+
+    def quantile(q):
+        for le in bounds:
+            if delta[le] >= q * total:
+                return le
+        return None
+
+    # Wakeups later than the largest bucket bound at or under the threshold
+    within = max((le for le in bounds if le <= threshold), default=None)
+    stalls = total - (delta[within] if within is not None else 0)
+    return {
+        "available": True,
+        "samples": int(total),
+        "p50_le_s": quantile(0.5) if total else None,
+        "p99_le_s": quantile(0.99) if total else None,
+        "stalls": int(stalls),
+        "threshold_s": within if within is not None else threshold,
+        "max_since_start_s": round(after[1], 4) if after[1] is not None else None,
+    }
+
+def start_sidecar(work_dir: Path) -> subprocess.Popen:
+    env = os.environ.copy()
+    env.update({
+        "USE_MOCK_DOCKER": "true",
+        "GOOGLE_API_KEY": env.get("GOOGLE_API_KEY", "load-key"),
+        "PYTHONPATH": f"{PROJECT_ROOT}:{STUBS_DIR}:" + env.get("PYTHONPATH", ""),
+        "SIDECAR_DB_PATH": str(work_dir / "sidecar.db"),
+        "TASK_LOG_DIR": str(work_dir / "task_logs"),
+        "BRAIN_DB_PATH": str(work_dir / "brain.db"),
+    })
+    process = subprocess.Popen(
+        [sys.executable, "apps/sidecar/api/main.py"],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Sidecar exited with code {process.returncode} (is port 12345 in use? try --url)")
+        try:
+            if httpx.get(f"{SIDECAR_URL}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Sidecar did not become healthy within 30s")
+
+def print_report(report: dict):
+    columns = ("requests", "rps", "errors", "error_rate", "shed", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+    print(f"{'endpoint':>10}  " + "  ".join(f"{c:>10}" for c in columns))
+    for name, summary in report["endpoints"].items():
+        print(f"{name:>10}  " + "  ".join(f"{str(summary.get(c, '-')):>10}" for c in columns))
+    lag = report["loop_lag"]
+    if lag["available"]:
+        print(f"\nEvent loop lag: {lag['samples']} samples, p50 <= {lag['p50_le_s']}s, p99 <= {lag['p99_le_s']}s, "
+              f"{lag['stalls']} stalls > {lag['threshold_s']}s, max since start {lag['max_since_start_s']}s")
+    else:
+        print("\nEvent loop lag: unavailable (sidecar has no /metrics)")
+    if report["generator_late"]:
+        print(f"⚠️  The generator fell behind {report['generator_late']} times; lower the rates or use closed mode")
+
+async def run(args, mix: dict, base_url: str) -> dict:
+    stats = {name: EndpointStats() for name in mix}
+    limits = httpx.Limits(max_connections=max(args.clients, 100), max_keepalive_connections=100)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        before = await scrape_loop_lag(client)
+        started = time.perf_counter()
+        if args.mode == "open":
+            late = await open_loop(client, mix, args.duration, args.max_inflight, stats)
+        else:
+            late = await closed_loop(client, mix, args.duration, args.clients, args.think, stats)
+        elapsed = time.perf_counter() - started
+        after = await scrape_loop_lag(client)
+
+    return {
+        "mode": args.mode,
+        "mix": mix,
+        "duration_s": round(elapsed, 2),
+        "endpoints": {name: s.summary(elapsed) for name, s in stats.items()},
+        "loop_lag": loop_lag_report(before, after, args.stall_threshold),
+        "generator_late": late,
+    }
+
+def main():
+    args = parse_args()
+    mix = parse_mix(args.mix)
+    sidecar = None
+    if not args.url:
+        sidecar = start_sidecar(Path(tempfile.mkdtemp(prefix="contex-load-")))
+    try:
+        report = asyncio.run(run(args, mix, args.url or SIDECAR_URL))
+    finally:
+        if sidecar:
+            sidecar.terminate()
+            sidecar.wait(timeout=10)
+
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    failures = []
+    total = sum(s["requests"] for s in report["endpoints"].values())
+    errors = sum(s["errors"] for s in report["endpoints"].values())
+    if total and errors / total > args.max_error_rate:
+        failures.append(f"error rate {errors / total:.2%} > {args.max_error_rate:.2%}")
+    if report["loop_lag"].get("stalls", 0) > args.max_stalls:
+        failures.append(f"{report['loop_lag']['stalls']} event-loop stalls")
+    if failures:
+        print("❌ " + "; ".join(failures))
+        return 1
+    print("✅ No event-loop stalls and error rate within limits")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,5 @@
 import os
 import sys
-import json
 import logging
 from pathlib import Path
 
@@ -8,6 +7,9 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.append(str(PROJECT_ROOT))
 
+from apps.sidecar.core.log_reader import tail_lines
+from apps.sidecar.core.skills import SkillRegistry
+
 # Attempt to import mcp
 try:
     from mcp.server.fastmcp import FastMCP
@@ -18,21 +20,16 @@ except ImportError:
 # Initialize MCP Server
 mcp = FastMCP("Contex Project Context")
 
+# Same manifest index the sidecar uses; re-parses only changed manifests
+skills = SkillRegistry(PROJECT_ROOT / "packages/skills")
+
 @mcp.tool()
 def list_project_skills() -> str:
     """List all available skills in the project and their descriptions."""
-    skills_dir = PROJECT_ROOT / "packages/skills"
     result = []
-    if skills_dir.exists():
-        for skill in skills_dir.iterdir():
-            if skill.is_dir():
-                manifest = skill / "manifest.json"
-                if manifest.exists():
-                    try:
-                        data = json.loads(manifest.read_text())
-                        result.append(f"- {data.get('name', skill.name)} ({skill.name}): {data.get('description', 'No description')}")
-                    except Exception as e:
-                        result.append(f"- {skill.name}: Error reading manifest ({e})")
+    for skill in skills.list():
+        data = skill.manifest
+        result.append(f"- {data.get('name', skill.id)} ({skill.id}): {data.get('description', 'No description')}")
     return "\n".join(result)
 
 @mcp.tool()
@@ -43,9 +40,8 @@ def read_system_logs(lines: int = 50) -> str:
         return "Log file not found."
     
     try:
-        with open(log_file, 'r') as f:
-            all_lines = f.readlines()
-            return "".join(all_lines[-lines:])
+        # Seek backwards from the end instead of reading the whole file
+        return "\n".join(l.decode("utf-8", errors="replace") for l in tail_lines(log_file, lines))
     except Exception as e:
         return f"Error reading logs: {e}"
 
@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import asyncio
+import socket
+import threading
+import requests
+import uvicorn
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from apps.sidecar.api.main import app
+from apps.sidecar.core.tasks import task_manager
+
+LAUNCH_DELAY = 0.5
+TASK_COUNT = 20
+
+def slow_launcher(task_id, skill, env):
+    """Simulates a blocking Docker SDK containers.run() call."""
+    time.sleep(LAUNCH_DELAY)
+    task_manager.finish(task_id, 0)
+    return f"slow-{task_id[:8]}"
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def test_health_stays_fast_while_launching_tasks():
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    original = task_manager.launcher
+    task_manager.launcher = slow_launcher
+    try:
+        deadline = time.time() + 10
+        while not server.started:
+            assert time.time() < deadline, "sidecar did not start"
+            time.sleep(0.05)
+        # The first requests pay for connection setup and lazy imports, not for launches
+        for _ in range(5):
+            requests.get(f"{base_url}/health", timeout=30)
+
+        with ThreadPoolExecutor(max_workers=TASK_COUNT) as pool:
+            launches = [
+                pool.submit(requests.post, f"{base_url}/run-task", json={"task_name": "daily-brief", "force": True}, timeout=30)
+                for _ in range(TASK_COUNT)
+            ]
+
+            latencies = []
+            while not all(f.done() for f in launches) or len(latencies) < 10:
+                start = time.perf_counter()
+                res = requests.get(f"{base_url}/health", timeout=30)
+                latencies.append(time.perf_counter() - start)
+                assert res.status_code == 200
+                time.sleep(0.01)
+            responses = [f.result() for f in launches]
+
+        # Let the queued slow launches drain before restoring the launcher
+        deadline = time.time() + TASK_COUNT * LAUNCH_DELAY
+        while task_manager.stats()["running"] or task_manager.stats()["queue_depth"]:
+            assert time.time() < deadline
+            time.sleep(0.05)
+    finally:
+        task_manager.launcher = original
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    assert all(r.status_code == 200 for r in responses)
+    assert {r.json()["status"] for r in responses} <= {"started", "queued"}
+    # Started tasks are answered once their launch has a container id
+    started = [r.json() for r in responses if r.json()["status"] == "started"]
+    assert started and all(r["container_id"] == f"slow-{r['task_id'][:8]}" for r in started)
+    # A single blocking launch on the loop would push /health past LAUNCH_DELAY
+    assert max(latencies) < LAUNCH_DELAY / 2, f"/health stalled: max {max(latencies):.3f}s"
+
+def test_waits_hold_no_executor_thread_and_are_capped():
+    from apps.sidecar.core.docker_client import AsyncDockerClient, RunTracker
+
+    class Tracker(RunTracker):
+        is_mock = True
+
+        def shutdown(self):
+            pass
+
+    tracker = Tracker()
+    tracker._init_runs()
+    run, stuck = tracker._track("run-1"), tracker._track("run-2")
+    client = AsyncDockerClient(tracker, max_workers=1, max_wait=0.2)
+
+    async def scenario():
+        waits = [asyncio.create_task(client.wait("run-1", timeout=30)) for _ in range(20)]
+        await asyncio.sleep(0.05)
+        # Twenty pending waits leave the single Docker API worker free
+        assert await client._call(lambda: "free") == "free"
+        run.finish(0)
+        started = time.perf_counter()
+        capped = await client.wait("run-2", timeout=3600)
+        return await asyncio.gather(*waits), capped, time.perf_counter() - started
+
+    try:
+        exit_codes, capped, waited = asyncio.run(scenario())
+    finally:
+        client.shutdown()
+    assert exit_codes == [0] * 20
+    assert capped is None and waited < 1
+    assert not stuck.done.is_set()
+
+def test_reused_task_still_calls_back():
+    from apps.sidecar.core.callbacks import callbacks
+
+    def finishing_launcher(task_id, skill, env):
+        task_manager.record_result(task_id, "brief")
+        task_manager.finish(task_id, 0)
+        return f"done-{task_id[:8]}"
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    original = task_manager.launcher, task_manager.result_ttl
+    task_manager.launcher = finishing_launcher
+    task_manager.configure(result_ttl=60)
+    try:
+        deadline = time.time() + 10
+        while not server.started:
+            assert time.time() < deadline, "sidecar did not start"
+            time.sleep(0.05)
+        body = {"task_name": "daily-brief", "callback_url": "http://127.0.0.1:9/done"}
+        first = requests.post(f"{base_url}/run-task", json={**body, "force": True}, timeout=30).json()
+        deadline = time.time() + 10
+        while task_manager.get(first["task_id"])["status"] != "succeeded":
+            assert time.time() < deadline
+            time.sleep(0.02)
+
+        # With the dispatcher not started, scheduled deliveries stay due
+        due = callbacks.stats()["due"]
+        reused = requests.post(f"{base_url}/run-task", json=body, timeout=30).json()
+        assert reused["reused"] and reused["task_id"] == first["task_id"] and reused["result"] == "brief"
+        assert callbacks.stats()["due"] == due + 1
+    finally:
+        task_manager.launcher = original[0]
+        task_manager.configure(result_ttl=original[1])
+        server.should_exit = True
+        thread.join(timeout=10)
@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import sqlite3
+import socket
+import tempfile
+import threading
+import requests
+import uvicorn
+from pathlib import Path
+from fastapi import FastAPI, Request, Response
+
+# Add project root to path
+sys.path.append(os.getcwd())
+os.environ.setdefault("GATEWAY_INBOX_DB", os.path.join(tempfile.mkdtemp(), "inbox.db"))
+
+import apps.gateway.main as gateway
+from apps.gateway.inbox import DedupCache
+from apps.sidecar.core.callbacks import CallbackDispatcher
+from apps.sidecar.core.signing import sign, verify, SIGNATURE_HEADER, TIMESTAMP_HEADER
+from apps.sidecar.core.tasks import TaskManager, TaskStore
+
+def _record(replies: list):
+    """Stand-in for gateway.send_wechat_reply that collects replies instead of queueing them."""
+    async def send(recipient, content):
+        replies.append((recipient, content))
+    return send
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _serve(app):
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started:
+        assert time.time() < deadline, "server did not start"
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+def _wait_for(condition, timeout: float = 10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.02)
+
+def test_signatures_expire_and_bind_the_body():
+    now = str(int(time.time()))
+    signature = sign("s3cret", now, b'{"a": 1}')
+    assert verify("s3cret", now, signature, b'{"a": 1}')
+    assert not verify("s3cret", now, signature, b'{"a": 2}')
+    assert not verify("other", now, signature, b'{"a": 1}')
+    stale = str(int(time.time()) - 600)
+    assert not verify("s3cret", stale, sign("s3cret", stale, b"{}"), b"{}")
+
+def test_task_end_is_delivered_signed_with_retries():
+    receiver = FastAPI()
+    receiver.state.received = []
+
+    @receiver.post("/done")
+    async def done(request: Request):
+        body = await request.body()
+        # The first delivery fails; the dispatcher must try again
+        if not receiver.state.received:
+            receiver.state.received.append(None)
+            return Response(status_code=503)
+        assert verify("s3cret", request.headers[TIMESTAMP_HEADER], request.headers[SIGNATURE_HEADER], body)
+        receiver.state.received.append(json.loads(body))
+        return {"ok": True}
+
+    server, url = _serve(receiver)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = Path(temp_dir) / "sidecar.db"
+        dispatcher = CallbackDispatcher(db_path, secret="s3cret", max_backoff=0.1)
+        manager = TaskManager(TaskStore(db_path), launcher=lambda *args: "container", on_end=dispatcher.task_ended)
+        dispatcher.start()
+        try:
+            task = manager.submit("daily-brief", {})
+            dispatcher.subscribe(task["id"], f"{url}/done", {"sender": "u"})
+            manager.record_result(task["id"], "Today's brief")
+            manager.finish(task["id"], 0)
+            # Ending the same task again schedules nothing new
+            assert dispatcher.task_ended(manager.get(task["id"])) == 0
+
+            _wait_for(lambda: len(receiver.state.received) == 2)
+            event = receiver.state.received[1]
+            assert event["status"] == "succeeded" and event["result"] == "Today's brief"
+            assert event["context"] == {"sender": "u"}
+            _wait_for(lambda: dispatcher.stats()["delivered"] == 1)
+        finally:
+            dispatcher.stop()
+            server.should_exit = True
+
+def test_slow_receiver_does_not_hold_up_others_and_old_rows_expire():
+    receiver = FastAPI()
+    receiver.state.received = []
+
+    @receiver.post("/{name}")
+    async def done(name: str):
+        if name == "slow":
+            await asyncio.sleep(2)
+        receiver.state.received.append(name)
+        return {"ok": True}
+
+    server, url = _serve(receiver)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = Path(temp_dir) / "sidecar.db"
+        dispatcher = CallbackDispatcher(db_path, workers=2, retention_days=1)
+        manager = TaskManager(TaskStore(db_path), launcher=lambda *args: "container", on_end=dispatcher.task_ended)
+        dispatcher.start()
+        try:
+            slow, fast = manager.submit("slow-skill", {}), manager.submit("fast-skill", {})
+            dispatcher.subscribe(slow["id"], f"{url}/slow")
+            dispatcher.subscribe(fast["id"], f"{url}/fast")
+            manager.finish(slow["id"], 0)
+            time.sleep(0.2)
+            manager.finish(fast["id"], 0)
+            _wait_for(lambda: receiver.state.received == ["fast"], timeout=1.5)
+            _wait_for(lambda: dispatcher.stats()["delivered"] == 2)
+        finally:
+            dispatcher.stop()
+            server.should_exit = True
+
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("UPDATE callbacks SET updated_at = ? WHERE url LIKE '%/slow'", (time.time() - 2 * 86400,))
+        assert dispatcher.prune() == 1
+        assert dispatcher.stats()["delivered"] == 1
+
+def test_waiting_callbacks_of_interrupted_tasks_are_recovered():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = Path(temp_dir) / "sidecar.db"
+        dispatcher = CallbackDispatcher(db_path)
+        manager = TaskManager(TaskStore(db_path), launcher=lambda *args: "container")
+        task = manager.submit("daily-brief", {})
+        dispatcher.subscribe(task["id"], "http://127.0.0.1:1/done")
+
+        # Sidecar restart: the running task is marked interrupted
+        restarted = TaskManager(TaskStore(db_path), launcher=lambda *args: "container")
+        assert restarted.get(task["id"])["status"] == "interrupted"
+        assert dispatcher.recover(restarted.get) == 1
+        assert dispatcher.stats()["due"] == 1
+
+def test_gateway_replies_once_to_verified_callbacks():
+    replies = []
+    original_reply, original_secret, original_dedup = gateway.send_wechat_reply, gateway.CALLBACK_SECRET, gateway.dedup
+    gateway.send_wechat_reply = _record(replies)
+    gateway.CALLBACK_SECRET = "s3cret"
+    server, url = _serve(gateway.app)
+    try:
+        body = json.dumps({
+            "task_id": "t1", "skill": "daily-brief", "status": "succeeded", "result": "Today's brief",
+            "context": {"msg_id": "m1", "sender": "alice"}
+        }).encode()
+        now = str(int(time.time()))
+        headers = {"X-Contex-Delivery": "7", TIMESTAMP_HEADER: now, SIGNATURE_HEADER: sign("s3cret", now, body)}
+
+        forged = dict(headers, **{SIGNATURE_HEADER: sign("guess", now, body)})
+        assert requests.post(f"{url}/callbacks/task", data=body, headers=forged).status_code == 401
+        for malformed in (b"{not json", json.dumps({"task_id": "t1", "context": {"sender": "alice"}}).encode()):
+            signed = {TIMESTAMP_HEADER: now, SIGNATURE_HEADER: sign("s3cret", now, malformed)}
+            assert requests.post(f"{url}/callbacks/task", data=malformed, headers=signed).status_code == 400
+        assert requests.post(f"{url}/callbacks/task", data=body, headers=headers).json()["status"] == "sent"
+        # A retried delivery is acknowledged without replying again, even once the cache has forgotten it
+        assert requests.post(f"{url}/callbacks/task", data=body, headers=headers).json()["status"] == "duplicate"
+        gateway.dedup = DedupCache()
+        assert requests.post(f"{url}/callbacks/task", data=body, headers=headers).json()["status"] == "duplicate"
+        assert replies == [("alice", "Today's brief")]
+
+        # Without a shared secret callbacks are refused outright
+        gateway.CALLBACK_SECRET = None
+        assert requests.post(f"{url}/callbacks/task", data=body, headers=headers).status_code == 403
+    finally:
+        gateway.send_wechat_reply, gateway.CALLBACK_SECRET, gateway.dedup = original_reply, original_secret, original_dedup
+        server.should_exit = True
@@ -7,8 +7,10 @@ Tests the layered configuration loading mechanism
 import os
 import sys
 import json
+import time
 import tempfile
 import shutil
+import threading
 from pathlib import Path
 
 # Add project root to path
@@ -168,10 +170,88 @@ def test_config_with_system_env():
         elif "PYTHONPATH" in os.environ:
             del os.environ["PYTHONPATH"]
 
+def test_snapshot_reload_and_atomic_saves():
+    """Test snapshots, change notifications, hot reload and coalesced atomic saves."""
+    print("\n=== Testing Config Snapshots and Hot Reload ===")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_file = Path(temp_dir) / "config.json"
+        config_file.write_text(json.dumps({"skill_configs": {"daily-brief": {"topics": ["AI"]}}}))
+
+        original_cwd = os.getcwd()
+        os.chdir(temp_dir)
+        try:
+            config_mgr = ConfigManager(reload_interval=0.05)
+            snapshot = config_mgr.snapshot()
+            assert snapshot.skill_config_json("daily-brief") == json.dumps({"topics": ["AI"]})
+            assert snapshot.skill_config_json("missing") is None
+
+            versions = []
+            config_mgr.subscribe(lambda s: versions.append(s.version))
+
+            # Concurrent saves all land, in one or a few writes
+            threads = [threading.Thread(target=config_mgr.save, args=({f"KEY_{i}": i},)) for i in range(10)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            saved = json.loads(config_file.read_text())
+            assert all(saved[f"KEY_{i}"] == i for i in range(10))
+            assert versions == list(range(2, 12))
+            # The old snapshot is untouched, and no temp files are left behind
+            assert "KEY_0" not in snapshot.config
+            assert os.listdir(temp_dir) == ["config.json"]
+
+            # An external edit is picked up by the watcher
+            config_mgr.start_watching()
+            try:
+                config_file.write_text(json.dumps({"MAX_CONCURRENT_TASKS": "8"}))
+                deadline = time.time() + 5
+                while config_mgr.get("MAX_CONCURRENT_TASKS") != "8":
+                    assert time.time() < deadline, "external edit was not reloaded"
+                    time.sleep(0.02)
+
+                # A half-written file keeps the last good version
+                version = config_mgr.version
+                config_file.write_text("{not json")
+                time.sleep(0.3)
+                assert config_mgr.version == version
+                assert config_mgr.get("MAX_CONCURRENT_TASKS") == "8"
+            finally:
+                config_mgr.stop_watching()
+
+            # A debounced save still pending is not clobbered by a reload
+            config_file.write_text(json.dumps({"MAX_CONCURRENT_TASKS": "8"}))
+            debounced = ConfigManager(save_delay=60)
+            debounced.save({"RESULT_TTL": "60"}, wait=False)
+            config_file.write_text(json.dumps({"MAX_CONCURRENT_TASKS": "2"}))
+            debounced.reload()
+            assert debounced.get("RESULT_TTL") == "60" and debounced.get("MAX_CONCURRENT_TASKS") == "8"
+            assert debounced.flush()
+            assert json.loads(config_file.read_text())["RESULT_TTL"] == "60"
+
+            # Nor is a change applied while the files were being read
+            racing = ConfigManager()
+            load_layers = racing._load_layers
+
+            def load_during_save(initial=True):
+                layers = load_layers(initial)
+                racing._apply({"RESULT_TTL": "30"})
+                return layers
+
+            racing._load_layers = load_during_save
+            racing.reload()
+            assert racing.get("RESULT_TTL") == "30"
+
+            print("✅ Snapshot and hot reload test passed")
+        finally:
+            os.chdir(original_cwd)
+
 if __name__ == "__main__":
     try:
         test_config_layers()
         test_config_with_system_env()
+        test_snapshot_reload_and_atomic_saves()
         print("\n🎉 All configuration tests completed successfully!")
     except Exception as e:
         print(f"\n❌ Configuration test failed: {e}")
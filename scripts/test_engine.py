@@ -0,0 +1,94 @@
+import os
+import sys
+import struct
+import subprocess
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from apps.sidecar.core.engine import ExecutionEngine, DockerFrameDecoder, LineDecoder
+
+def test_docker_frame_decoder_splits_streams():
+    decoder = DockerFrameDecoder()
+    frame = lambda kind, data: struct.pack(">BxxxL", kind, len(data)) + data
+    payload = frame(1, b"hello\nwor") + frame(2, b"oops\n") + frame(1, b"ld\n")
+
+    # Feed in awkward chunks to exercise partial headers and payloads
+    lines = []
+    for i in range(0, len(payload), 5):
+        lines.extend(decoder.feed(payload[i:i + 5]))
+    lines.extend(decoder.flush())
+
+    assert lines == [("stdout", "hello"), ("stderr", "oops"), ("stdout", "world")]
+
+def test_multiplexer_pumps_many_processes_from_one_thread():
+    engine = ExecutionEngine(max_workers=2)
+    try:
+        collected = []
+        streams = []
+        for i in range(10):
+            process = subprocess.Popen(
+                [sys.executable, "-c", f"import sys; print('out {i}'); print('err {i}', file=sys.stderr)"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+            on_line = lambda stream, line: collected.append((stream, line))
+            streams.append(engine.logs.register(process.stdout, on_line, decoder=LineDecoder("stdout")))
+            streams.append(engine.logs.register(process.stderr, on_line, decoder=LineDecoder("stderr")))
+            engine.submit(process.wait)
+
+        for closed in streams:
+            assert closed.wait(timeout=10)
+
+        assert sorted(collected) == sorted(
+            [("stdout", f"out {i}") for i in range(10)] + [("stderr", f"err {i}") for i in range(10)]
+        )
+        stats = engine.stats()
+        assert stats["log_pumps"]["streams"] == 0
+        assert stats["log_pumps"]["lines"] == 20
+    finally:
+        engine.shutdown()
+
+def test_warm_pool_refills_while_supervisors_hold_every_worker():
+    import threading
+    import time
+    from apps.sidecar.core.engine import engine
+    from apps.sidecar.core.docker_client import WarmPool
+
+    class Container:
+        status = "running"
+
+        def __init__(self, n):
+            self.id = f"container-{n:04d}"
+
+        def reload(self):
+            pass
+
+        def remove(self, force=False):
+            pass
+
+    class Containers:
+        def __init__(self):
+            self.started = 0
+
+        def run(self, image, **kwargs):
+            self.started += 1
+            return Container(self.started)
+
+    class Client:
+        containers = Containers()
+
+    # Long-running supervisions occupy every engine worker
+    release = threading.Event()
+    for _ in range(engine.max_workers):
+        engine.submit(release.wait)
+    pool = WarmPool(Client(), image="brain", size=2, max_jobs=5, health_interval=3600)
+    try:
+        pool.start()
+        deadline = time.time() + 5
+        while pool.stats()["idle"] < 2:
+            assert time.time() < deadline, pool.stats()
+            time.sleep(0.02)
+    finally:
+        release.set()
+        pool.shutdown()
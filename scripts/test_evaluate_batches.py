@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import threading
+
+# Add project root and the brain SDK to path
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "packages"))
+os.environ.setdefault("BRAIN_DB_PATH", os.path.join(tempfile.mkdtemp(), "brain.db"))
+
+import brain.core.workflow as workflow
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+class StubLLM:
+    """Scores every article in the prompt after `latency`, answering in shuffled order; `fail` decides per call."""
+    def __init__(self, latency: float = 0.2, fail=None):
+        self.latency = latency
+        self.fail = fail or (lambda ids, call: False)
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        self.models = self
+
+    def generate_content(self, model: str, contents: str, config: dict = None):
+        ids = [line[len("Id: "):] for line in contents.splitlines() if line.startswith("Id: ")]
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.latency)
+            if self.fail(ids, call):
+                raise RuntimeError("503 overloaded")
+            random.shuffle(ids)
+            return _Response(json.dumps([{"id": i, "score": 8.0 if int(i, 16) % 2 else 2.0, "reason": "stub"} for i in ids]))
+        finally:
+            with self._lock:
+                self.active -= 1
+
+def _articles(n: int):
+    return [
+        {"url": f"https://news.invalid/{i}", "title": f"Story {i}", "body": "x" * 300, "source": "stub",
+         "topic": "AI", "score": 0.0, "reason": ""}
+        for i in range(n)
+    ]
+
+def _evaluate(llm: StubLLM, articles: list, **settings):
+    original_client, original_config = workflow.AIClientFactory.get_client, dict(workflow.config._config)
+    workflow.AIClientFactory.get_client = staticmethod(lambda: llm)
+    workflow.config._config.update({"EVAL_BATCH_SIZE": 5, "EVAL_CONCURRENCY": 4, "EVAL_RETRIES": 1, **settings})
+    try:
+        return workflow.evaluate_node({"articles": articles, "final_brief": "", "config": {}})["articles"]
+    finally:
+        workflow.AIClientFactory.get_client = original_client
+        workflow.config._config = original_config
+
+def test_batches_respect_article_and_size_bounds():
+    articles = _articles(23)
+    batches = workflow.make_batches(articles, max_articles=5, max_chars=10_000)
+    assert [len(b) for b in batches] == [5, 5, 5, 5, 3]
+    # Each article takes ~250 chars of prompt, so an 800 char budget fits three
+    assert all(len(b) <= 3 for b in workflow.make_batches(articles, max_articles=10, max_chars=800))
+    assert [a for b in batches for a in b] == articles
+
+def test_batches_run_concurrently_and_merge_by_id():
+    llm = StubLLM(latency=0.2)
+    articles = _articles(20)
+    started = time.perf_counter()
+    kept = _evaluate(llm, articles)
+    elapsed = time.perf_counter() - started
+
+    # 4 batches at concurrency 4: one round trip, not four
+    assert llm.calls == 4 and llm.peak == 4
+    assert elapsed < 0.6, f"{elapsed:.2f}s"
+    expected = [a for a in articles if int(workflow.article_id(a), 16) % 2]
+    assert kept == expected and all(a["score"] == 8.0 for a in kept)
+
+def test_failed_batch_is_retried_alone_and_kept_if_it_keeps_failing():
+    articles = _articles(15)
+    flaky, broken = workflow.article_id(articles[0]), workflow.article_id(articles[10])
+    # The first batch fails once, the third always
+    llm = StubLLM(latency=0.01, fail=lambda ids, call: broken in ids or (flaky in ids and call <= 3))
+    kept = _evaluate(llm, articles)
+
+    assert llm.calls == 3 + 1 + 1
+    by_title = {a["title"]: a for a in kept}
+    # Scored after its retry: low scores filtered out as usual
+    assert all(by_title[a["title"]]["reason"] == "stub" for a in articles[:5] if a["title"] in by_title)
+    # Unscored articles of the failing batch are kept
+    assert all(a["title"] in by_title and a["reason"] == "" for a in articles[10:])
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import tempfile
+import pytest
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from apps.sidecar.core import forkserver
+from apps.sidecar.core.docker_client import MockDockerClient
+
+@pytest.mark.skipif(not forkserver.is_supported(), reason="forkserver needs fork() and SCM_RIGHTS")
+def test_forked_tasks_get_their_own_env_and_output():
+    server = forkserver.ForkServer(startup_timeout=120)
+    server.start()
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            script = os.path.join(temp_dir, "main.py")
+            with open(script, "w") as f:
+                f.write(
+                    "import os, sys\n"
+                    "print('hello', os.environ['TASK_ID'])\n"
+                    "print('warn', file=sys.stderr)\n"
+                    "sys.exit(int(os.environ['EXIT_CODE']))\n"
+                )
+
+            results = []
+            for i, code in enumerate([0, 3]):
+                process = server.spawn(script, {"TASK_ID": f"t{i}", "EXIT_CODE": str(code)}, temp_dir)
+                out, err = process.stdout.read(), process.stderr.read()
+                results.append((process.wait(timeout=30), out, err))
+
+            assert results[0] == (0, b"hello t0\n", b"warn\n")
+            assert results[1] == (3, b"hello t1\n", b"warn\n")
+            assert server.stats()["forks"] == 2
+    finally:
+        server.shutdown()
+
+@pytest.mark.skipif(not forkserver.is_supported(), reason="forkserver needs fork() and SCM_RIGHTS")
+def test_forked_tasks_get_memory_rlimit():
+    server = forkserver.ForkServer(startup_timeout=120)
+    server.start()
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            script = os.path.join(temp_dir, "main.py")
+            with open(script, "w") as f:
+                f.write("buffer = bytearray(int(__import__('os').environ['ALLOC_MB']) * 1024 * 1024)\n")
+
+            limits = {"data": 256 * 1024 * 1024}
+            within = server.spawn(script, {"ALLOC_MB": "16"}, temp_dir, limits)
+            over = server.spawn(script, {"ALLOC_MB": "512"}, temp_dir, limits)
+            assert within.wait(timeout=30) == 0
+            assert over.wait(timeout=30) == 1
+            assert b"MemoryError" in over.stderr.read()
+    finally:
+        server.shutdown()
+
+def test_mock_run_cancel_terminates_process_group(tmp_path, monkeypatch):
+    skill = tmp_path / "packages" / "skills" / "sleeper"
+    skill.mkdir(parents=True)
+    # Ignores SIGTERM, so only the SIGKILL after the grace period stops it
+    (skill / "main.py").write_text(
+        "import signal, time\n"
+        "signal.signal(signal.SIGTERM, signal.SIG_IGN)\n"
+        "open('started', 'w').close()\n"
+        "time.sleep(60)\n"
+    )
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MOCK_RUNNER", "subprocess")
+    client = MockDockerClient()
+
+    exits = []
+    run_id = client.run_container("contex-brain:latest", "sleeper", env={}, on_exit=exits.append)
+    deadline = time.time() + 10
+    while not (tmp_path / "started").exists():
+        # Signal only once the handler is installed
+        assert time.time() < deadline, "skill did not start"
+        time.sleep(0.02)
+
+    start = time.time()
+    assert client.cancel(run_id, grace=0.5)
+    assert client.wait(run_id, timeout=10) == -9
+    assert time.time() - start < 5
+    # on_exit runs right after the run is marked done
+    while not exits and time.time() < deadline:
+        time.sleep(0.01)
+    assert exits == [-9]
+    assert not client.cancel(run_id)
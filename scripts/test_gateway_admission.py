@@ -0,0 +1,36 @@
+import os
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from apps.gateway.admission import Admission
+
+def test_sender_bucket_rejects_with_retry_after():
+    admission = Admission(sender_per_minute=60, sender_burst=2, global_per_minute=6000, global_burst=100)
+    assert admission.check("alice")[0] and admission.check("alice")[0]
+    admitted, scope, retry_after = admission.check("alice")
+    assert not admitted and scope == "sender" and retry_after == 1
+    # Other senders have their own bucket
+    assert admission.check("bob")[0]
+    time.sleep(1.05)
+    assert admission.check("alice")[0]
+    assert admission.top()[0] == {"sender": "alice", "admitted": 3, "rejected": 1}
+    assert admission.totals() == {"admitted": 4, "rejected": 1}
+
+def test_global_bucket_is_shared_by_all_senders():
+    admission = Admission(sender_per_minute=60, sender_burst=10, global_per_minute=6, global_burst=2)
+    assert admission.check("alice")[0] and admission.check("bob")[0]
+    admitted, scope, retry_after = admission.check("carol")
+    # One token every 10 seconds
+    assert not admitted and scope == "global" and 9 <= retry_after <= 10
+
+def test_configure_applies_new_limits():
+    admission = Admission(sender_per_minute=1, sender_burst=1, global_per_minute=60, global_burst=10)
+    assert admission.check("alice")[0]
+    assert not admission.check("alice")[0]
+    admission.configure(sender_per_minute=60, sender_burst=5)
+    assert admission.limits()["sender_burst"] == 5
+    assert all(admission.check("alice")[0] for _ in range(5))
+    assert not admission.check("alice")[0]
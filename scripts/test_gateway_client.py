@@ -0,0 +1,195 @@
+import os
+import sys
+import time
+import socket
+import asyncio
+import tempfile
+import threading
+import requests
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+# Add project root to path
+sys.path.append(os.getcwd())
+os.environ.setdefault("GATEWAY_INBOX_DB", os.path.join(tempfile.mkdtemp(), "inbox.db"))
+
+import apps.gateway.main as gateway
+from apps.gateway.sidecar_client import SidecarClient, CircuitBreaker, SidecarUnavailable
+
+def _record(replies: list):
+    """Stand-in for gateway.send_wechat_reply that collects replies instead of queueing them."""
+    async def send(recipient, content):
+        replies.append(content)
+    return send
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _serve(app, lifespan: str = "off"):
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan=lifespan))
+    server.thread = threading.Thread(target=server.run, daemon=True)
+    server.thread.start()
+    deadline = time.time() + 10
+    while not server.started:
+        assert time.time() < deadline, "server did not start"
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+def _stop(server):
+    """Wait for shutdown hooks too: the next gateway server reuses the module's workers."""
+    server.should_exit = True
+    server.thread.join(timeout=10)
+
+def _stub_sidecar(delay: float = 0.0, fail_first: int = 0):
+    """Minimal sidecar: counts /run-task calls and the client connections they came over."""
+    stub = FastAPI()
+    stub.state.calls = 0
+    stub.state.peers = set()
+    stub.state.health_calls = 0
+
+    @stub.post("/run-task")
+    async def run_task(request: Request):
+        stub.state.calls += 1
+        stub.state.peers.add(request.client.port)
+        await asyncio.sleep(delay)
+        return {"status": "started", "task_id": str(stub.state.calls)}
+
+    @stub.get("/health")
+    async def health():
+        stub.state.health_calls += 1
+        if stub.state.health_calls <= fail_first:
+            return Response(status_code=503)
+        return {"status": "ok"}
+
+    return stub
+
+def test_gateway_sustains_message_rate_over_pooled_connections():
+    stub = _stub_sidecar(delay=0.05)
+    stub_server, stub_url = _serve(stub)
+    replies = []
+    original_client, original_reply = gateway.sidecar, gateway.send_wechat_reply
+    gateway.sidecar = SidecarClient(stub_url, max_connections=10)
+    gateway.send_wechat_reply = _record(replies)
+    limits = gateway.admission.limits()
+    gateway.admission.configure(sender_per_minute=1e6, sender_burst=1e6, global_per_minute=1e6, global_burst=1e6)
+    # Lifespan starts the inbox workers
+    gateway_server, gateway_url = _serve(gateway.app, lifespan="on")
+    try:
+        session = requests.Session()
+        started = time.time()
+        for i in range(200):
+            session.post(f"{gateway_url}/webhook/wechat", json={"msg_id": str(i), "sender": "u", "content": "/brief"})
+        deadline = time.time() + 20
+        while len(replies) < 200:
+            assert time.time() < deadline, f"only {len(replies)} replies"
+            time.sleep(0.01)
+        rate = 200 / (time.time() - started)
+
+        # 50ms per sidecar call, yet messages are handled concurrently over a bounded pool
+        assert rate > 40, f"{rate:.0f} messages/s"
+        assert all(r.startswith("Daily Brief started") for r in replies)
+        assert stub.state.calls == 200 and len(stub.state.peers) <= 10
+    finally:
+        gateway.sidecar, gateway.send_wechat_reply = original_client, original_reply
+        gateway.admission.configure(**limits)
+        _stop(gateway_server)
+        stub_server.should_exit = True
+
+def test_webhook_answers_redeliveries_from_recorded_outcome():
+    replies = []
+    original_reply = gateway.send_wechat_reply
+    gateway.send_wechat_reply = _record(replies)
+    gateway_server, gateway_url = _serve(gateway.app, lifespan="on")
+    try:
+        msg = {"msg_id": "dup-1", "sender": "u", "content": "/ping"}
+        assert requests.post(f"{gateway_url}/webhook/wechat", json=msg).json()["status"] == "received"
+        deadline = time.time() + 10
+        while not replies:
+            assert time.time() < deadline, "no reply"
+            time.sleep(0.01)
+        time.sleep(0.1)
+        again = requests.post(f"{gateway_url}/webhook/wechat", json=msg).json()
+        assert again["status"] == "duplicate" and again["reply"] == "Pong! Gateway is online."
+
+        # A restarted gateway has an empty cache but still finds the msg_id in the inbox
+        gateway.dedup._entries.clear()
+        again = requests.post(f"{gateway_url}/webhook/wechat", json=msg).json()
+        assert again["status"] == "duplicate" and again["state"] == "done"
+        assert replies == ["Pong! Gateway is online."]
+
+        text = requests.get(f"{gateway_url}/metrics").text
+        for result in ("hit_memory", "hit_store", "miss"):
+            assert f'gateway_dedup_lookups_total{{result="{result}"}}' in text
+    finally:
+        gateway.send_wechat_reply = original_reply
+        _stop(gateway_server)
+
+def test_brief_over_sender_limit_is_answered_with_retry_after():
+    stub = _stub_sidecar()
+    stub_server, stub_url = _serve(stub)
+    replies = []
+    original_client, original_reply = gateway.sidecar, gateway.send_wechat_reply
+    limits = gateway.admission.limits()
+    gateway.sidecar = SidecarClient(stub_url)
+    gateway.send_wechat_reply = _record(replies)
+    gateway.admission.configure(sender_per_minute=1, sender_burst=1, global_per_minute=600, global_burst=100)
+    gateway_server, gateway_url = _serve(gateway.app, lifespan="on")
+    try:
+        for i in range(2):
+            requests.post(f"{gateway_url}/webhook/wechat", json={"msg_id": f"limit-{i}", "sender": "greedy", "content": "/brief"})
+        deadline = time.time() + 10
+        while len(replies) < 2:
+            assert time.time() < deadline, replies
+            time.sleep(0.01)
+        assert stub.state.calls == 1
+        assert any(r.startswith("You're requesting briefs too often. Please try again in 6") for r in replies)
+        stats = requests.get(f"{gateway_url}/admission/stats").json()
+        assert {"sender": "greedy", "admitted": 1, "rejected": 1} in stats["senders"]
+    finally:
+        gateway.sidecar, gateway.send_wechat_reply = original_client, original_reply
+        gateway.admission.configure(**limits)
+        _stop(gateway_server)
+        stub_server.should_exit = True
+
+def test_retries_idempotent_calls_with_backoff():
+    stub = _stub_sidecar(fail_first=2)
+    server, url = _serve(stub)
+    try:
+        client = SidecarClient(url, retries=2, backoff=0.01)
+        assert asyncio.run(client.health())
+        assert stub.state.health_calls == 3
+    finally:
+        server.should_exit = True
+
+def test_circuit_breaker_fails_fast_and_recovers():
+    async def scenario():
+        # Nothing listens on this port: every call fails to connect
+        client = SidecarClient(f"http://127.0.0.1:{_free_port()}", retries=0,
+                               breaker=CircuitBreaker(failure_threshold=3, reset_timeout=0.2))
+        for _ in range(3):
+            try:
+                await client.run_task("daily-brief")
+                assert False, "connect should fail"
+            except Exception as e:
+                assert not isinstance(e, SidecarUnavailable)
+        assert client.breaker.state == "open"
+
+        started = time.monotonic()
+        try:
+            await client.run_task("daily-brief")
+            assert False, "breaker should be open"
+        except SidecarUnavailable:
+            assert time.monotonic() - started < 0.05
+
+        # After the reset timeout one trial call is let through
+        await asyncio.sleep(0.25)
+        assert client.breaker.state == "half_open"
+        assert client.breaker.allow() and not client.breaker.allow()
+        client.breaker.record_success()
+        assert client.breaker.state == "closed"
+        await client.aclose()
+
+    asyncio.run(scenario())
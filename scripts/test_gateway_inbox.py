@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from apps.gateway.inbox import Inbox, InboxWorkers, DedupCache
+
+def _msg(i):
+    return {"msg_id": f"m{i}", "sender": "u", "content": "/ping", "msg_type": "text"}
+
+def test_leases_acks_and_dead_letters():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = Path(temp_dir) / "inbox.db"
+        inbox = Inbox(db_path, visibility_timeout=0.2, max_attempts=2, owner="gateway-1")
+        first = inbox.append(_msg(1))
+        inbox.append(_msg(2))
+
+        leased = inbox.claim()
+        assert leased["id"] == first and leased["attempts"] == 1
+        # A leased message is invisible to other workers until its lease expires
+        assert inbox.claim()["payload"]["msg_id"] == "m2"
+        assert inbox.claim() is None
+        assert inbox.stats()["in_flight"] == 2
+
+        time.sleep(0.25)
+        again = inbox.claim()
+        assert again["id"] == first and again["attempts"] == 2
+        assert inbox.fail(first, "boom")
+        assert inbox.dead_letters()[0]["payload"]["msg_id"] == "m1"
+
+        # After a restart, leases of the previous process are released immediately,
+        # but not the live leases of another process sharing the DB
+        restarted = Inbox(db_path, visibility_timeout=60, owner="gateway-1")
+        other = Inbox(db_path, visibility_timeout=60, owner="gateway-2")
+        assert restarted.claim()["payload"]["msg_id"] == "m2"
+        inbox.append(_msg(3))
+        assert other.claim()["payload"]["msg_id"] == "m3"
+        assert restarted.recover() == 1
+        second = restarted.claim()
+        assert second["payload"]["msg_id"] == "m2" and restarted.claim() is None
+        restarted.ack(second["id"])
+        assert restarted.stats()["in_flight"] == 1
+
+def test_workers_drain_and_dead_letter_failures():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        inbox = Inbox(Path(temp_dir) / "inbox.db", max_attempts=1)
+        handled = []
+
+        async def handler(payload):
+            if payload["msg_id"] == "m3":
+                raise RuntimeError("cannot handle")
+            handled.append(payload["msg_id"])
+
+        async def scenario():
+            workers = InboxWorkers(inbox, handler, workers=4, poll_interval=0.05)
+            workers.start()
+            for i in range(20):
+                inbox.append(_msg(i))
+                workers.notify()
+            deadline = time.time() + 10
+            while workers.stats["processed"] + workers.stats["dead_lettered"] < 20:
+                assert time.time() < deadline, workers.stats
+                await asyncio.sleep(0.02)
+            await workers.stop()
+            return workers.stats
+
+        stats = asyncio.run(scenario())
+        assert stats == {"processed": 19, "retried": 0, "dead_lettered": 1}
+        assert sorted(handled) == sorted(f"m{i}" for i in range(20) if i != 3)
+        assert inbox.stats()["depth"] == 0 and inbox.stats()["dead_letters"] == 1
+
+def test_msg_id_is_accepted_once_and_remembers_outcome():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = Path(temp_dir) / "inbox.db"
+        inbox = Inbox(db_path)
+        first = inbox.append(_msg(1))
+        assert inbox.append(_msg(1)) is None
+        assert inbox.outcome("m1") == {"state": "queued", "reply": None}
+
+        inbox.ack(inbox.claim()["id"], "Pong! Gateway is online.")
+        # Another process sharing the database refuses the redelivery too
+        other = Inbox(db_path)
+        assert other.append(_msg(1)) is None
+        assert other.outcome("m1") == {"state": "done", "reply": "Pong! Gateway is online."}
+        assert other.stats()["depth"] == 0 and first is not None
+
+        failing = Inbox(db_path, max_attempts=1)
+        failing.append(_msg(2))
+        failing.fail(failing.claim()["id"], "boom")
+        assert failing.outcome("m2")["state"] == "failed"
+        assert failing.outcome("m3") is None
+
+def test_dedup_cache_is_bounded_lru_with_ttl():
+    cache = DedupCache(capacity=2, ttl=0.1)
+    cache.put("a", {"state": "queued"})
+    cache.put("b", {"state": "queued"})
+    assert cache.get("a")
+    cache.put("c", {"state": "queued"})
+    # "b" was least recently used
+    assert cache.get("b") is None and cache.get("a") and cache.get("c")
+    time.sleep(0.15)
+    assert cache.get("a") is None
+
+def _from(sender, i):
+    return {"msg_id": f"{sender}{i}", "sender": sender, "content": "/brief", "msg_type": "text"}
+
+def test_claims_are_fair_between_senders():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        inbox = Inbox(Path(temp_dir) / "inbox.db")
+        inbox.weights = {"vip": 2.0}
+        # A backlog from one sender arrives before anyone else
+        for i in range(6):
+            inbox.append(_from("noisy", i))
+        inbox.append(_from("quiet", 0))
+        for i in range(4):
+            inbox.append(_from("vip", i))
+
+        order = []
+        while True:
+            message = inbox.claim()
+            if message is None:
+                break
+            order.append(message["payload"]["msg_id"])
+            inbox.ack(message["id"])
+
+        # quiet waits for one noisy message, not six; vip gets two turns per noisy one
+        assert order == ["vip0", "noisy0", "quiet0", "vip1", "vip2", "noisy1", "vip3",
+                         "noisy2", "noisy3", "noisy4", "noisy5"]
+
+        # A newcomer after service has started does not queue behind the backlog
+        for i in range(6):
+            inbox.append(_from("noisy", 10 + i))
+        inbox.ack(inbox.claim()["id"])
+        inbox.append(_from("late", 0))
+        # Tied with the backlog's next message, ahead of the other four
+        assert "late0" in [inbox.claim()["payload"]["msg_id"] for _ in range(2)]
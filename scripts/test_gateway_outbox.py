@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import socket
+import asyncio
+import tempfile
+import threading
+import uvicorn
+from pathlib import Path
+from fastapi import FastAPI, Request
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from apps.gateway.outbox import Outbox, ReplySender, WeChatTransport, TokenBucket, split_message
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _stub_wechat(fail_first: int = 0):
+    """Stub of the customer service message API: records sends, answers the first ones with a rate limit error."""
+    stub = FastAPI()
+    stub.state.sent = []
+    stub.state.calls = 0
+
+    @stub.post("/cgi-bin/message/custom/send")
+    async def send(request: Request):
+        stub.state.calls += 1
+        body = await request.json()
+        if stub.state.calls <= fail_first:
+            return {"errcode": 45009, "errmsg": "api freq out of limit"}
+        if body["touser"] == "blocked":
+            return {"errcode": 43004, "errmsg": "require subscribe"}
+        stub.state.sent.append((time.monotonic(), body["touser"], body["text"]["content"]))
+        return {"errcode": 0, "errmsg": "ok"}
+
+    return stub
+
+def test_split_message_respects_byte_cap_and_boundaries():
+    text = "The first paragraph ends right here.\n\n" + "word " * 100
+    chunks = split_message(text, 64)
+    assert all(len(chunk.encode()) <= 64 for chunk in chunks)
+    assert chunks[0] == "The first paragraph ends right here."
+    assert " ".join(chunks).split() == text.split()
+    # Multi-byte characters are never cut in half
+    assert all(len(chunk.encode()) <= 10 for chunk in split_message("简报" * 20, 10))
+    assert split_message("short", 64) == ["short"]
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=10, burst=2)
+    bucket.take()
+    bucket.take()
+    assert 0.05 < bucket.wait_time() <= 0.1
+    time.sleep(0.11)
+    assert bucket.wait_time() == 0
+
+def test_outbox_coalesces_in_order_and_fails_over():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        outbox = Outbox(Path(temp_dir) / "inbox.db", max_bytes=40, max_attempts=2)
+        outbox.enqueue("alice", "one")
+        outbox.enqueue("alice", "two")
+        outbox.enqueue("alice", "x" * 39)
+        outbox.enqueue("bob", "hi")
+        assert outbox.due_recipients() == ["alice", "bob"]
+
+        batch = outbox.claim("alice")
+        assert [m["content"] for m in batch] == ["one", "two"]
+        # Later chunks wait until the leased ones are sent
+        assert outbox.claim("alice") == []
+        assert not outbox.fail([m["id"] for m in batch], "busy")
+        assert outbox.claim("alice") == []
+
+        bob = outbox.claim("bob")
+        assert outbox.fail([m["id"] for m in bob], "no such user", retryable=False)
+        assert outbox.stats()["failed"] == 1 and outbox.stats()["depth"] == 3
+
+def test_sender_rate_limits_per_recipient_and_retries():
+    stub = _stub_wechat(fail_first=1)
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        outbox = Outbox(Path(temp_dir) / "inbox.db", max_bytes=100, max_backoff=0.1)
+        transport = WeChatTransport(f"http://127.0.0.1:{port}/cgi-bin/message/custom/send", access_token="t")
+        observed = []
+
+        async def scenario():
+            while not server.started:
+                await asyncio.sleep(0.05)
+            sender = ReplySender(outbox, transport, rate=100, burst=100, recipient_rate=5, recipient_burst=1,
+                                 poll_interval=0.05, observe=lambda outcome, seconds: observed.append(outcome))
+            sender.start()
+            for i in range(3):
+                outbox.enqueue("alice", "a" * 60 + str(i))
+            outbox.enqueue("bob", "hello")
+            outbox.enqueue("blocked", "never delivered")
+            sender.notify()
+            deadline = time.time() + 10
+            # Stats are updated after the stub has answered, so wait on them rather than on the stub
+            while sender.stats["sent"] < 4 or sender.stats["failed"] < 1:
+                assert time.time() < deadline, (stub.state.sent, sender.stats)
+                await asyncio.sleep(0.02)
+            await sender.stop()
+            await transport.aclose()
+            return sender.stats
+
+        try:
+            stats = asyncio.run(scenario())
+        finally:
+            server.should_exit = True
+
+        alice = [(at, content) for at, recipient, content in stub.state.sent if recipient == "alice"]
+        # Too long to coalesce, so three sends, in order and at most 5 per second
+        assert [content[-1] for _, content in alice] == ["0", "1", "2"]
+        assert all(b - a >= 0.15 for (a, _), (b, _) in zip(alice, alice[1:]))
+        assert stats["retried"] == 1 and stats["failed"] == 1 and stats["sent"] == 4
+        assert "retried" in observed and outbox.stats()["depth"] == 0
+
+def test_sender_sleeps_while_only_in_flight_recipients_have_replies():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        outbox = Outbox(Path(temp_dir) / "inbox.db", max_bytes=40)
+        checks = []
+        next_visible_in = outbox.next_visible_in
+        outbox.next_visible_in = lambda *args: checks.append(args) or next_visible_in(*args)
+
+        async def slow_transport(recipient, content):
+            await asyncio.sleep(0.5)
+
+        async def scenario():
+            sender = ReplySender(outbox, slow_transport, poll_interval=1.0)
+            sender.start()
+            # Too long to coalesce: the second chunk is due while the first is being sent
+            outbox.enqueue("alice", "a" * 30)
+            outbox.enqueue("alice", "b" * 30)
+            sender.notify()
+            deadline = time.time() + 5
+            while sender.stats["sent"] < 2:
+                assert time.time() < deadline, sender.stats
+                await asyncio.sleep(0.02)
+            await sender.stop()
+
+        asyncio.run(scenario())
+        # Polling for the in-flight recipient's next chunk would check every 10ms
+        assert len(checks) < 10, len(checks)
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+from pathlib import Path
+from datetime import datetime, timezone
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from apps.sidecar.core.log_index import LogIndex, LogIndexBusy
+
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+def test_query_filters_search_and_retention():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index = LogIndex(Path(temp_dir) / "logs.db", Path(temp_dir) / "system.log", retention_days=1)
+        now = time.time()
+        index.ingest([
+            {"timestamp": _iso(now - 3 * 86400), "level": "ERROR", "component": "sidecar.api", "message": "ancient failure"},
+            {"timestamp": _iso(now - 60), "level": "INFO", "component": "sidecar.docker", "message": "[CONTAINER] searching news", "task_id": "t1"},
+            {"timestamp": _iso(now - 30), "level": "ERROR", "component": "sidecar.docker", "message": "[CONTAINER] search failed", "task_id": "t1"},
+            {"timestamp": _iso(now - 10), "level": "WARNING", "component": "gateway", "message": "sidecar slow"},
+        ])
+
+        result = index.query(level="WARNING", start=now - 3600)
+        assert result["total"] == 2
+        assert [r["message"] for r in result["records"]] == ["sidecar slow", "[CONTAINER] search failed"]
+        assert result["counts"]["level"] == {"ERROR": 1, "WARNING": 1}
+
+        result = index.query(component="sidecar.", task_id="t1", q="search*")
+        assert result["total"] == 2 and result["counts"]["component"] == {"sidecar.docker": 2}
+        assert index.query(q="news", limit=1, offset=1)["records"] == []
+
+        index.compact()
+        assert index.query(q="ancient")["total"] == 0
+        assert index.query()["total"] == 3
+
+        try:
+            index.query(q="AND (")
+            assert False, "invalid FTS syntax should be rejected"
+        except ValueError:
+            pass
+
+def test_locked_database_is_busy_not_an_invalid_query():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index = LogIndex(Path(temp_dir) / "logs.db", Path(temp_dir) / "system.log")
+
+        def locked():
+            raise sqlite3.OperationalError("database is locked")
+
+        index._get_conn = locked
+        for q in (None, "news"):
+            try:
+                index.query(q=q)
+                assert False, "a locked database should be reported as busy"
+            except LogIndexBusy:
+                pass
@@ -0,0 +1,66 @@
+import os
+import sys
+import json
+import threading
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from apps.sidecar.core.logger import LogPipeline, BatchRotatingFileHandler, LOG_BUFFER
+
+class GatedStream:
+    """Stdout stand-in that holds the pipeline thread until released."""
+    def __init__(self):
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+        self.text = ""
+
+    def write(self, text):
+        self.entered.set()
+        self.gate.wait(5)
+        self.text += text
+
+    def flush(self):
+        pass
+
+def test_pipeline_writes_batches_once_with_sequence(tmp_path):
+    log_file = tmp_path / "system.log"
+    pipeline = LogPipeline(file_handler=BatchRotatingFileHandler(log_file, maxBytes=0), batch_size=64)
+    for i in range(200):
+        pipeline.put({"level": "INFO", "component": "test", "message": f"m{i}"})
+    pipeline.flush()
+
+    lines = [json.loads(l) for l in log_file.read_text().splitlines()]
+    assert [l["message"] for l in lines] == [f"m{i}" for i in range(200)]
+    assert [l["seq"] for l in lines] == list(range(1, 201))
+    # seq is per process; the pid tells the sidecar's records from the gateway's
+    assert {l["pid"] for l in lines} == {os.getpid()}
+    stats = pipeline.stats()
+    assert stats["written"] == 200 and stats["dropped"] == 0
+    assert stats["batches"] < 200
+    LOG_BUFFER.clear()
+
+def test_overflow_policies():
+    for policy, expected in (("drop_new", ["first", "a", "b"]), ("drop_oldest", ["first", "c", "d"])):
+        stream = GatedStream()
+        pipeline = LogPipeline(stream=stream, max_queue=2, overflow=policy)
+        pipeline.put({"message": "first"})
+        assert stream.entered.wait(5)
+        for message in ("a", "b", "c", "d"):
+            pipeline.put({"message": message})
+
+        stream.gate.set()
+        pipeline.flush()
+        assert [json.loads(l)["message"] for l in stream.text.splitlines()] == expected
+        assert pipeline.stats()["dropped"] == 2
+    LOG_BUFFER.clear()
+
+def test_rollover_measures_encoded_bytes(tmp_path):
+    log_file = tmp_path / "system.log"
+    handler = BatchRotatingFileHandler(log_file, maxBytes=100, backupCount=1, encoding="utf-8")
+    handler.write_batch("x" * 40 + "\n")
+    # 41 characters but 121 bytes: the file would pass maxBytes, so it rolls over first
+    handler.write_batch("简" * 40 + "\n")
+    handler.close()
+    assert (tmp_path / "system.log.1").read_text() == "x" * 40 + "\n"
+    assert log_file.read_text(encoding="utf-8") == "简" * 40 + "\n"
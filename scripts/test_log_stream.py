@@ -0,0 +1,41 @@
+import os
+import sys
+import asyncio
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from apps.sidecar.core.logger import LogBroker, LOG_BUFFER
+
+def _record(seq, level="INFO", component="sidecar.api", task_id=None):
+    record = {"seq": seq, "level": level, "component": component, "message": f"m{seq}"}
+    if task_id:
+        record["task_id"] = task_id
+    return record
+
+def test_subscription_filters_resumes_and_drops():
+    async def scenario():
+        broker = LogBroker()
+        LOG_BUFFER.clear()
+        LOG_BUFFER.extend([_record(1), _record(2, "ERROR"), _record(3, "ERROR", task_id="t1")])
+
+        # Resume after seq 1 with a level filter: only the missed errors are replayed
+        resumed = broker.subscribe(cursor=1, level="ERROR")
+        assert [r["seq"] for r in await resumed.get(timeout=1)] == [2, 3]
+
+        by_task = broker.subscribe(task_id="t1")
+        slow = broker.subscribe(max_queue=2, component="sidecar.docker")
+        broker.publish(_record(4, task_id="t1"))
+        for seq in range(5, 10):
+            broker.publish(_record(seq, component="sidecar.docker"))
+
+        assert [r["seq"] for r in await by_task.get(timeout=1)] == [4]
+        assert [r["seq"] for r in await slow.get(timeout=1)] == [8, 9]
+        assert slow.dropped == 3
+        assert await resumed.get(timeout=0.05) == []
+
+        broker.unsubscribe(slow)
+        assert broker.stats()["subscribers"] == 2
+        LOG_BUFFER.clear()
+
+    asyncio.run(scenario())
@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import asyncio
+import socket
+import threading
+import requests
+import uvicorn
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from apps.sidecar.api.main import app
+from apps.sidecar.core.metrics import MetricsRegistry, LoopLagMonitor
+
+def test_sharded_counters_and_histograms():
+    registry = MetricsRegistry()
+    hits = registry.counter("test_hits", "Hits", ("route",))
+    latency = registry.histogram("test_latency_seconds", "Latency", buckets=(0.1, 1))
+    registry.gauge_callback("test_depth", "Depth", lambda: 3)
+
+    def work():
+        for _ in range(1000):
+            hits.inc("/a")
+        latency.observe(0.05)
+        latency.observe(5)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    text = registry.render()
+    assert 'test_hits_total{route="/a"} 8000' in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 8' in text
+    assert 'test_latency_seconds_bucket{le="1.0"} 8' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 16' in text
+    assert "test_latency_seconds_count 16" in text
+    assert "# TYPE test_depth gauge" in text and "test_depth 3" in text
+
+    # The exited threads' shards were folded into one, without losing counts
+    assert hits._shards._all == [] and latency._shards._all == []
+    hits.inc("/a")
+    assert 'test_hits_total{route="/a"} 8001' in registry.render()
+    assert "test_latency_seconds_count 16" in registry.render()
+
+def test_loop_lag_monitor_sees_blocking_calls():
+    registry = MetricsRegistry()
+    monitor = LoopLagMonitor(registry, interval=0.01)
+
+    async def block_the_loop():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+    asyncio.run(block_the_loop())
+    assert monitor.max_lag >= 0.15
+    assert 'sidecar_event_loop_lag_seconds_bucket{le="0.1"}' in registry.render()
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def test_metrics_endpoint():
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+    try:
+        deadline = time.time() + 10
+        while not server.started:
+            assert time.time() < deadline, "sidecar did not start"
+            time.sleep(0.05)
+
+        client = requests.Session()
+        client.get(f"{base_url}/health")
+        client.get(f"{base_url}/tasks/some-id")
+        res = client.get(f"{base_url}/metrics")
+        assert res.status_code == 200 and res.headers["content-type"].startswith("text/plain")
+        # Routes are labelled by template, not by concrete path
+        assert 'route="/health",status="200"' in res.text
+        assert 'route="/tasks/{task_id}",status="404"' in res.text
+        for name in ("sidecar_task_queue_depth", "sidecar_running_containers", "sidecar_log_records_dropped_total"):
+            assert name in res.text
+    finally:
+        server.should_exit = True
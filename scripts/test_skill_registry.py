@@ -0,0 +1,61 @@
+import os
+import sys
+import json
+import asyncio
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from apps.sidecar.api.main import list_skills
+from apps.sidecar.core.skills import SkillRegistry, compile_schema, skill_registry
+
+def _write_skill(root, skill_id, manifest, runnable=True):
+    path = root / skill_id
+    path.mkdir(exist_ok=True)
+    (path / "manifest.json").write_text(manifest if isinstance(manifest, str) else json.dumps(manifest))
+    if runnable:
+        (path / "main.py").write_text("print('ok')\n")
+
+def test_registry_indexes_and_invalidates(tmp_path):
+    _write_skill(tmp_path, "alpha", {"id": "alpha", "name": "Alpha"})
+    _write_skill(tmp_path, "beta", {"id": "beta"}, runnable=False)
+    _write_skill(tmp_path, "broken", "{not json")
+
+    registry = SkillRegistry(tmp_path)
+    assert registry.refresh()
+    assert [s.id for s in registry.list()] == ["alpha", "beta"]
+    assert registry.get("alpha").runnable and not registry.get("beta").runnable
+    assert registry.get("missing") is None
+
+    etag, payload = registry.payload()
+    alpha = registry.get("alpha")
+    assert not registry.refresh()
+    assert registry.payload()[0] == etag and registry.get("alpha") is alpha
+
+    # Only the edited manifest is re-parsed, and the ETag changes
+    _write_skill(tmp_path, "beta", {"id": "beta", "name": "Beta v2"})
+    assert registry.refresh()
+    assert registry.get("alpha") is alpha
+    assert registry.get("beta").manifest["name"] == "Beta v2"
+    assert registry.payload()[0] != etag
+
+def test_compiled_config_schema():
+    validate = compile_schema({
+        "topics": {"type": "array", "items": {"type": "string"}},
+        "language": {"type": "string", "enum": ["中文", "English"]},
+        "max_results": {"type": "integer", "minimum": 1, "maximum": 10},
+    })
+    assert validate({"topics": ["AI"], "language": "English", "max_results": 3, "extra": 1}) == []
+    assert validate({"topics": ["AI", 1], "language": "Klingon", "max_results": 11}) == [
+        "topics: items must be string",
+        "language: must be one of ['中文', 'English']",
+        "max_results: must be <= 10",
+    ]
+    assert validate({"max_results": True}) == ["max_results: expected integer"]
+
+def test_skills_endpoint_etag():
+    etag, _ = skill_registry.payload()
+    res = asyncio.run(list_skills(if_none_match=None))
+    assert res.status_code == 200 and res.headers["etag"] == etag
+    assert any(m["id"] == "daily-brief" for m in json.loads(res.body))
+    assert asyncio.run(list_skills(if_none_match=etag)).status_code == 304
@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+import socket
+import threading
+import requests
+import uvicorn
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from apps.sidecar.api.main import app
+from apps.sidecar.core.docker_client import ContainerRun
+from apps.sidecar.core.task_logs import TaskLogStore
+from apps.sidecar.core.tasks import task_manager
+
+def test_store_tail_range_and_follow(tmp_path):
+    store = TaskLogStore(tmp_path, buffer_lines=10, segment_lines=5)
+    received = []
+    for i in range(1, 51):
+        store.append("t1", "stdout", f"line {i}")
+        if i == 45:
+            assert store.subscribe("t1", received.append)
+
+    # Tail from the ring buffer, old ranges from the compressed segments
+    assert [e["line"] for e in store.tail("t1", 3)] == ["line 48", "line 49", "line 50"]
+    assert [e["n"] for e in store.range("t1", 2, 4)] == [2, 3, 4]
+    assert len(store.tail("t1", 30)) == 30
+    store.close("t1")
+
+    assert [e["n"] for e in received[:-1]] == [46, 47, 48, 49, 50]
+    assert received[-1] is None
+    assert not store.subscribe("t1", received.append)
+    store.flush()
+    assert [e["n"] for e in TaskLogStore(tmp_path).range("t1", 49)] == [49, 50]
+
+def test_store_follows_tasks_before_their_first_line_and_prunes(tmp_path):
+    store = TaskLogStore(tmp_path, retention_days=1)
+    received = []
+    assert not store.subscribe("quiet", received.append)
+    assert store.subscribe("quiet", received.append, active=True)
+    store.append("quiet", "stdout", "hello")
+    store.close("quiet")
+    assert [e and e["line"] for e in received] == ["hello", None]
+    # A task that ended without output is known to be over
+    store.close("silent")
+    assert not store.subscribe("silent", received.append, active=True)
+
+    store.flush()
+    stale = store.path("quiet")
+    os.utime(stale, (time.time() - 2 * 86400,) * 2)
+    assert store.prune() == 1 and not stale.exists()
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def test_task_logs_endpoint():
+    def launcher(task_id, skill, env):
+        # Output arrives through the run the Docker client tracks for the task
+        run = ContainerRun("fake-run", env.get("TASK_ID", task_id))
+        for i in range(5):
+            run.emit("stderr" if i == 4 else "stdout", f"output {i}")
+        run.finish(0)
+        task_manager.finish(task_id, 0)
+        return run.id
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+
+    original = task_manager.launcher
+    task_manager.launcher = launcher
+    try:
+        deadline = time.time() + 10
+        while not server.started:
+            assert time.time() < deadline, "sidecar did not start"
+            time.sleep(0.05)
+
+        client = requests.Session()
+        task_id = client.post(f"{base_url}/run-task", json={"task_name": "daily-brief", "force": True}).json()["task_id"]
+
+        body = client.get(f"{base_url}/tasks/{task_id}/logs", params={"tail": 2}).json()
+        assert [e["line"] for e in body["lines"]] == ["output 3", "output 4"]
+        assert body["lines"][-1]["stream"] == "stderr"
+        assert not body["running"]
+
+        ranged = client.get(f"{base_url}/tasks/{task_id}/logs", params={"start": 2, "end": 3}).json()
+        assert [e["n"] for e in ranged["lines"]] == [2, 3]
+
+        # A finished task's follow replays from Last-Event-ID and ends
+        res = client.get(f"{base_url}/tasks/{task_id}/logs", params={"follow": True}, headers={"Last-Event-ID": "3"})
+        ids = [line[4:] for line in res.text.splitlines() if line.startswith("id: ")]
+        assert ids == ["4", "5"]
+        assert "event: end" in res.text
+
+        assert client.get(f"{base_url}/tasks/missing/logs").status_code == 404
+    finally:
+        task_manager.launcher = original
+        server.should_exit = True
+
+def test_follow_a_running_task_from_before_its_first_line():
+    def launcher(task_id, skill, env):
+        run = ContainerRun("slow-run", env.get("TASK_ID", task_id))
+
+        def produce():
+            for i in range(3):
+                time.sleep(0.2)
+                run.emit("stdout", f"output {i}")
+            # The Docker clients record the exit before closing the run
+            task_manager.finish(task_id, 0)
+            run.finish(0)
+
+        threading.Thread(target=produce, daemon=True).start()
+        return run.id
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+
+    original = task_manager.launcher
+    task_manager.launcher = launcher
+    try:
+        deadline = time.time() + 10
+        while not server.started:
+            assert time.time() < deadline, "sidecar did not start"
+            time.sleep(0.05)
+
+        task_id = requests.post(f"{base_url}/run-task", json={"task_name": "daily-brief", "force": True}).json()["task_id"]
+        res = requests.get(f"{base_url}/tasks/{task_id}/logs", params={"follow": True}, timeout=10)
+        ids = [line[4:] for line in res.text.splitlines() if line.startswith("id: ")]
+        assert ids == ["1", "2", "3"]
+        assert '"status": "succeeded"' in res.text.split("event: end", 1)[1]
+    finally:
+        task_manager.launcher = original
+        server.should_exit = True
@@ -0,0 +1,257 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from apps.sidecar.core.resources import ResourceSpec, parse_memory
+from apps.sidecar.core.tasks import TaskManager, TaskStore, TaskStatus, TaskQueueFull, TaskTooLarge
+
+def _make_manager(db_path, **limits):
+    launched = []
+
+    def launcher(task_id, skill, env):
+        launched.append(task_id)
+        return f"container-{task_id[:8]}"
+
+    return TaskManager(TaskStore(db_path), launcher=launcher, **limits), launched
+
+def test_admission_limits_and_fifo():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        manager, launched = _make_manager(Path(temp_dir) / "tasks.db", max_concurrent=2, max_per_skill=1, max_queue=2)
+
+        a = manager.submit("daily-brief", {})
+        b = manager.submit("daily-brief", {})
+        c = manager.submit("other-skill", {})
+        assert a["status"] == TaskStatus.RUNNING
+        assert b["status"] == TaskStatus.QUEUED and b["queue_position"] == 0
+        # Per-skill limit blocks b, but c may overtake it on another skill
+        assert c["status"] == TaskStatus.RUNNING
+        assert manager.stats()["queue_depth"] == 1
+
+        manager.submit("daily-brief", {})
+        try:
+            manager.submit("daily-brief", {})
+            assert False, "queue should be full"
+        except TaskQueueFull:
+            pass
+
+        manager.finish(a["id"], 0)
+        done = manager.get(a["id"])
+        assert done["status"] == TaskStatus.SUCCEEDED
+        assert done["exit_code"] == 0 and done["duration"] is not None
+        assert manager.get(b["id"])["status"] == TaskStatus.RUNNING
+        assert launched == [a["id"], c["id"], b["id"]]
+
+        manager.finish(c["id"], 3)
+        assert manager.get(c["id"])["status"] == TaskStatus.FAILED
+
+def test_results_and_restart_recovery():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = Path(temp_dir) / "tasks.db"
+        manager, _ = _make_manager(db_path)
+        task = manager.submit("daily-brief", {})
+        assert manager.record_result(task["id"], "brief content")
+
+        # A new manager on the same DB cannot track the old task any more
+        restarted, _ = _make_manager(db_path)
+        recovered = restarted.get(task["id"])
+        assert recovered["status"] == TaskStatus.INTERRUPTED
+        assert recovered["result"] == "brief content"
+
+def test_resource_aware_admission():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        specs = {
+            "small": ResourceSpec(cpus=0.5, memory="256m"),
+            "large": ResourceSpec(cpus=2, memory="1g", max_concurrency=1),
+            "huge": ResourceSpec(cpus=8, memory="1g"),
+        }
+        manager, launched = _make_manager(
+            Path(temp_dir) / "tasks.db", max_concurrent=10, max_per_skill=10,
+            resources=specs.get, capacity={"cpus": 2.0, "memory": parse_memory("2g")}
+        )
+
+        a = manager.submit("small", {})
+        big = manager.submit("large", {})
+        b = manager.submit("small", {})
+        # `large` does not fit next to `a`, and later tasks may not overtake it
+        assert manager.get(a["id"])["status"] == TaskStatus.RUNNING
+        assert manager.get(big["id"])["status"] == TaskStatus.QUEUED
+        assert manager.get(b["id"])["status"] == TaskStatus.QUEUED
+        assert manager.stats()["resources"]["reserved"] == {"cpus": 0.5, "memory": parse_memory("256m")}
+
+        manager.finish(a["id"], 0)
+        assert manager.get(big["id"])["status"] == TaskStatus.RUNNING
+        assert manager.reservation(big["id"]) is specs["large"]
+        manager.finish(big["id"], 0)
+        assert launched == [a["id"], big["id"], b["id"]]
+        assert manager.stats()["resources"]["reserved"]["cpus"] == 0.5
+
+        try:
+            manager.submit("huge", {})
+            assert False, "task larger than the host should be rejected"
+        except TaskTooLarge:
+            pass
+
+def test_resource_spec_from_manifest():
+    spec = ResourceSpec.from_manifest({"resources": {"cpus": 0.5, "memory": "512m", "timeout": 60}})
+    full = spec.with_defaults(ResourceSpec(cpus=1, memory="1g", pids=128))
+    assert full.to_dict() == {"cpus": 0.5, "memory": 512 * 1024 ** 2, "pids": 128, "timeout": 60.0, "max_concurrency": None}
+    assert full.docker_kwargs() == {
+        "nano_cpus": 500000000, "mem_limit": 512 * 1024 ** 2, "memswap_limit": 512 * 1024 ** 2, "pids_limit": 128
+    }
+    assert full.rlimits() == {"data": 512 * 1024 ** 2, "cpu": 30}
+    for bad in ({"resources": {"cpus": 0}}, {"resources": {"memory": "lots"}}, {"resources": []}):
+        try:
+            ResourceSpec.from_manifest(bad)
+            assert False, f"{bad} should be rejected"
+        except ValueError:
+            pass
+
+def test_cancel_and_timeout_release_slots():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cancelled = []
+        manager, launched = _make_manager(
+            Path(temp_dir) / "tasks.db", max_concurrent=1,
+            resources=lambda skill: ResourceSpec(timeout=0.2 if skill == "hung" else None),
+            canceller=lambda task_id, run_id: cancelled.append(run_id)
+        )
+
+        running = manager.submit("daily-brief", {})
+        queued = manager.submit("daily-brief", {})
+        assert manager.cancel(queued["id"])["status"] == TaskStatus.CANCELLED
+
+        # The slot is free before the container has actually exited
+        done = manager.cancel(running["id"])
+        assert done["status"] == TaskStatus.CANCELLED and done["error"] == "cancelled by user"
+        assert cancelled == [f"container-{running['id'][:8]}"]
+        assert manager.stats()["running"] == 0
+        assert manager.cancel(running["id"]) is None
+
+        # The late exit report keeps the cancellation
+        manager.finish(running["id"], -15)
+        assert manager.get(running["id"])["status"] == TaskStatus.CANCELLED
+        assert manager.get(running["id"])["exit_code"] == -15
+
+        hung = manager.submit("hung", {})
+        deadline = time.time() + 5
+        while manager.get(hung["id"])["status"] != TaskStatus.CANCELLED:
+            assert time.time() < deadline, "timeout did not fire"
+            time.sleep(0.02)
+        assert manager.get(hung["id"])["error"] == "timed out after 0.2s"
+        assert manager.stats()["running"] == 0
+        assert launched == [running["id"], hung["id"]]
+
+def test_cancel_during_admission_is_not_overwritten():
+    class RacingStore(TaskStore):
+        # Cancels a task in the gap between its admission and the RUNNING write
+        def update(self, task_id, if_status=None, **fields):
+            if fields.get("status") == TaskStatus.RUNNING:
+                manager.cancel(task_id)
+            return super().update(task_id, if_status=if_status, **fields)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        launched = []
+        manager = TaskManager(RacingStore(Path(temp_dir) / "tasks.db"), launcher=lambda *args: launched.append(args[0]))
+        task = manager.submit("daily-brief", {})
+
+        assert manager.get(task["id"])["status"] == TaskStatus.CANCELLED
+        assert launched == []
+        assert manager.stats()["running"] == 0
+
+def test_insert_runs_outside_the_manager_lock():
+    class SlowStore(TaskStore):
+        fail = False
+
+        def insert(self, task):
+            entered.set()
+            assert release.wait(5)
+            if self.fail:
+                raise RuntimeError("database is locked")
+            super().insert(task)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        entered, release = threading.Event(), threading.Event()
+        store = SlowStore(Path(temp_dir) / "tasks.db")
+        manager = TaskManager(store, launcher=lambda *args: "container", coalesce=True, max_queue=1)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            first = pool.submit(manager.submit, "daily-brief", {})
+            assert entered.wait(5)
+            # The lock is free while the row is written, and the reserved slot counts against the queue
+            assert manager.stats()["queue_depth"] == 0
+            try:
+                manager.submit("other-skill", {})
+                assert False, "queue should be full"
+            except TaskQueueFull:
+                pass
+            # An identical request waits for the row instead of seeing an unknown task
+            joined = pool.submit(manager.submit, "daily-brief", {})
+            release.set()
+            assert joined.result()["id"] == first.result()["id"] and joined.result()["coalesced"]
+
+        # A failed insert gives back the slot and the coalescing key
+        entered.clear()
+        store.fail = True
+        try:
+            manager.submit("daily-brief", {"TOPIC": "AI"})
+            assert False, "insert should fail"
+        except RuntimeError:
+            pass
+        store.fail = False
+        task = manager.submit("daily-brief", {"TOPIC": "AI"})
+        assert not task.get("coalesced") and manager.get(task["id"])
+
+def test_coalescing_and_result_reuse():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        manager, launched = _make_manager(Path(temp_dir) / "tasks.db", max_per_skill=4, coalesce=True, result_ttl=60)
+        env = {"SKILL_CONFIG": '{"topics": ["ai"]}'}
+
+        first = manager.submit("daily-brief", env)
+        joined = manager.submit("daily-brief", dict(env))
+        assert joined["id"] == first["id"] and joined["coalesced"]
+        # Different config or an explicit force start their own tasks
+        other = manager.submit("daily-brief", {"SKILL_CONFIG": '{"topics": ["go"]}'})
+        forced = manager.submit("daily-brief", env, force=True)
+        assert len({first["id"], other["id"], forced["id"]}) == 3
+        assert len(launched) == 3
+
+        manager.record_result(first["id"], "brief")
+        manager.finish(first["id"], 0)
+        manager.finish(forced["id"], 0)
+        reused = manager.submit("daily-brief", env)
+        assert reused["reused"] and reused["id"] == forced["id"]
+        assert manager.stats()["coalesced"] == 1 and manager.stats()["reused"] == 1
+
+        # Failures are never reused, and stale results expire
+        manager.finish(other["id"], 1)
+        assert "reused" not in manager.submit("daily-brief", {"SKILL_CONFIG": '{"topics": ["go"]}'})
+        manager.configure(result_ttl=0)
+        assert not manager.submit("daily-brief", env).get("reused")
+
+def test_identical_concurrent_submits_launch_once():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        def slow_resources(skill):
+            # Widens the window between looking for an identical task and registering a new one
+            time.sleep(0.01)
+            return None
+
+        manager, launched = _make_manager(Path(temp_dir) / "tasks.db", max_per_skill=20, max_concurrent=20,
+                                          coalesce=True, resources=slow_resources)
+        start = threading.Barrier(16)
+
+        def submit():
+            start.wait()
+            return manager.submit("daily-brief", {"TOPIC": "AI"})
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            tasks = list(pool.map(lambda _: submit(), range(16)))
+
+        assert len(launched) == 1
+        assert {t["id"] for t in tasks} == {launched[0]}
+        assert sum(1 for t in tasks if t.get("coalesced")) == 15